@@ -0,0 +1,127 @@
+from functools import partial
+
+
+# generators of Tessellate programs, each taking the size of the workload
+
+
+def nested_expression(depth, repeats=50):
+    expression = '(1 + ' * depth + '1' + ')' * depth
+    return (
+        'var i = 0;\n'
+        f'while(i < {repeats}){{\n'
+        f'    var a = {expression};\n'
+        '    i = i + 1;\n'
+        '}\n'
+    )
+
+
+def while_loop(iterations):
+    return (
+        'var i = 0;\n'
+        'var total = 0;\n'
+        f'while(i < {iterations}){{\n'
+        '    if(i < 10 or i >= 20){\n'
+        '        total = total + i * 2 - 1;\n'
+        '    } else {\n'
+        '        total = total - 1;\n'
+        '    }\n'
+        '    i = i + 1;\n'
+        '}\n'
+    )
+
+
+# call arguments cannot refer to local variables, so the recursion depth is
+# kept in a global variable
+def recursion(calls, depth=10):
+    return (
+        'var depth = 0;\n'
+        'def descend(){\n'
+        '    if(depth > 0){\n'
+        '        depth = depth - 1;\n'
+        '        descend();\n'
+        '    }\n'
+        '}\n'
+        'var i = 0;\n'
+        f'while(i < {calls}){{\n'
+        f'    depth = {depth - 1};\n'
+        '    descend();\n'
+        '    i = i + 1;\n'
+        '}\n'
+    )
+
+
+# constructor arguments are evaluated without access to block variables, so
+# the coordinates are global
+def scene(figures, render=True):
+    program = (
+        'var scene = Scene([Square(Point(0, 0), 1)]);\n'
+        'var count = 1;\n'
+        'var x = 0;\n'
+        'var y = 0;\n'
+        f'while(count < {figures}){{\n'
+        '    x = 0;\n'
+        f'    while(x < 1000 and count < {figures}){{\n'
+        '        scene.add(Square(Point(x * 3, y * 3), 2));\n'
+        '        scene.add(Circle(Point(x * 3 + 1, y * 3 + 1), 1));\n'
+        '        count = count + 2;\n'
+        '        x = x + 1;\n'
+        '    }\n'
+        '    y = y + 1;\n'
+        '}\n'
+    )
+    if render:
+        program += 'scene.render();\n'
+    return program
+
+
+# the grid of the scene benchmark made by a single call instead of loops
+def tiling(figures, scene='Scene'):
+    return (
+        f'var scene = {scene}([Square(Point(0, 0), 1)]);\n'
+        f'scene.fill_square_grid(Point(0, 0), 3, 1000, {figures // 1000});\n'
+    )
+
+
+def dot_access(calls):
+    return (
+        'var square = Square(Point(1, 2), 3);\n'
+        'var circle = Circle(Point(0, 0), 2);\n'
+        'var total = 0;\n'
+        'var side = 1;\n'
+        'var i = 0;\n'
+        f'while(i < {calls}){{\n'
+        '    square.set_side(side);\n'
+        '    total = total + square.area() + circle.perimeter();\n'
+        '    total = total + square.position.x;\n'
+        '    side = side + 1;\n'
+        '    if(side > 5){\n'
+        '        side = 1;\n'
+        '    }\n'
+        '    i = i + 1;\n'
+        '}\n'
+    )
+
+
+def lexer(lines, length=900):
+    text = 'tessellate ' * (length // 11)
+    return ''.join(
+        f'# {text}\nvar s{line} = "{text}";\n'
+        for line in range(lines)
+    )
+
+
+BENCHMARKS = {
+    'nested_expression': (nested_expression, [100, 300, 1_000]),
+    'while_loop': (while_loop, [10_000, 100_000, 1_000_000]),
+    'recursion': (recursion, [1_000, 10_000, 100_000]),
+    'scene': (partial(scene, render=False), [10_000, 100_000, 1_000_000]),
+    'scene_render': (scene, [1_000, 10_000, 100_000]),
+    'tiling': (tiling, [10_000, 100_000, 1_000_000]),
+    'tiling_columnar': (
+        partial(tiling, scene='ColumnarScene'), [10_000, 100_000, 1_000_000]
+    ),
+    'dot_access': (dot_access, [10_000, 100_000, 1_000_000]),
+    'lexer': (lexer, [1_000, 10_000, 100_000]),
+}
+
+SCALES = ['small', 'medium', 'large']
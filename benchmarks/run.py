@@ -0,0 +1,179 @@
+import argparse
+import io
+import json
+import os
+import sys
+
+import matplotlib
+
+from benchmarks.programs import BENCHMARKS, SCALES
+from src.constants import (
+    MAXIMUM_FLOAT_DECIMALS,
+    MAXIMUM_IDENTIFIER,
+    MAXIMUM_INT_DIGITS,
+    MAXIMUM_RECURSION_DEPTH,
+    MAXIMUM_STRING
+)
+from src.interpreter.interpreter import Interpreter
+from src.lexer.lexer import Lexer
+from src.lexer.stream import Stream
+from src.lexer.token_buffer import TokenBuffer
+from src.parser.parser import Parser
+from src.stats import PhaseStats, measure
+
+# timings only compare on the machine that made them, so the baseline is
+# kept out of the repository and stored locally with --save_baseline
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+PHASES = ['lex', 'parse', 'interpret', 'render']
+
+# differences below this many seconds are treated as noise
+MINIMUM_DIFFERENCE = 0.005
+
+
+def run_program(text):
+    stats = PhaseStats(trace_memory=False)
+    stats.start()
+    try:
+        lexer = Lexer(
+            Stream(io.StringIO(text)),
+            MAXIMUM_IDENTIFIER,
+            MAXIMUM_STRING,
+            MAXIMUM_INT_DIGITS,
+            MAXIMUM_FLOAT_DECIMALS
+        )
+        with measure('lex'):
+            lexer = TokenBuffer(lexer)
+        with measure('parse'):
+            program = Parser(lexer).parse_program()
+        interpreter = Interpreter(MAXIMUM_RECURSION_DEPTH)
+        with measure('interpret'):
+            interpreter.interpret(program)
+    finally:
+        stats.stop()
+    return {
+        name: phase['wall_time'] for name, phase in stats.phases.items()
+    }
+
+
+# the fastest of the repeats is the least disturbed by the rest of the system
+def run_benchmark(name, scale, repeat):
+    generate, sizes = BENCHMARKS[name]
+    text = generate(sizes[SCALES.index(scale)])
+    best = {}
+    for _ in range(repeat):
+        for phase, wall_time in run_program(text).items():
+            best[phase] = min(best.get(phase, wall_time), wall_time)
+    return best
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, phases in results.items():
+        for phase, wall_time in phases.items():
+            previous = baseline.get(name, {}).get(phase)
+            if previous is None:
+                continue
+            if (
+                wall_time > previous * (1 + tolerance) and
+                wall_time - previous > MINIMUM_DIFFERENCE
+            ):
+                regressions.append((name, phase, previous, wall_time))
+    return regressions
+
+
+def format_header():
+    return f'{"benchmark":<20}' + ''.join(f'{p:>22}' for p in PHASES)
+
+
+def format_result(name, phases, baseline):
+    line = f'{name:<20}'
+    for phase in PHASES:
+        if phase not in phases:
+            line += f'{"-":>22}'
+            continue
+        cell = f'{phases[phase]:.3f}'
+        previous = baseline.get(name, {}).get(phase)
+        if previous:
+            cell += f' ({phases[phase] / previous:5.2f}x)'
+        line += f'{cell:>22}'
+    return line
+
+
+def main(arguments):
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        'benchmarks',
+        nargs='*',
+        help='names of benchmarks to run, all by default'
+    )
+    parser.add_argument(
+        '--scale',
+        choices=SCALES,
+        default='small',
+        help='size of the generated programs'
+    )
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=3,
+        help='number of runs of every benchmark'
+    )
+    parser.add_argument(
+        '--baseline',
+        type=str,
+        default=BASELINE,
+        help='file with the stored baseline results'
+    )
+    parser.add_argument(
+        '--save_baseline',
+        action='store_true',
+        help='store the results as the new baseline'
+    )
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=0.25,
+        help='allowed slowdown relative to the baseline'
+    )
+    args = parser.parse_args(arguments)
+
+    matplotlib.use('Agg')
+    sys.setrecursionlimit(100_000)
+    names = args.benchmarks or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            parser.error(f'unknown benchmark: {name}')
+
+    stored = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            stored = json.load(f)
+    baseline = stored.get(args.scale, {})
+    if not baseline and args.save_baseline is False:
+        print(
+            f'no {args.scale} baseline in {args.baseline}, '
+            'run with --save_baseline to store one',
+            file=sys.stderr
+        )
+
+    results = {}
+    print(format_header())
+    for name in names:
+        results[name] = run_benchmark(name, args.scale, args.repeat)
+        print(format_result(name, results[name], baseline), flush=True)
+    if args.save_baseline:
+        stored[args.scale] = {**baseline, **results}
+        with open(args.baseline, 'w') as f:
+            json.dump(stored, f, indent=4, sort_keys=True)
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    for name, phase, previous, wall_time in regressions:
+        print(
+            f'regression: {name} {phase} {previous:.3f} s -> {wall_time:.3f} s'
+        )
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
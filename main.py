@@ -1,7 +1,10 @@
 import argparse
+import json
+import sys
 
 from src.lexer.lexer import Lexer
 from src.lexer.stream import Stream
+from src.lexer.token_buffer import TokenBuffer
 from src.parser.parser import Parser
 from src.constants import (
     MAXIMUM_IDENTIFIER,
@@ -11,11 +14,82 @@ from src.constants import (
     MAXIMUM_RECURSION_DEPTH
 )
 from src.interpreter.interpreter import Interpreter
+from src.interpreter.profiler import Profiler
+from src.stats import PhaseStats, count_nodes, measure
 
 PATH = './examples/code_example.txt'
 
 
-def main(file, max_id, max_string, max_int, max_float_decimals, max_recursion):
+def main(
+    file,
+    max_id,
+    max_string,
+    max_int,
+    max_float_decimals,
+    max_recursion,
+    max_steps=None,
+    timeout=None,
+    profile=None,
+    profile_top=20,
+    stats=False,
+    stats_json=None,
+    output_dir=None
+):
+    if stats is False and stats_json is None:
+        run(
+            file,
+            max_id,
+            max_string,
+            max_int,
+            max_float_decimals,
+            max_recursion,
+            max_steps,
+            timeout,
+            profile,
+            profile_top,
+            output_dir
+        )
+        return
+    phase_stats = PhaseStats()
+    phase_stats.start()
+    try:
+        run(
+            file,
+            max_id,
+            max_string,
+            max_int,
+            max_float_decimals,
+            max_recursion,
+            max_steps,
+            timeout,
+            profile,
+            profile_top,
+            output_dir,
+            phase_stats
+        )
+    finally:
+        phase_stats.stop()
+        if stats:
+            print(phase_stats.report(), file=sys.stderr)
+        if stats_json is not None:
+            with open(stats_json, 'w') as f:
+                json.dump(phase_stats.as_dict(), f, indent=4)
+
+
+def run(
+    file,
+    max_id,
+    max_string,
+    max_int,
+    max_float_decimals,
+    max_recursion,
+    max_steps,
+    timeout,
+    profile,
+    profile_top,
+    output_dir=None,
+    phase_stats=None
+):
     with open(file, 'r') as f:
         lexer = Lexer(
             Stream(f),
@@ -24,10 +98,30 @@ def main(file, max_id, max_string, max_int, max_float_decimals, max_recursion):
             max_int,
             max_float_decimals
         )
+        # lexing is normally interleaved with parsing, tokens are read up
+        # front only to measure it separately
+        if phase_stats is not None:
+            with measure('lex'):
+                lexer = TokenBuffer(lexer)
+            phase_stats.counts['tokens'] = len(lexer.tokens)
         parser = Parser(lexer)
-        program = parser.parse_program()
-    interpreter = Interpreter(max_recursion)
-    interpreter.interpret(program)
+        with measure('parse'):
+            program = parser.parse_program()
+    if phase_stats is not None:
+        phase_stats.counts['ast_nodes'] = count_nodes(program)
+    interpreter = Interpreter(max_recursion, max_steps, timeout, output_dir)
+    if profile is None:
+        with measure('interpret'):
+            interpreter.interpret(program)
+        return
+    profiler = Profiler(interpreter)
+    try:
+        with measure('interpret'), profiler:
+            interpreter.interpret(program)
+    finally:
+        with open(profile, 'w') as f:
+            profiler.write_collapsed(f)
+        print(profiler.report(profile_top), file=sys.stderr)
 
 
 if __name__ == "__main__":
@@ -58,6 +152,44 @@ if __name__ == "__main__":
         type=int,
         help="maximum function recursion depth"
     )
+    parser.add_argument(
+        "--max_steps",
+        type=int,
+        help="maximum number of loop iterations and function calls"
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        help="maximum running time of the program in seconds"
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        nargs="?",
+        const="profile.folded",
+        help="sample the program and write collapsed stacks to this file"
+    )
+    parser.add_argument(
+        "--profile_top",
+        type=int,
+        default=20,
+        help="number of rows in the profile tables"
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="report time and memory used by every phase"
+    )
+    parser.add_argument(
+        "--stats_json",
+        type=str,
+        help="write the phase report as JSON to this file"
+    )
+    parser.add_argument(
+        "--output_dir",
+        type=str,
+        help="directory the program may write image files to"
+    )
     parser.add_argument(
         "-f",
         "--file",
@@ -92,4 +224,18 @@ if __name__ == "__main__":
         else PATH
     )
 
-    main(file, max_id, max_string, max_int, max_float_decimals, max_recursion)
+    main(
+        file,
+        max_id,
+        max_string,
+        max_int,
+        max_float_decimals,
+        max_recursion,
+        args.max_steps,
+        args.timeout,
+        args.profile,
+        args.profile_top,
+        args.stats,
+        args.stats_json,
+        args.output_dir
+    )
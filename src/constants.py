@@ -3,3 +3,6 @@ MAXIMUM_STRING = 1000
 MAXIMUM_INT_DIGITS = 32
 MAXIMUM_FLOAT_DECIMALS = 32
 MAXIMUM_RECURSION_DEPTH = 10
+STEPS_BETWEEN_CLOCK_CHECKS = 1000
+MAXIMUM_ARRAY_SIZE = 10_000_000
+MAXIMUM_TILES = 1_000_000
@@ -137,6 +137,33 @@ class VariableRedeclarationError(InterpreterError):
         self.position = position
 
 
+class ParallelFunctionError(InterpreterError):
+    def __init__(self, position, func_name, var_name):
+        self.message = (
+            f'Function: {func_name} cannot be run in parallel, ' +
+            f'it accesses non-local variable: {var_name}'
+        )
+        self.position = position
+
+
+class MismatchedArraySizesError(InterpreterError):
+    def __init__(self, position, left_size, right_size):
+        self.message = (
+            'Mismatched sizes of arrays in operation: ' +
+            f'{left_size} and {right_size}'
+        )
+        self.position = position
+
+
+class NonExistingKeyError(InterpreterError):
+    def __init__(self, position, key, object_name):
+        self.message = (
+            f'Tried to access non-existing key: {key} ' +
+            f'for object: {object_name}'
+        )
+        self.position = position
+
+
 class InvalidTypeError(InterpreterError):
     def __init__(self, position, expected, got):
         self.message = (
@@ -145,6 +172,14 @@ class InvalidTypeError(InterpreterError):
         self.position = position
 
 
+class ReadOnlyAttributeError(InterpreterError):
+    def __init__(self, position, attr_name):
+        self.message = (
+            f'Attribute {attr_name} cannot be assigned to'
+        )
+        self.position = position
+
+
 class MismatchedTypesError(InterpreterError):
     def __init__(self, position):
         self.message = (
@@ -161,6 +196,27 @@ class RecursionLimitError(InterpreterError):
         self.position = position
 
 
+class ExecutionLimitError(InterpreterError):
+    pass
+
+
+class StepLimitError(ExecutionLimitError):
+    def __init__(self, position, max_steps):
+        self.message = (
+            f'Step limit exceeded -- program took more than {max_steps} ' +
+            'loop iterations and function calls'
+        )
+        self.position = position
+
+
+class TimeLimitError(ExecutionLimitError):
+    def __init__(self, position, timeout):
+        self.message = (
+            f'Time limit exceeded -- program ran longer than {timeout} s'
+        )
+        self.position = position
+
+
 class DivisionByZeroError(InterpreterError):
     def __init__(self, position):
         self.message = (
@@ -169,6 +225,23 @@ class DivisionByZeroError(InterpreterError):
         self.position = position
 
 
+class FileOutputError(InterpreterError):
+    def __init__(self, position, path):
+        self.message = (
+            f'Writing to file: {path} is not allowed, files may only be ' +
+            'written inside the output directory'
+        )
+        self.position = position
+
+
+class NumericOverflowError(InterpreterError):
+    def __init__(self, position):
+        self.message = (
+            'Result of operation is too large'
+        )
+        self.position = position
+
+
 class BaseForTypeCastingError(Exception):
     def __init__(self, type_name, got=None):
         self.type_name = type_name
@@ -189,3 +262,29 @@ class BaseForInvalidNumberOfArgumentsError(Exception):
     def __init__(self, expected, got):
         self.expected = expected
         self.got = got
+
+
+class BaseForNonExistingKeyError(Exception):
+    def __init__(self, key):
+        self.key = key
+
+
+class BaseForMismatchedArraySizesError(Exception):
+    def __init__(self, left_size, right_size):
+        self.left_size = left_size
+        self.right_size = right_size
+
+
+class BaseForInvalidTypeError(Exception):
+    def __init__(self, expected, got):
+        self.expected = expected
+        self.got = got
+
+
+class BaseForReadOnlyAttributeError(Exception):
+    def __init__(self, attr_name):
+        self.attr_name = attr_name
+
+
+class BaseForStepLimitError(Exception):
+    pass
@@ -0,0 +1,56 @@
+import numpy as np
+
+
+# figures of one type share their geometry code, so their parameters() are
+# stacked into one array per type, with the indices of the figures
+def figure_groups(figures):
+    groups = {}
+    for index, figure in enumerate(figures):
+        groups.setdefault(type(figure), []).append(index)
+    return [
+        (
+            kind,
+            np.array(indices),
+            np.array(
+                [figures[index].parameters() for index in indices],
+                dtype=float
+            )
+        )
+        for kind, indices in groups.items()
+    ]
+
+
+# one (x_min, y_min, x_max, y_max) row per figure; every figure keeps its
+# bounding box along with the revision of its geometry it was computed for,
+# and the boxes of the figures changed since are computed together for
+# every type of figure
+def figure_bounds(figures):
+    boxes = [None] * len(figures)
+    stale = []
+    revisions = []
+    for index, figure in enumerate(figures):
+        cached = figure.cached_bounds
+        revision = figure.geometry_revision()
+        if cached is not None and cached[0] == revision:
+            boxes[index] = cached[1]
+        else:
+            stale.append(index)
+            revisions.append(revision)
+    if stale:
+        figures_of_stale = [figures[index] for index in stale]
+        for kind, indices, parameters in figure_groups(figures_of_stale):
+            computed = kind.bounds_of(parameters).tolist()
+            for index, box in zip(indices.tolist(), computed):
+                figure = figures_of_stale[index]
+                figure.cached_bounds = (revisions[index], box)
+                boxes[stale[index]] = box
+    return np.array(boxes, dtype=float).reshape(-1, 4)
+
+
+def total_bounds(bounds):
+    if len(bounds) == 0:
+        return (0, 0), (1, 1)
+    return (
+        (bounds[:, 0].min(), bounds[:, 1].min()),
+        (bounds[:, 2].max(), bounds[:, 3].max())
+    )
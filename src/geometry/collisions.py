@@ -0,0 +1,244 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.geometry.grid import cell_entries, typical_size
+
+# overlap below which figures only touch, so that tilings whose edges were
+# computed with rounding errors do not count as overlapping
+EPSILON = 1e-9
+
+# candidate pairs are tested in chunks of at most this many at once
+CHUNK = 1 << 18
+
+# strips per worker, so that workers finishing early take over more strips
+STRIPS_PER_WORKER = 4
+
+NO_PAIRS = np.empty((0, 2), dtype=np.int64)
+
+
+# pairs of figures whose insides overlap, as indices (i, j) with i < j
+# sorted in the order of the scene; figures only touching do not count.
+# with more than one worker the plane is cut into vertical strips, each
+# searched in a worker process with only the figures reaching into it;
+# there are never more workers than processors
+def overlapping_pairs(groups, bounds, workers=1):
+    if len(bounds) < 2:
+        return NO_PAIRS
+    workers = min(workers, os.cpu_count() or 1)
+    if workers == 1:
+        return sorted_pairs(strip_pairs((groups, bounds, None)))
+    # figures all starting at the same x leave a single strip
+    edges = np.unique(np.quantile(
+        bounds[:, 0], np.linspace(0, 1, workers * STRIPS_PER_WORKER + 1)
+    )[1:-1])
+    edges = np.concatenate(([-np.inf], edges, [np.inf]))
+    strips = []
+    for x_min, x_max in zip(edges[:-1], edges[1:]):
+        inside = np.flatnonzero(
+            (bounds[:, 2] >= x_min) & (bounds[:, 0] < x_max)
+        )
+        strips.append((inside, (x_min, x_max)))
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(strips))
+    ) as executor:
+        found = executor.map(
+            strip_pairs,
+            [
+                (subgroups(groups, inside, len(bounds)), bounds[inside], strip)
+                for inside, strip in strips
+            ]
+        )
+        pairs = [
+            inside[pairs] for (inside, _), pairs in zip(strips, found)
+        ]
+    return sorted_pairs(np.concatenate(pairs))
+
+
+# the groups of only the figures at the given indices, with indices into
+# those
+def subgroups(groups, selected, count):
+    positions = np.full(count, -1)
+    positions[selected] = np.arange(len(selected))
+    found = []
+    for kind, indices, parameters in groups:
+        inside = positions[indices] >= 0
+        if inside.any():
+            found.append(
+                (kind, positions[indices[inside]], parameters[inside])
+            )
+    return found
+
+
+# overlapping pairs of the figures, only those whose overlap of bounding
+# boxes starts within the strip if one is given
+def strip_pairs(task):
+    groups, bounds, strip = task
+    shapes = FigureShapes(groups, len(bounds))
+    pairs = [
+        shapes.overlapping(candidates)
+        for candidates in candidate_pairs(bounds, strip)
+    ]
+    if not pairs:
+        return NO_PAIRS
+    return np.concatenate(pairs)
+
+
+def sorted_pairs(pairs):
+    return pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+
+
+# pairs of figures whose bounding boxes overlap, in chunks; figures are
+# filed under every cell of a grid their box meets, and a pair is only
+# taken from the cell holding the corner where the overlap of their boxes
+# starts, so it is found once however many cells the figures share
+def candidate_pairs(bounds, strip=None):
+    size = 2 * typical_size(bounds)
+    large, figures, x, y = cell_entries(bounds, size)
+
+    # figures spanning many cells are paired with every figure instead
+    is_large = np.zeros(len(bounds), dtype=bool)
+    is_large[large] = True
+    for index in large.tolist():
+        others = np.flatnonzero(~is_large | (np.arange(len(bounds)) > index))
+        others = others[others != index]
+        pairs = np.column_stack((np.full(len(others), index), others))
+        pairs = pairs[boxes_overlap(bounds, pairs, strip)]
+        yield from chunks(np.sort(pairs, axis=1))
+
+    # every entry is paired with the entries after it in the same cell
+    same_cell = (x[1:] == x[:-1]) & (y[1:] == y[:-1])
+    starts = np.flatnonzero(np.concatenate(([True], ~same_cell)))
+    ends = np.append(starts[1:], len(figures))
+    sizes = ends - starts
+    later = np.repeat(ends, sizes) - np.arange(len(figures)) - 1
+    totals = np.cumsum(later)
+    first_entry = 0
+    while first_entry < len(figures):
+        done = totals[first_entry - 1] if first_entry else 0
+        end = int(np.searchsorted(totals, done + CHUNK, side='right'))
+        end = max(end, first_entry + 1)
+        counts = later[first_entry:end]
+        first = np.repeat(np.arange(first_entry, end), counts)
+        second = first + 1 + np.arange(len(first)) - np.repeat(
+            np.cumsum(counts) - counts, counts
+        )
+        first_entry = end
+        pairs = np.column_stack((figures[first], figures[second]))
+        keep = boxes_overlap(bounds, pairs, strip)
+        corners = np.floor(
+            np.maximum(bounds[pairs[:, 0], :2], bounds[pairs[:, 1], :2]) / size
+        ).astype(np.int64)
+        keep &= (corners[:, 0] == x[first]) & (corners[:, 1] == y[first])
+        pairs = np.sort(pairs[keep], axis=1)
+        if len(pairs):
+            yield pairs
+
+
+def chunks(pairs):
+    for start in range(0, len(pairs), CHUNK):
+        yield pairs[start:start + CHUNK]
+
+
+# boxes overlapping by more than EPSILON both ways, and in a strip the
+# overlap starting within it
+def boxes_overlap(bounds, pairs, strip):
+    first, second = bounds[pairs[:, 0]], bounds[pairs[:, 1]]
+    starts = np.maximum(first[:, :2], second[:, :2])
+    overlap = np.minimum(first[:, 2:], second[:, 2:]) - starts
+    keep = (overlap > EPSILON).all(axis=1)
+    if strip is not None:
+        keep &= (starts[:, 0] >= strip[0]) & (starts[:, 0] < strip[1])
+    return keep
+
+
+# the outlines of polygons and the centers and radii of circles, by group;
+# all figures are convex, so two of them overlap unless an axis separates
+# their projections: the normal of an edge of either or, for a circle, the
+# line from its center to the nearest corner of the other figure
+class FigureShapes:
+    def __init__(self, groups, count):
+        self.codes = np.empty(count, dtype=np.int64)
+        self.rows = np.empty(count, dtype=np.int64)
+        self.shapes = []
+        for code, (kind, indices, parameters) in enumerate(groups):
+            self.codes[indices] = code
+            self.rows[indices] = np.arange(len(indices))
+            if kind.shape == 'circle':
+                self.shapes.append((True, parameters))
+            else:
+                self.shapes.append((False, kind.outline(parameters)))
+
+    def overlapping(self, pairs):
+        overlapping = np.zeros(len(pairs), dtype=bool)
+        codes = self.codes[pairs]
+        rows = self.rows[pairs]
+        for first_code, second_code in np.unique(codes, axis=0).tolist():
+            selected = np.flatnonzero(
+                (codes[:, 0] == first_code) & (codes[:, 1] == second_code)
+            )
+            first_circle, first = self.shapes[first_code]
+            second_circle, second = self.shapes[second_code]
+            first, second = first[rows[selected, 0]], second[rows[selected, 1]]
+            if first_circle and second_circle:
+                found = circles_overlap(first, second)
+            elif first_circle:
+                found = polygon_circle_overlap(second, first)
+            elif second_circle:
+                found = polygon_circle_overlap(first, second)
+            else:
+                found = polygons_overlap(first, second)
+            overlapping[selected] = found
+        return pairs[overlapping]
+
+
+def circles_overlap(first, second):
+    distance = np.hypot(first[:, 0] - second[:, 0], first[:, 1] - second[:, 1])
+    return distance < first[:, 2] + second[:, 2] - EPSILON
+
+
+def polygons_overlap(first, second):
+    axes = np.concatenate((normals(first), normals(second)), axis=1)
+    return overlap_on(axes, *projected(axes, first), *projected(axes, second))
+
+
+def polygon_circle_overlap(polygons, circles):
+    centers, radii = circles[:, :2], circles[:, 2]
+    offsets = centers[:, None, :] - polygons
+    nearest = np.argmin((offsets ** 2).sum(axis=-1), axis=1)
+    towards = unit(offsets[np.arange(len(polygons)), nearest])[:, None, :]
+    axes = np.concatenate((normals(polygons), towards), axis=1)
+    middles = np.einsum('mkd,md->mk', axes, centers)
+    return overlap_on(
+        axes,
+        *projected(axes, polygons),
+        middles - radii[:, None],
+        middles + radii[:, None]
+    )
+
+
+def overlap_on(axes, first_min, first_max, second_min, second_max):
+    overlap = (
+        np.minimum(first_max, second_max) - np.maximum(first_min, second_min)
+    )
+    # axes of degenerate edges, or of a circle centered on a corner, are
+    # zero and separate nothing
+    separating = (overlap <= EPSILON) & (np.abs(axes).sum(axis=-1) > 0)
+    return ~separating.any(axis=1)
+
+
+def projected(axes, vertices):
+    projections = np.einsum('mkd,mnd->mkn', axes, vertices)
+    return projections.min(axis=-1), projections.max(axis=-1)
+
+
+def normals(vertices):
+    edges = np.roll(vertices, -1, axis=1) - vertices
+    return unit(np.stack((-edges[..., 1], edges[..., 0]), axis=-1))
+
+
+def unit(vectors):
+    length = np.hypot(vectors[..., 0], vectors[..., 1])[..., None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(length > 0, vectors / length, 0)
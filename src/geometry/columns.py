@@ -0,0 +1,294 @@
+import numpy as np
+
+STYLE_KEYS = ('fc', 'ec', 'lw', 'ls', 'fill', 'alpha')
+
+# columns are only compacted once they hold more rows of removed figures
+# than this
+COMPACT_MINIMUM = 64
+
+
+# every distinct style is kept once and figures refer to it by its index;
+# values are told apart by their type as well, so 1 and 1.0 stay as given
+class StyleTable:
+    def __init__(self):
+        self.styles = []
+        self.indices = {}
+
+    def index(self, style):
+        key = tuple((type(style[name]), style[name]) for name in STYLE_KEYS)
+        index = self.indices.get(key)
+        if index is None:
+            index = len(self.styles)
+            self.indices[key] = index
+            self.styles.append({name: style[name] for name in STYLE_KEYS})
+        return index
+
+
+# the figures of one type as rows of growing arrays: their parameters(), a
+# bit for each of the parameters given as an int, and the index of their
+# style. rows of removed figures stay until the store is compacted, which
+# copies the rows left to new columns; the old ones then tell where each
+# of their rows went, -1 for those removed, so that views follow their
+# figures and views of removed figures keep working
+class FigureColumns:
+    def __init__(self, kind, width):
+        self.kind = kind
+        self.size = 0
+        self.removed = 0
+        self.moved = None
+        self.parameters = np.empty((0, width))
+        self.integral = np.empty(0, dtype=np.uint8)
+        self.styles = np.empty(0, dtype=np.int32)
+
+    def append(self, parameters, integral, styles):
+        count = len(parameters)
+        end = self.size + count
+        if end > len(self.parameters):
+            capacity = max(2 * len(self.parameters), end, 16)
+            self.parameters = grown(self.parameters, capacity)
+            self.integral = grown(self.integral, capacity)
+            self.styles = grown(self.styles, capacity)
+        self.parameters[self.size:end] = parameters
+        self.integral[self.size:end] = integral
+        self.styles[self.size:end] = styles
+        rows = np.arange(self.size, end, dtype=np.int32)
+        self.size = end
+        return rows
+
+    # columns holding only the given rows, in the same order
+    def compacted(self, rows):
+        columns = FigureColumns(self.kind, self.parameters.shape[1])
+        columns.append(
+            self.parameters[rows], self.integral[rows], self.styles[rows]
+        )
+        moved = np.full(self.size, -1, dtype=np.int32)
+        moved[rows] = np.arange(len(rows), dtype=np.int32)
+        self.moved = (columns, moved)
+        return columns
+
+    def value(self, row, column):
+        value = self.parameters[row, column].item()
+        if self.integral[row] >> column & 1:
+            return int(value)
+        return value
+
+    def values(self, row):
+        return tuple(
+            self.value(row, column)
+            for column in range(self.parameters.shape[1])
+        )
+
+
+# figures of a scene kept as columns of numbers instead of objects, in the
+# order of the scene as the type and row of every figure; the counters
+# change with every change of the figures, the second only with those of
+# their geometry
+class ColumnStore:
+    def __init__(self):
+        self.columns = []
+        self.codes = {}
+        self.kinds = np.empty(0, dtype=np.uint8)
+        self.rows = np.empty(0, dtype=np.int32)
+        self.size = 0
+        self.style_table = StyleTable()
+        self.changes = 0
+        self.geometry_changes = 0
+
+    def __len__(self):
+        return self.size
+
+    def columns_of(self, kind, width):
+        if kind not in self.codes:
+            self.codes[kind] = len(self.columns)
+            self.columns.append(FigureColumns(kind, width))
+        return self.columns[self.codes[kind]]
+
+    # figures of one type, appended after those already in the store
+    def append(self, kind, parameters, integral=0, styles=0):
+        parameters = np.asarray(parameters, dtype=float)
+        columns = self.columns_of(kind, parameters.shape[1])
+        rows = columns.append(parameters, integral, styles)
+        self.append_order(np.full(len(rows), self.codes[kind]), rows)
+
+    # (kind, parameters, style) of figures of any type, kept in their order
+    def extend(self, records):
+        records = list(records)
+        groups = {}
+        for index, (kind, values, style) in enumerate(records):
+            groups.setdefault(kind, []).append(index)
+        kinds = np.empty(len(records), dtype=np.uint8)
+        rows = np.empty(len(records), dtype=np.int32)
+        for kind, indices in groups.items():
+            values = [records[index][1] for index in indices]
+            columns = self.columns_of(kind, len(values[0]))
+            kinds[indices] = self.codes[kind]
+            rows[indices] = columns.append(
+                values,
+                [integral_bits(row) for row in values],
+                [
+                    self.style_table.index(records[index][2])
+                    for index in indices
+                ]
+            )
+        self.append_order(kinds, rows)
+
+    def append_order(self, kinds, rows):
+        end = self.size + len(rows)
+        if end > len(self.rows):
+            capacity = max(2 * len(self.rows), end, 16)
+            self.kinds = grown(self.kinds, capacity)
+            self.rows = grown(self.rows, capacity)
+        self.kinds[self.size:end] = kinds
+        self.rows[self.size:end] = rows
+        self.size = end
+        self.changed()
+
+    # figures are taken out of the order of the scene, which moves those
+    # after them as a list would; their rows are kept until the columns
+    # hold more rows of removed figures than of figures in the scene
+    def remove(self, index):
+        if index < -self.size or index >= self.size:
+            raise IndexError(index)
+        index %= self.size
+        code = int(self.kinds[index])
+        self.kinds[index:self.size - 1] = self.kinds[index + 1:self.size]
+        self.rows[index:self.size - 1] = self.rows[index + 1:self.size]
+        self.size -= 1
+        self.row_removed(code)
+        self.changed()
+
+    # the figure at an index of the scene order replaced by another, given
+    # as for extend
+    def replace(self, index, record):
+        if index < -self.size or index >= self.size:
+            raise IndexError(index)
+        index %= self.size
+        code = int(self.kinds[index])
+        kind, values, style = record
+        columns = self.columns_of(kind, len(values))
+        self.kinds[index] = self.codes[kind]
+        self.rows[index] = columns.append(
+            [values], integral_bits(values), self.style_table.index(style)
+        )[0]
+        self.row_removed(code)
+        self.changed()
+
+    def row_removed(self, code):
+        columns = self.columns[code]
+        columns.removed += 1
+        if columns.removed > max(columns.size // 2, COMPACT_MINIMUM):
+            self.compact(code)
+
+    # the rows of the figures of one type left in the scene, copied to new
+    # columns in the order they were in
+    def compact(self, code):
+        selected = np.flatnonzero(self.kinds[:self.size] == code)
+        rows = self.rows[selected]
+        kept = np.sort(rows)
+        columns = self.columns[code].compacted(kept)
+        self.rows[selected] = np.searchsorted(kept, rows)
+        self.columns[code] = columns
+
+    def clear(self):
+        self.columns = []
+        self.codes = {}
+        self.kinds = np.empty(0, dtype=np.uint8)
+        self.rows = np.empty(0, dtype=np.int32)
+        self.size = 0
+        self.changed()
+
+    def changed(self, geometric=True):
+        self.changes += 1
+        if geometric:
+            self.geometry_changes += 1
+
+    # columns and row of the figure at an index of the scene order
+    def locate(self, index):
+        if index < -self.size or index >= self.size:
+            raise IndexError(index)
+        index %= self.size
+        return self.columns[self.kinds[index]], int(self.rows[index])
+
+    def set_value(self, columns, row, column, value):
+        columns.parameters[row, column] = value
+        if isinstance(value, int):
+            columns.integral[row] |= 1 << column
+        else:
+            columns.integral[row] &= ~np.uint8(1 << column)
+        self.changed()
+
+    def style(self, columns, row):
+        return self.style_table.styles[columns.styles[row]]
+
+    def set_style(self, columns, row, key, value):
+        style = dict(self.style(columns, row))
+        style[key] = value
+        columns.styles[row] = self.style_table.index(style)
+        self.changed(False)
+
+    # (kind, indices, parameters) for every type of figure, as figure_groups
+    # gives them for figure objects, optionally only for the figures at the
+    # given indices and with indices into those
+    def groups(self, selected=None):
+        kinds = self.kinds[:self.size]
+        rows = self.rows[:self.size]
+        if selected is not None:
+            kinds, rows = kinds[selected], rows[selected]
+        groups = []
+        for code, columns in enumerate(self.columns):
+            indices = np.flatnonzero(kinds == code)
+            if len(indices):
+                groups.append(
+                    (columns.kind, indices, columns.parameters[rows[indices]])
+                )
+        return groups
+
+    # a transform of the parameters of every type of figure, in place
+    def transform(self, transform, *arguments):
+        kinds = self.kinds[:self.size]
+        rows = self.rows[:self.size]
+        for code, columns in enumerate(self.columns):
+            rows_of_kind = rows[kinds == code]
+            if len(rows_of_kind) == 0:
+                continue
+            parameters, exact = transform(
+                columns.kind, columns.parameters[rows_of_kind], *arguments
+            )
+            columns.parameters[rows_of_kind] = parameters
+            columns.integral[rows_of_kind] &= bit_mask(exact.tolist())
+        self.changed()
+
+    def bounds(self):
+        bounds = np.empty((self.size, 4))
+        for kind, indices, parameters in self.groups():
+            bounds[indices] = kind.bounds_of(parameters)
+        return bounds
+
+    # the style of every figure, the figures sharing a style sharing its dict
+    def styles(self):
+        kinds = self.kinds[:self.size]
+        rows = self.rows[:self.size]
+        indices = np.empty(self.size, dtype=np.int32)
+        for code, columns in enumerate(self.columns):
+            selected = kinds == code
+            indices[selected] = columns.styles[rows[selected]]
+        styles = self.style_table.styles
+        return [styles[index] for index in indices.tolist()]
+
+
+def grown(array, capacity):
+    larger = np.empty((capacity, *array.shape[1:]), dtype=array.dtype)
+    larger[:len(array)] = array
+    return larger
+
+
+def integral_bits(values):
+    return bit_mask(isinstance(value, int) for value in values)
+
+
+def bit_mask(flags):
+    bits = 0
+    for column, flag in enumerate(flags):
+        if flag:
+            bits |= 1 << column
+    return bits
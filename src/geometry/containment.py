@@ -0,0 +1,31 @@
+import numpy as np
+
+# distance below which a point counts as lying on an edge
+EPSILON = 1e-9
+
+
+# which of the stacked figures of one type contain the point, their
+# boundaries included; the point may also be a pair of arrays holding one
+# point for every figure
+def contains_point(kind, parameters, point):
+    x, y = point
+    if kind.shape == 'circle':
+        cx, cy, radius = parameters.T
+        return (cx - x) ** 2 + (cy - y) ** 2 <= (radius + EPSILON) ** 2
+    return polygons_contain(kind.outline(parameters), point)
+
+
+# even-odd rule for the inside, distance to the nearest edge for the border
+def polygons_contain(vertices, point):
+    x, y = (np.asarray(value, dtype=float)[..., None] for value in point)
+    x1, y1 = vertices[..., 0], vertices[..., 1]
+    x2, y2 = np.roll(x1, -1, axis=-1), np.roll(y1, -1, axis=-1)
+    crossing = (y1 > y) != (y2 > y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crossing_x = x1 + (y - y1) / (y2 - y1) * (x2 - x1)
+    inside = (crossing & (x < crossing_x)).sum(axis=-1) % 2 == 1
+    dx, dy = x2 - x1, y2 - y1
+    length = np.maximum(dx * dx + dy * dy, 1e-12)
+    t = np.clip(((x - x1) * dx + (y - y1) * dy) / length, 0, 1)
+    distance = (x1 + t * dx - x) ** 2 + (y1 + t * dy - y) ** 2
+    return inside | (distance <= EPSILON ** 2).any(axis=-1)
@@ -0,0 +1,419 @@
+import numpy as np
+
+from src.geometry.collisions import overlapping_pairs, subgroups
+from src.geometry.containment import contains_point
+from src.geometry.grid import cell_entries, typical_size
+
+# tiles swept at once
+TILE_CHUNK = 1 << 12
+
+# tiles are made larger where needed to keep them at most this many across
+MAX_TILES = 1024
+
+
+# pieces of the boundaries of figures, each a function of x over [start,
+# end]: a line, or the upper or lower half of a circle; going up, a piece
+# adds its fill to the number of figures covering the points above it, or
+# its clip to the number of clipping shapes
+class Pieces:
+    FIELDS = (
+        'arc', 'slope', 'offset', 'x', 'y', 'radius', 'side',
+        'start', 'end', 'fill', 'clip', 'owner'
+    )
+
+    def __init__(self, **fields):
+        for name in self.FIELDS:
+            setattr(self, name, fields[name])
+
+    def __len__(self):
+        return len(self.start)
+
+    # the pieces of convex polygons, each owned by its polygon; edges are
+    # lower boundaries where they run the way of the polygon's orientation
+    @classmethod
+    def of_polygons(cls, vertices, clipping=False):
+        x1, y1 = vertices[..., 0], vertices[..., 1]
+        x2, y2 = np.roll(x1, -1, axis=1), np.roll(y1, -1, axis=1)
+        orientation = np.sign((x1 * y2 - x2 * y1).sum(axis=1))[:, None]
+        direction = np.sign(x2 - x1) * orientation
+        owner = np.broadcast_to(np.arange(len(vertices))[:, None], x1.shape)
+        kept = direction != 0
+        x1, y1, x2, y2 = x1[kept], y1[kept], x2[kept], y2[kept]
+        slope = (y2 - y1) / (x2 - x1)
+        return cls.made(
+            False,
+            slope=slope,
+            offset=y1 - slope * x1,
+            start=np.minimum(x1, x2),
+            end=np.maximum(x1, x2),
+            delta=direction[kept],
+            owner=owner[kept],
+            clipping=clipping
+        )
+
+    # the lower and upper halves of circles
+    @classmethod
+    def of_circles(cls, circles, clipping=False):
+        circles = circles[circles[:, 2] > 0]
+        x, y, radius = np.tile(circles, (2, 1)).T
+        count = len(circles)
+        return cls.made(
+            True,
+            x=x,
+            y=y,
+            radius=radius,
+            side=np.repeat([-1.0, 1.0], count),
+            start=x - radius,
+            end=x + radius,
+            delta=np.repeat([1, -1], count),
+            owner=np.tile(np.arange(count), 2),
+            clipping=clipping
+        )
+
+    # horizontal lines from start to end
+    @classmethod
+    def of_lines(cls, heights, start, end, delta, clipping=True):
+        return cls.made(
+            False,
+            offset=heights,
+            start=start,
+            end=end,
+            delta=delta,
+            owner=np.zeros(len(heights), dtype=np.int64),
+            clipping=clipping
+        )
+
+    @classmethod
+    def made(cls, arc, start, end, delta, owner, clipping, **fields):
+        count = len(start)
+        zeros = np.zeros(count)
+        delta = np.asarray(delta, dtype=np.int64)
+        return cls(
+            arc=np.full(count, arc),
+            slope=fields.get('slope', zeros),
+            offset=fields.get('offset', zeros),
+            x=fields.get('x', zeros),
+            y=fields.get('y', zeros),
+            radius=fields.get('radius', zeros),
+            side=fields.get('side', zeros),
+            start=start,
+            end=end,
+            fill=np.zeros(count, dtype=np.int64) if clipping else delta,
+            clip=delta if clipping else np.zeros(count, dtype=np.int64),
+            owner=owner
+        )
+
+    @classmethod
+    def joined(cls, pieces):
+        return cls(**{
+            name: np.concatenate([getattr(part, name) for part in pieces])
+            for name in cls.FIELDS
+        })
+
+    def take(self, indices):
+        return Pieces(**{
+            name: getattr(self, name)[indices] for name in self.FIELDS
+        })
+
+    def at(self, x):
+        height = self.radius ** 2 - (x - self.x) ** 2
+        arcs = self.y + self.side * np.sqrt(np.maximum(height, 0))
+        return np.where(self.arc, arcs, self.slope * x + self.offset)
+
+    # the area under every piece from u to v
+    def integral(self, u, v):
+        lines = (v - u) * (self.slope * (u + v) / 2 + self.offset)
+        radius = np.where(self.arc, self.radius, 1)
+        arcs = self.y * (v - u) + self.side * (
+            half_disk(v - self.x, radius) - half_disk(u - self.x, radius)
+        )
+        return np.where(self.arc, arcs, lines)
+
+
+# area under the upper half of a circle around 0 from its left end to t
+def half_disk(t, radius):
+    t = np.clip(t, -radius, radius)
+    return (
+        t * np.sqrt(np.maximum(radius ** 2 - t ** 2, 0)) +
+        radius ** 2 * np.arcsin(t / radius)
+    ) / 2
+
+
+# the boundary pieces of figures of any type, owned by their figures
+def figure_pieces(groups, clipping=False):
+    pieces = []
+    for kind, indices, parameters in groups:
+        if kind.shape == 'circle':
+            found = Pieces.of_circles(parameters, clipping)
+            found.owner = indices[parameters[:, 2] > 0][found.owner]
+        else:
+            found = Pieces.of_polygons(kind.outline(parameters), clipping)
+            found.owner = indices[found.owner]
+        pieces.append(found)
+    return Pieces.joined(pieces)
+
+
+# circles take their areas from their kind, which measures them as area()
+# does, so a figure overlapping no other one adds exactly its area()
+def figure_areas(groups, count):
+    areas = np.zeros(count)
+    for kind, indices, parameters in groups:
+        if kind.shape == 'circle':
+            areas[indices] = kind.areas_of(parameters)
+        else:
+            vertices = kind.outline(parameters)
+            x, y = vertices[..., 0], vertices[..., 1]
+            areas[indices] = np.abs(
+                (x * np.roll(y, -1, axis=1) - np.roll(x, -1, axis=1) * y)
+                .sum(axis=1)
+            ) / 2
+    return areas
+
+
+# the area covered by the figures, where they overlap counted once, and
+# within the region if one is given as a (kind, parameters) figure; circles
+# are measured as circles, not as polygons standing in for them. figures
+# overlapping no other figure and lying wholly in the region add their own
+# areas, the others are swept together
+def covered_area(groups, bounds, region=None):
+    region_box = None
+    if region is not None:
+        kind, parameters = region
+        region_box = kind.bounds_of(parameters[None])[0]
+        meeting = np.flatnonzero(
+            (bounds[:, 2] > region_box[0]) & (bounds[:, 0] < region_box[2]) &
+            (bounds[:, 3] > region_box[1]) & (bounds[:, 1] < region_box[3])
+        )
+        groups = subgroups(groups, meeting, len(bounds))
+        bounds = bounds[meeting]
+    count = len(bounds)
+    if count == 0:
+        return 0.0
+    swept = np.zeros(count, dtype=bool)
+    swept[overlapping_pairs(groups, bounds).ravel()] = True
+    if region is not None:
+        every = np.broadcast_to(parameters, (count, len(parameters)))
+        for x, y in ((0, 1), (0, 3), (2, 1), (2, 3)):
+            swept |= ~contains_point(kind, every, (bounds[:, x], bounds[:, y]))
+    alone = ~swept
+    area = float(figure_areas(groups, count)[alone].sum())
+    if swept.any():
+        area += swept_area(
+            subgroups(groups, np.flatnonzero(swept), count),
+            bounds[swept],
+            region,
+            region_box
+        )
+    return area
+
+
+# the plane is cut into square tiles and every tile into slabs between the
+# x of all ends and crossings of the pieces in it, so that within a slab
+# the pieces keep their order from bottom to top; the covered parts of a
+# slab then lie between pieces whose areas are known exactly
+def swept_area(groups, bounds, region=None, region_box=None):
+    extent = max(
+        bounds[:, 2].max() - bounds[:, 0].min(),
+        bounds[:, 3].max() - bounds[:, 1].min()
+    )
+    size = max(typical_size(bounds), extent / MAX_TILES)
+    _, figures, cell_x, cell_y = cell_entries(bounds, size, np.inf)
+    if region_box is not None:
+        x_min, y_min, x_max, y_max = np.floor(region_box / size)
+        kept = (
+            (cell_x >= x_min) & (cell_x <= x_max) &
+            (cell_y >= y_min) & (cell_y <= y_max)
+        )
+        figures, cell_x, cell_y = figures[kept], cell_x[kept], cell_y[kept]
+    new_tile = np.ones(len(figures), dtype=bool)
+    new_tile[1:] = (cell_x[1:] != cell_x[:-1]) | (cell_y[1:] != cell_y[:-1])
+    tiles = np.cumsum(new_tile) - 1
+    firsts = np.flatnonzero(new_tile)
+
+    pieces = figure_pieces(groups)
+    order = np.argsort(pieces.owner, kind='stable')
+    pieces = pieces.take(order)
+    piece_counts = np.bincount(pieces.owner, minlength=len(bounds))
+    piece_starts = np.cumsum(piece_counts) - piece_counts
+    clipping = None
+    if region is not None:
+        kind, parameters = region
+        clipping = figure_pieces(
+            [(kind, np.array([0]), parameters[None])], clipping=True
+        )
+
+    area = 0.0
+    bounds_of_chunks = np.append(firsts[::TILE_CHUNK], len(figures))
+    for start, end in zip(bounds_of_chunks[:-1], bounds_of_chunks[1:]):
+        area += tiles_area(
+            tiles[start:end] - tiles[start],
+            figures[start:end],
+            cell_x[start:end],
+            cell_y[start:end],
+            size,
+            pieces,
+            piece_starts,
+            piece_counts,
+            clipping
+        )
+    return area
+
+
+# the covered area of tiles, given as entries of the figures meeting them
+# sorted by tile
+def tiles_area(
+    tiles,
+    figures,
+    cell_x,
+    cell_y,
+    size,
+    pieces,
+    piece_starts,
+    piece_counts,
+    clipping
+):
+    firsts = np.flatnonzero(np.append(True, tiles[1:] != tiles[:-1]))
+    count = len(firsts)
+    x_min, y_min = cell_x[firsts] * size, cell_y[firsts] * size
+    x_max, y_max = x_min + size, y_min + size
+
+    # the pieces of the figures in every tile, the bottom and top of the
+    # tile and the region, all limited to the tile
+    counts = piece_counts[figures]
+    found = [pieces.take(spread(piece_starts[figures], counts))]
+    found_tiles = [np.repeat(tiles, counts)]
+    found.append(Pieces.of_lines(
+        np.concatenate((y_min, y_max)),
+        np.tile(x_min, 2),
+        np.tile(x_max, 2),
+        np.repeat([1, -1], count)
+    ))
+    found_tiles.append(np.tile(np.arange(count), 2))
+    if clipping is not None:
+        found.append(clipping.take(np.tile(np.arange(len(clipping)), count)))
+        found_tiles.append(np.repeat(np.arange(count), len(clipping)))
+    entries = Pieces.joined(found)
+    tiles = np.concatenate(found_tiles)
+    entries.start = np.maximum(entries.start, x_min[tiles])
+    entries.end = np.minimum(entries.end, x_max[tiles])
+    order = np.flatnonzero(entries.end > entries.start)
+    order = order[np.argsort(tiles[order], kind='stable')]
+    entries, tiles = entries.take(order), tiles[order]
+
+    # slabs between the ends and crossings of the pieces of every tile
+    event_tiles, event_x = crossing_events(entries, tiles)
+    event_tiles = np.concatenate((tiles, tiles, event_tiles))
+    event_x = np.concatenate((entries.start, entries.end, event_x))
+    order = np.lexsort((event_x, event_tiles))
+    event_tiles, event_x = event_tiles[order], event_x[order]
+    distinct = np.append(True, (
+        (event_tiles[1:] != event_tiles[:-1]) | (event_x[1:] != event_x[:-1])
+    ))
+    event_tiles, event_x = event_tiles[distinct], event_x[distinct]
+
+    # every piece spans the slabs from the event at its start to the one at
+    # its end, both among the events of its tile
+    first = event_index(event_tiles, event_x, tiles, entries.start)
+    counts = event_index(event_tiles, event_x, tiles, entries.end) - first
+    slabs = spread(first, counts)
+    spanning = entries.take(np.repeat(np.arange(len(entries)), counts))
+    u, v = event_x[slabs], event_x[slabs + 1]
+    heights = spanning.at((u + v) / 2)
+    areas = spanning.integral(u, v)
+
+    # going up through a slab, the parts covered by a figure and within all
+    # clipping shapes lie between one piece and the next
+    order = np.lexsort((heights, slabs))
+    slabs, areas = slabs[order], areas[order]
+    covering = np.cumsum(spanning.fill[order]) > 0
+    depth = 1 if clipping is None else 2
+    clipped = np.cumsum(spanning.clip[order]) == depth
+    covered = covering[:-1] & clipped[:-1] & (slabs[1:] == slabs[:-1])
+    return float((areas[1:] - areas[:-1])[covered].sum())
+
+
+# ranges of consecutive indices, from every start on as many as counted
+def spread(starts, counts):
+    offsets = np.cumsum(counts) - counts
+    return (
+        np.repeat(starts, counts) + np.arange(counts.sum()) -
+        np.repeat(offsets, counts)
+    )
+
+
+# the index of the event of every tile and x among the events sorted by
+# tile and x, which hold all of them
+def event_index(event_tiles, event_x, tiles, x):
+    count = len(event_tiles)
+    order = np.lexsort((
+        np.append(np.zeros(count), np.ones(len(tiles))),
+        np.append(event_x, x),
+        np.append(event_tiles, tiles)
+    ))
+    events_before = np.cumsum(order < count) - 1
+    index = np.empty(len(order), dtype=np.int64)
+    index[order] = events_before
+    return index[count:]
+
+
+# the x of the crossings of every two pieces of the same tile, where the
+# order of pieces from bottom to top may change
+def crossing_events(pieces, tiles):
+    firsts = np.flatnonzero(np.append(True, tiles[1:] != tiles[:-1]))
+    ends = np.append(firsts[1:], len(tiles))
+    later = np.repeat(ends, ends - firsts) - np.arange(len(tiles)) - 1
+    first = np.repeat(np.arange(len(tiles)), later)
+    second = first + 1 + np.arange(len(first)) - np.repeat(
+        np.cumsum(later) - later, later
+    )
+    # edges of the same figure only meet at their ends
+    apart = (
+        (pieces.owner[first] != pieces.owner[second]) |
+        (pieces.fill[first] == 0) | (pieces.fill[second] == 0)
+    )
+    first, second = first[apart], second[apart]
+    x = crossings(pieces.take(first), pieces.take(second))
+    low = np.maximum(pieces.start[first], pieces.start[second])[:, None]
+    high = np.minimum(pieces.end[first], pieces.end[second])[:, None]
+    inside = (x > low) & (x < high)
+    return np.broadcast_to(tiles[first][:, None], x.shape)[inside], x[inside]
+
+
+# the x of the up to two points where two pieces, taken as whole lines and
+# circles, meet; nan where they do not
+def crossings(first, second):
+    x = np.full((len(first), 2), np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lines = ~first.arc & ~second.arc
+        slopes = first.slope - second.slope
+        x[lines, 0] = np.where(
+            slopes != 0, (second.offset - first.offset) / slopes, np.nan
+        )[lines]
+
+        # a line y = slope * x + offset and a circle, around its center
+        mixed = first.arc != second.arc
+        line, circle = (second, first), (first, second)
+        slope = np.where(first.arc, *(piece.slope for piece in line))
+        offset = np.where(first.arc, *(piece.offset for piece in line))
+        center_x = np.where(first.arc, *(piece.x for piece in circle))
+        center_y = np.where(first.arc, *(piece.y for piece in circle))
+        radius = np.where(first.arc, *(piece.radius for piece in circle))
+        shift = slope * center_x + offset - center_y
+        a = 1 + slope ** 2
+        b = slope * shift
+        root = np.sqrt(b ** 2 - a * (shift ** 2 - radius ** 2))
+        x[mixed, 0] = (center_x + (-b - root) / a)[mixed]
+        x[mixed, 1] = (center_x + (-b + root) / a)[mixed]
+
+        # two circles meet on the line square to the one between their
+        # centers
+        arcs = first.arc & second.arc
+        dx, dy = second.x - first.x, second.y - first.y
+        distance = np.hypot(dx, dy)
+        along = (
+            first.radius ** 2 - second.radius ** 2 + distance ** 2
+        ) / (2 * distance)
+        across = np.sqrt(first.radius ** 2 - along ** 2)
+        x[arcs, 0] = (first.x + (along * dx - across * dy) / distance)[arcs]
+        x[arcs, 1] = (first.x + (along * dx + across * dy) / distance)[arcs]
+    return x
@@ -0,0 +1,287 @@
+import math
+from itertools import product
+
+import numpy as np
+
+from src.geometry.containment import contains_point
+from src.geometry.bounds import figure_bounds, figure_groups
+
+# points looked up in a CellTable at once
+HIT_CHUNK = 1 << 16
+
+# figures spanning more cells than this are kept aside and looked at by every
+# query instead of being filed under each of their cells
+MAX_CELLS = 64
+
+
+class GridEntry:
+    def __init__(self, figure, order, box):
+        self.figure = figure
+        self.order = order
+        self.box = box
+        self.revision = figure.geometry_revision()
+        self.count = 1
+        self.cells = None
+
+
+# figures are filed under every cell of a square grid their bounding box
+# meets, so a query only looks at the figures of the cells it covers; the
+# owner of the grid refreshes it once figures changed, which files those
+# whose geometry changed since they were filed again
+class UniformGrid:
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.large = {}
+        self.entries = {}
+        self.next_order = 0
+
+    # cells twice as large as a typical figure keep both the number of cells
+    # per figure and the number of figures per cell small
+    @classmethod
+    def build(cls, figures):
+        bounds = figure_bounds(figures)
+        grid = cls(2 * typical_size(bounds))
+        cells = np.floor(bounds / grid.cell_size).astype(int).tolist()
+        for figure, box, cell_range in zip(figures, bounds.tolist(), cells):
+            grid.insert(figure, box, cell_range)
+        return grid
+
+    def insert(self, figure, box=None, cell_range=None):
+        key = id(figure)
+        if key in self.entries:
+            self.entries[key].count += 1
+            return
+        if box is None:
+            box = figure_bounds([figure])[0].tolist()
+        entry = GridEntry(figure, self.next_order, box)
+        self.next_order += 1
+        self.entries[key] = entry
+        self.file(key, entry, cell_range)
+
+    # a figure added more than once stays until it was removed as often
+    def remove(self, figure):
+        key = id(figure)
+        entry = self.entries[key]
+        entry.count -= 1
+        if entry.count > 0:
+            return
+        self.unfile(key, entry)
+        del self.entries[key]
+
+    def clear(self):
+        self.cells = {}
+        self.large = {}
+        self.entries = {}
+
+    def refresh(self):
+        changed = [
+            entry for entry in self.entries.values()
+            if entry.figure.geometry_revision() != entry.revision
+        ]
+        if not changed:
+            return
+        bounds = figure_bounds([entry.figure for entry in changed])
+        for entry, box in zip(changed, bounds.tolist()):
+            key = id(entry.figure)
+            self.unfile(key, entry)
+            entry.box = box
+            entry.revision = entry.figure.geometry_revision()
+            self.file(key, entry)
+
+    def cell_range(self, box):
+        return [math.floor(value / self.cell_size) for value in box]
+
+    def file(self, key, entry, cell_range=None):
+        if cell_range is None:
+            cell_range = self.cell_range(entry.box)
+        x_min, y_min, x_max, y_max = cell_range
+        if (x_max - x_min + 1) * (y_max - y_min + 1) > MAX_CELLS:
+            entry.cells = None
+            self.large[key] = entry
+            return
+        if x_min == x_max and y_min == y_max:
+            entry.cells = [(x_min, y_min)]
+        else:
+            entry.cells = list(product(
+                range(x_min, x_max + 1), range(y_min, y_max + 1)
+            ))
+        cells = self.cells
+        for cell in entry.cells:
+            if cell in cells:
+                cells[cell][key] = entry
+            else:
+                cells[cell] = {key: entry}
+
+    def unfile(self, key, entry):
+        if entry.cells is None:
+            del self.large[key]
+            return
+        for cell in entry.cells:
+            filed = self.cells[cell]
+            del filed[key]
+            if not filed:
+                del self.cells[cell]
+
+    # a query covering more cells than are in use walks the cells in use
+    def candidates(self, box):
+        x_min, y_min, x_max, y_max = self.cell_range(box)
+        if (x_max - x_min + 1) * (y_max - y_min + 1) > len(self.cells):
+            cells = (
+                filed for (x, y), filed in self.cells.items()
+                if x_min <= x <= x_max and y_min <= y <= y_max
+            )
+        else:
+            cells = (
+                self.cells[cell]
+                for cell in product(
+                    range(x_min, x_max + 1), range(y_min, y_max + 1)
+                )
+                if cell in self.cells
+            )
+        found = dict(self.large)
+        for filed in cells:
+            found.update(filed)
+        return list(found.values())
+
+    # figures whose bounding boxes meet the box, in the order they were added
+    def figures_in(self, box):
+        x_min, y_min, x_max, y_max = box
+        found = [
+            entry for entry in self.candidates(box)
+            if entry.box[2] >= x_min and entry.box[0] <= x_max and
+            entry.box[3] >= y_min and entry.box[1] <= y_max
+        ]
+        found.sort(key=lambda entry: entry.order)
+        return [entry.figure for entry in found]
+
+    # figures containing the point, their boundaries included
+    def figures_at(self, point):
+        found = self.figures_in((*point, *point))
+        inside = np.zeros(len(found), dtype=bool)
+        for kind, indices, parameters in figure_groups(found):
+            inside[indices] = contains_point(kind, parameters, point)
+        return [figure for figure, hit in zip(found, inside) if hit]
+
+
+# every cell of a square grid each box meets, as one (figure, x, y) entry per
+# figure and cell, sorted by cell; figures meeting more than max_cells cells
+# are left out and given apart
+def cell_entries(bounds, size, max_cells=MAX_CELLS):
+    cells = np.floor(bounds / size).astype(np.int64)
+    widths = cells[:, 2] - cells[:, 0] + 1
+    heights = cells[:, 3] - cells[:, 1] + 1
+    large = widths * heights > max_cells
+    small = np.flatnonzero(~large)
+    counts = (widths * heights)[small]
+    figures = np.repeat(small, counts)
+    steps = np.arange(len(figures)) - np.repeat(
+        np.cumsum(counts) - counts, counts
+    )
+    x = cells[figures, 0] + steps % widths[figures]
+    y = cells[figures, 1] + steps // widths[figures]
+    order = np.lexsort((figures, y, x))
+    return np.flatnonzero(large), figures[order], x[order], y[order]
+
+
+def typical_size(bounds):
+    sizes = np.maximum(
+        bounds[:, 2] - bounds[:, 0], bounds[:, 3] - bounds[:, 1]
+    )
+    size = float(np.median(sizes)) if len(sizes) else 0
+    if size > 0:
+        return size
+    if len(bounds):
+        extent = max(
+            bounds[:, 2].max() - bounds[:, 0].min(),
+            bounds[:, 3].max() - bounds[:, 1].min()
+        )
+        size = extent / math.sqrt(len(bounds))
+    return size if size > 0 else 1
+
+
+# figures filed under the cells of a grid all at once, for looking up many
+# points together: each point is only tested against the figures filed
+# under its cell and those spanning too many cells to be filed
+class CellTable:
+    def __init__(self, groups, bounds):
+        self.groups = groups
+        self.bounds = bounds
+        self.codes = np.empty(len(bounds), dtype=np.int64)
+        self.rows = np.empty(len(bounds), dtype=np.int64)
+        for code, (_, indices, _) in enumerate(groups):
+            self.codes[indices] = code
+            self.rows[indices] = np.arange(len(indices))
+        self.cell_size = typical_size(bounds)
+        self.large, self.figures, x, y = cell_entries(bounds, self.cell_size)
+        self.origin = (x.min(), y.min()) if len(x) else (0, 0)
+        self.height = y.max() - self.origin[1] + 1 if len(y) else 1
+        keys = self.cell_keys(x, y)
+        self.keys, self.starts = np.unique(keys, return_index=True)
+        self.ends = np.append(self.starts[1:], len(keys))
+
+    def cell_keys(self, x, y):
+        return (x - self.origin[0]) * self.height + y - self.origin[1]
+
+    # (point, figure) pairs of the points and the figures that may contain
+    # them; the points are looked up in the order of their cells, which is
+    # much faster than in a random order
+    def candidates(self, x, y):
+        cell_x = np.floor(x / self.cell_size).astype(np.int64)
+        cell_y = np.floor(y / self.cell_size).astype(np.int64)
+        keys = np.where(
+            (cell_y >= self.origin[1]) &
+            (cell_y < self.origin[1] + self.height),
+            self.cell_keys(cell_x, cell_y),
+            -1
+        )
+        order = np.argsort(keys)
+        keys = keys[order]
+        found = np.searchsorted(self.keys, keys)
+        filed = found < len(self.keys)
+        filed[filed] = self.keys[found[filed]] == keys[filed]
+        found = found[filed]
+        first = self.starts[found]
+        counts = self.ends[found] - first
+        starts = np.repeat(np.cumsum(counts) - counts, counts)
+        entries = np.repeat(first, counts) + np.arange(len(starts)) - starts
+        points = np.repeat(order[filed], counts)
+        figures = self.figures[entries]
+        # figures too large to be filed are paired with every point
+        points = np.concatenate(
+            (points, np.tile(np.arange(len(x)), len(self.large)))
+        )
+        figures = np.concatenate((figures, np.repeat(self.large, len(x))))
+        return points, figures
+
+    # which of the points are in the figures paired with them, boundaries
+    # included
+    def contain(self, x, y, points, figures):
+        box = self.bounds[figures]
+        x, y = x[points], y[points]
+        inside = (
+            (box[:, 0] <= x) & (x <= box[:, 2]) &
+            (box[:, 1] <= y) & (y <= box[:, 3])
+        )
+        codes = self.codes[figures]
+        for code, (kind, _, parameters) in enumerate(self.groups):
+            selected = np.flatnonzero(inside & (codes == code))
+            if len(selected):
+                inside[selected] = contains_point(
+                    kind,
+                    parameters[self.rows[figures[selected]]],
+                    (x[selected], y[selected])
+                )
+        return inside
+
+    # for every point the index of the last figure containing it, the one
+    # drawn on top, or -1
+    def topmost(self, x, y):
+        hits = np.full(len(x), -1)
+        for start in range(0, len(x), HIT_CHUNK):
+            chunk_x = x[start:start + HIT_CHUNK]
+            chunk_y = y[start:start + HIT_CHUNK]
+            points, figures = self.candidates(chunk_x, chunk_y)
+            inside = self.contain(chunk_x, chunk_y, points, figures)
+            np.maximum.at(hits, start + points[inside], figures[inside])
+        return hits
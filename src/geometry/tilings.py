@@ -0,0 +1,68 @@
+import numpy as np
+
+from src.geometry.transforms import integers
+
+SQRT3 = np.sqrt(3)
+
+
+# the generators below give the stacked parameters() of the figures of a
+# tiling, row by row from the origin, and with which columns may keep their
+# ints as the transforms do
+
+
+# squares (x, y, side, rotation) of cols by rows cells, the first with its
+# corner at the origin
+def square_grid(origin, side, cols, rows):
+    y, x = np.divmod(np.arange(cols * rows), cols)
+    parameters = np.column_stack((
+        origin[0] + side * x,
+        origin[1] + side * y,
+        np.full(len(x), side),
+        np.zeros(len(x))
+    ))
+    exact = np.array([
+        integers(origin[0], side), integers(origin[1], side), integers(side),
+        True
+    ])
+    return parameters, exact
+
+
+# rows of cols equilateral triangles (x1, y1, x2, y2, x3, y3), pointing up
+# and down by turns and starting every other row pointing down, so that
+# rows meet corner to corner; the first row lies on the origin
+def triangle_grid(origin, side, cols, rows):
+    row, col = np.divmod(np.arange(cols * rows), cols)
+    height = side * SQRT3 / 2
+    left = origin[0] + side * col / 2
+    bottom = origin[1] + height * row
+    top = bottom + height
+    up = (row + col) % 2 == 0
+    parameters = np.column_stack((
+        left,
+        np.where(up, bottom, top),
+        left + side / 2,
+        np.where(up, top, bottom),
+        left + side,
+        np.where(up, bottom, top)
+    ))
+    # corners are kept counterclockwise
+    parameters[up] = parameters[up][:, [0, 1, 4, 5, 2, 3]]
+    return parameters, np.zeros(6, dtype=bool)
+
+
+# cols by rows regular hexagons with flat tops, every other column shifted
+# up by half a hexagon; the first is centered on the origin. there being no
+# hexagons, each is cut into three rhombs (x, y, side, angle, rotation)
+# meeting at its center
+def hex_grid(origin, side, cols, rows):
+    row, col = np.divmod(np.repeat(np.arange(cols * rows), 3), cols)
+    part = np.tile([0, 1, 2], cols * rows)
+    parameters = np.column_stack((
+        origin[0] + 1.5 * side * col,
+        origin[1] + SQRT3 * side * (row + col % 2 / 2),
+        np.full(len(row), side),
+        np.full(len(row), 120),
+        120 * part
+    ))
+    exact = np.array([False, False, integers(side), True, True])
+    return parameters, exact
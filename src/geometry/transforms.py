@@ -0,0 +1,100 @@
+import math
+
+import numpy as np
+
+# cosine and sine of the quarter turns, exact so that figures turned by
+# multiples of 90 degrees keep whole coordinates
+QUARTER_TURNS = np.array([[1, 0], [0, 1], [-1, 0], [0, -1]])
+
+# numbers of figures that are angles rather than lengths
+ANGLES = ('angle', 'rotation')
+
+
+def turn(degrees):
+    if degrees % 90 == 0:
+        cos, sin = QUARTER_TURNS[int(degrees // 90) % 4].tolist()
+        return cos, sin
+    angle = math.radians(degrees)
+    return math.cos(angle), math.sin(angle)
+
+
+def turns(degrees):
+    angle = np.radians(degrees)
+    cos, sin = np.cos(angle), np.sin(angle)
+    quarter = degrees % 90 == 0
+    if quarter.any():
+        steps = (degrees[quarter] // 90).astype(int) % 4
+        cos[quarter], sin[quarter] = QUARTER_TURNS[steps].T
+    return cos, sin
+
+
+# outlines of figures turned by their rotation in degrees around their
+# position; those not turned are left exactly as they were
+def turned(vertices, x, y, rotation):
+    if not rotation.any():
+        return vertices
+    cos, sin = turns(rotation)
+    cos, sin = cos[:, None], sin[:, None]
+    dx = vertices[..., 0] - x[:, None]
+    dy = vertices[..., 1] - y[:, None]
+    return np.stack(
+        [x[:, None] + dx * cos - dy * sin, y[:, None] + dx * sin + dy * cos],
+        axis=-1
+    )
+
+
+# the transforms below take the stacked parameters() of figures of one type
+# and give their new parameters, with which columns may keep their ints:
+# those left alone or only changed by ints
+
+
+def translate(kind, parameters, dx, dy):
+    points = 2 * len(kind.points)
+    moved = parameters.copy()
+    moved[:, 0:points:2] += dx
+    moved[:, 1:points:2] += dy
+    exact = np.ones(parameters.shape[1], dtype=bool)
+    exact[:points] = integers(dx, dy)
+    return moved, exact
+
+
+def scale(kind, parameters, factor, origin):
+    points = 2 * len(kind.points)
+    lengths = [
+        points + column
+        for column, name in enumerate(kind.numbers)
+        if name not in ANGLES
+    ]
+    x, y = origin
+    scaled = parameters.copy()
+    scaled[:, 0:points:2] = x + (parameters[:, 0:points:2] - x) * factor
+    scaled[:, 1:points:2] = y + (parameters[:, 1:points:2] - y) * factor
+    scaled[:, lengths] *= factor
+    exact = np.ones(parameters.shape[1], dtype=bool)
+    exact[:points] = integers(factor, *origin)
+    exact[lengths] = integers(factor)
+    return scaled, exact
+
+
+# points turn around the origin, and figures with a rotation of their own
+# turn by as much around their position
+def rotate(kind, parameters, degrees, origin):
+    points = 2 * len(kind.points)
+    cos, sin = turn(degrees)
+    x, y = origin
+    dx = parameters[:, 0:points:2] - x
+    dy = parameters[:, 1:points:2] - y
+    rotated = parameters.copy()
+    rotated[:, 0:points:2] = x + dx * cos - dy * sin
+    rotated[:, 1:points:2] = y + dx * sin + dy * cos
+    exact = np.ones(parameters.shape[1], dtype=bool)
+    exact[:points] = degrees % 90 == 0 and integers(*origin)
+    if 'rotation' in kind.numbers:
+        column = points + kind.numbers.index('rotation')
+        rotated[:, column] += degrees
+        exact[column] = integers(degrees)
+    return rotated, exact
+
+
+def integers(*values):
+    return all(isinstance(value, int) for value in values)
@@ -1,10 +1,20 @@
+import math
+import numpy as np
+
+from src.constants import MAXIMUM_ARRAY_SIZE
 from src.error_handling.interpreter_error import (
     BaseForInvalidConstructorArgumentsError,
     BaseForInvalidFunCallArgumentsError,
+    BaseForInvalidNumberOfArgumentsError,
     BaseForTypeCastingError
 )
 from src.interpreter.symbol_table import (
     Circle,
+    ColumnarScene,
+    FloatArray,
+    IntArray,
+    Map,
+    NumericArray,
     Parallelogram,
     Rhomb,
     Symbol,
@@ -61,7 +71,33 @@ class GlobalContext:
             'Rhomb': rhomb_constructor,
             'Parallelogram': parallelogram_constructor,
             'Trapeze': trapeze_constructor,
-            'Scene': scene_constructor
+            'Scene': scene_constructor,
+            'ColumnarScene': columnar_scene_constructor,
+            'Map': map_constructor,
+            'IntArray': int_array_constructor,
+            'FloatArray': float_array_constructor,
+            'arange': arange_function,
+            'linspace': linspace_function,
+            'sqrt': sqrt_function,
+            'sin': sin_function,
+            'cos': cos_function,
+            'tan': tan_function,
+            'atan2': atan2_function,
+            'radians': radians_function,
+            'abs': abs_function,
+            'min': min_function,
+            'max': max_function,
+            'floor': floor_function,
+            'ceil': ceil_function,
+            'hypot': hypot_function,
+            'pi': pi_function,
+            'pmap': parallel_map_function
+        }
+        # added after scripts could already define functions of the same
+        # name, so a user definition replaces them instead of failing
+        self.shadowable = {
+            'arange', 'linspace', 'sqrt', 'sin', 'cos', 'tan', 'atan2',
+            'radians', 'abs', 'min', 'max', 'floor', 'ceil', 'hypot', 'pi'
         }
 
     def get_embedded_function(self, name):
@@ -78,6 +114,10 @@ class GlobalContext:
 
     def set_function(self, name, function):
         self.functions[name] = function
+        self.shadowable.discard(name)
+
+    def is_redefinition(self, name):
+        return name in self.functions and name not in self.shadowable
 
 
 class Function:
@@ -103,6 +143,14 @@ class EmbeddedFunction(Function):
         visitor.do_for_embedded_function(self)
 
 
+class ParallelMap(Function):
+    def __init__(self):
+        super().__init__(None)
+
+    def accept_visitor(self, visitor):
+        visitor.do_for_parallel_map(self)
+
+
 def do_for_print(arguments):
     string = ''
     for arg in arguments:
@@ -192,10 +240,20 @@ def do_for_trapeze(arguments):
 
 
 def do_for_scene(arguments):
+    check_scene_arguments(arguments, 'Scene')
+    return Symbol(Scene(arguments))
+
+
+def do_for_columnar_scene(arguments):
+    check_scene_arguments(arguments, 'ColumnarScene')
+    return Symbol(ColumnarScene(arguments))
+
+
+def check_scene_arguments(arguments, name):
     if (
         isinstance(arguments[0], list) is False
     ):
-        raise BaseForInvalidConstructorArgumentsError('Scene')
+        raise BaseForInvalidConstructorArgumentsError(name)
     for arg in arguments[0]:
         if (
             isinstance(arg.get_value(), (
@@ -208,8 +266,154 @@ def do_for_scene(arguments):
                 Trapeze
             )) is False
         ):
-            raise BaseForInvalidConstructorArgumentsError('Scene')
-    return Symbol(Scene(arguments))
+            raise BaseForInvalidConstructorArgumentsError(name)
+
+
+def do_for_map(arguments):
+    if len(arguments) > 1:
+        raise BaseForInvalidConstructorArgumentsError('Map')
+    pairs = []
+    if arguments:
+        if isinstance(arguments[0], list) is False:
+            raise BaseForInvalidConstructorArgumentsError('Map')
+        for arg in arguments[0]:
+            pair = arg.get_value()
+            if (
+                isinstance(pair, list) is False or
+                len(pair) != 2 or
+                type(pair[0].get_value()) not in Map.KEY_TYPES
+            ):
+                raise BaseForInvalidConstructorArgumentsError('Map')
+            pairs.append((pair[0].get_value(), pair[1].get_value()))
+    return Symbol(Map(pairs))
+
+
+def make_array(array_class, arguments):
+    if isinstance(arguments[0], NumericArray):
+        return Symbol(array_class(
+            arguments[0].values.astype(array_class.dtype)
+        ))
+    if isinstance(arguments[0], list) is False:
+        raise BaseForInvalidConstructorArgumentsError(array_class.type_name)
+    values = [arg.get_value() for arg in arguments[0]]
+    allowed_types = int if array_class is IntArray else (int, float)
+    for value in values:
+        if isinstance(value, allowed_types) is False:
+            raise BaseForInvalidConstructorArgumentsError(
+                array_class.type_name
+            )
+    return Symbol(array_class(np.array(values, dtype=array_class.dtype)))
+
+
+def do_for_int_array(arguments):
+    return make_array(IntArray, arguments)
+
+
+def do_for_float_array(arguments):
+    return make_array(FloatArray, arguments)
+
+
+def do_for_arange(arguments):
+    if len(arguments) not in (2, 3):
+        raise BaseForInvalidNumberOfArgumentsError(2, len(arguments))
+    for arg in arguments:
+        if isinstance(arg, (int, float)) is False:
+            raise BaseForInvalidFunCallArgumentsError('arange')
+    start, stop, step = (*arguments, 1)[:3]
+    try:
+        size = math.ceil((stop - start) / step)
+    except (ArithmeticError, ValueError):
+        raise BaseForInvalidFunCallArgumentsError('arange')
+    if size > MAXIMUM_ARRAY_SIZE:
+        raise BaseForInvalidFunCallArgumentsError('arange')
+    return Symbol(NumericArray.wrap(np.arange(*arguments)))
+
+
+def do_for_linspace(arguments):
+    start, stop, count = arguments
+    if (
+        isinstance(start, (int, float)) is False or
+        isinstance(stop, (int, float)) is False or
+        isinstance(count, int) is False or
+        count < 0 or
+        count > MAXIMUM_ARRAY_SIZE
+    ):
+        raise BaseForInvalidFunCallArgumentsError('linspace')
+    return Symbol(FloatArray(np.linspace(start, stop, count)))
+
+
+def unary_math_function(name, function, array_function):
+    def do_for_math(arguments):
+        value = arguments[0]
+        if isinstance(value, (int, float)):
+            try:
+                return Symbol(function(value))
+            except (ValueError, OverflowError):
+                raise BaseForInvalidFunCallArgumentsError(name)
+        if isinstance(value, NumericArray):
+            with np.errstate(invalid='raise', divide='raise'):
+                try:
+                    return Symbol(NumericArray.wrap(
+                        array_function(value.values)
+                    ))
+                except FloatingPointError:
+                    raise BaseForInvalidFunCallArgumentsError(name)
+        raise BaseForInvalidFunCallArgumentsError(name)
+    return EmbeddedFunction(do_for_math, 1)
+
+
+def binary_math_function(name, function, array_function):
+    def do_for_math(arguments):
+        first, second = arguments
+        if (
+            isinstance(first, (int, float)) and
+            isinstance(second, (int, float))
+        ):
+            return Symbol(function(first, second))
+        if (
+            isinstance(first, (int, float, NumericArray)) and
+            isinstance(second, (int, float, NumericArray))
+        ):
+            first = NumericArray.operand(first)
+            second = NumericArray.operand(second)
+            if (
+                isinstance(first, np.ndarray) and
+                isinstance(second, np.ndarray) and
+                first.shape != second.shape
+            ):
+                raise BaseForInvalidFunCallArgumentsError(name)
+            return Symbol(NumericArray.wrap(array_function(first, second)))
+        raise BaseForInvalidFunCallArgumentsError(name)
+    return EmbeddedFunction(do_for_math, 2)
+
+
+def extremum_function(name, function):
+    def do_for_extremum(arguments):
+        values = arguments
+        if len(arguments) == 1:
+            if isinstance(arguments[0], NumericArray):
+                return arguments[0].methods[name]([])
+            if isinstance(arguments[0], list):
+                values = [arg.get_value() for arg in arguments[0]]
+        if len(values) == 0:
+            raise BaseForInvalidFunCallArgumentsError(name)
+        for value in values:
+            if isinstance(value, (int, float)) is False:
+                raise BaseForInvalidFunCallArgumentsError(name)
+        return Symbol(function(values))
+    return EmbeddedFunction(do_for_extremum)
+
+
+def floor_array(values):
+    return np.floor(values).astype(IntArray.dtype)
+
+
+def ceil_array(values):
+    return np.ceil(values).astype(IntArray.dtype)
+
+
+def do_for_pi(arguments):
+    return Symbol(math.pi)
 
 
 def do_for_str(arguments):
@@ -243,6 +447,26 @@ rhomb_constructor = EmbeddedFunction(do_for_rhomb, 3)
 parallelogram_constructor = EmbeddedFunction(do_for_parallelogram, 4)
 trapeze_constructor = EmbeddedFunction(do_for_trapeze, 4)
 scene_constructor = EmbeddedFunction(do_for_scene, 1)
+columnar_scene_constructor = EmbeddedFunction(do_for_columnar_scene, 1)
+map_constructor = EmbeddedFunction(do_for_map)
+int_array_constructor = EmbeddedFunction(do_for_int_array, 1)
+float_array_constructor = EmbeddedFunction(do_for_float_array, 1)
+arange_function = EmbeddedFunction(do_for_arange)
+linspace_function = EmbeddedFunction(do_for_linspace, 3)
+sqrt_function = unary_math_function('sqrt', math.sqrt, np.sqrt)
+sin_function = unary_math_function('sin', math.sin, np.sin)
+cos_function = unary_math_function('cos', math.cos, np.cos)
+tan_function = unary_math_function('tan', math.tan, np.tan)
+radians_function = unary_math_function('radians', math.radians, np.radians)
+abs_function = unary_math_function('abs', abs, np.abs)
+floor_function = unary_math_function('floor', math.floor, floor_array)
+ceil_function = unary_math_function('ceil', math.ceil, ceil_array)
+atan2_function = binary_math_function('atan2', math.atan2, np.arctan2)
+hypot_function = binary_math_function('hypot', math.hypot, np.hypot)
+min_function = extremum_function('min', min)
+max_function = extremum_function('max', max)
+pi_function = EmbeddedFunction(do_for_pi, 0)
+parallel_map_function = ParallelMap()
 str_cast = EmbeddedFunction(do_for_str, 1)
 int_cast = EmbeddedFunction(do_for_int, 1)
 float_cast = EmbeddedFunction(do_for_float, 1)
@@ -0,0 +1,80 @@
+import time
+from collections import Counter
+
+
+class InstrumentationHook:
+    def node_enter(self, node):
+        pass
+
+    def node_exit(self, node):
+        pass
+
+
+# number of evaluations and time spent per node type -- inclusive time
+# contains the time of child nodes, exclusive time does not
+class NodeCounters(InstrumentationHook):
+    def __init__(self):
+        self.counts = Counter()
+        self.inclusive = Counter()
+        self.exclusive = Counter()
+        self.started = []
+
+    def node_enter(self, node):
+        self.started.append([time.perf_counter(), 0])
+
+    def node_exit(self, node):
+        start, children = self.started.pop()
+        elapsed = time.perf_counter() - start
+        name = type(node).__name__
+        self.counts[name] += 1
+        self.inclusive[name] += elapsed
+        self.exclusive[name] += elapsed - children
+        if self.started:
+            self.started[-1][1] += elapsed
+
+    def report(self, top=None):
+        lines = [
+            f'{"count":>10}{"exclusive s":>13}{"inclusive s":>13}  node'
+        ]
+        for name, _ in self.exclusive.most_common(top):
+            lines.append(
+                f'{self.counts[name]:>10}'
+                f'{self.exclusive[name]:>13.3f}'
+                f'{self.inclusive[name]:>13.3f}  {name}'
+            )
+        return '\n'.join(lines)
+
+
+def instrumented(method, hooks):
+    def call_with_hooks(node):
+        for hook in hooks:
+            hook.node_enter(node)
+        try:
+            method(node)
+        finally:
+            for hook in reversed(hooks):
+                hook.node_exit(node)
+    return call_with_hooks
+
+
+# hooks are called from wrappers set on the interpreter instance, so an
+# interpreter without hooks runs the plain visitor methods of its class
+def instrument(interpreter):
+    interpreter.uninstrumented = {}
+    for name in dir(type(interpreter)):
+        if name.startswith('do_for_'):
+            interpreter.uninstrumented[name] = vars(interpreter).get(name)
+            setattr(
+                interpreter,
+                name,
+                instrumented(getattr(interpreter, name), interpreter.hooks)
+            )
+
+
+def uninstrument(interpreter):
+    for name, method in interpreter.uninstrumented.items():
+        if method is None:
+            delattr(interpreter, name)
+        else:
+            setattr(interpreter, name, method)
+    interpreter.uninstrumented = {}
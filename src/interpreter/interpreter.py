@@ -1,7 +1,22 @@
+import copy
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+
+from src.constants import STEPS_BETWEEN_CLOCK_CHECKS
 from src.error_handling.interpreter_error import (
     BaseForInvalidNumberOfArgumentsError,
+    BaseForInvalidTypeError,
+    BaseForMismatchedArraySizesError,
+    BaseForNonExistingKeyError,
+    BaseForReadOnlyAttributeError,
+    BaseForStepLimitError,
     BreakOutsideLoopError,
     DivisionByZeroError,
+    FileOutputError,
     FunctionRedefinitionError,
     IndexOutOfRangeError,
     InvalidConstructorArgumentsError,
@@ -11,13 +26,19 @@ from src.error_handling.interpreter_error import (
     InvalidTypeError,
     InvalidVariableAssignmentError,
     IterableNameError,
+    MismatchedArraySizesError,
     MismatchedTypesError,
     NonExistingAttributeError,
     NonExistingFunctionError,
+    NonExistingKeyError,
     NonExistingMethodError,
     NonExistingVariableError,
+    NumericOverflowError,
+    ReadOnlyAttributeError,
     RecursionLimitError,
     ReturnOutsideFunctionError,
+    StepLimitError,
+    TimeLimitError,
     TypeCastingError,
     VariableRedeclarationError
 )
@@ -63,16 +84,40 @@ from src.interpreter.context import (
     Context,
     EmbeddedFunction,
     GlobalContext,
+    ParallelMap,
     Scope,
     UserFunction
 )
-from src.interpreter.symbol_table import Symbol
+from src.interpreter.instrumentation import instrument, uninstrument
+from src.interpreter.parallel import (
+    call_in_worker,
+    collect_parallel_functions,
+    init_worker
+)
+from src.interpreter.symbol_table import NumericArray, Symbol
 from src.parser.visitor import Visitor
+from src.stats import measure
+
+# methods that render figures, to the file named by their first argument
+# when it is a string; their time is counted in the render phase
+RENDER_METHODS = ('render', 'export_svg', 'rasterize', 'render_tiles')
 
 
 class Interpreter(Visitor):
-    def __init__(self, max_recursion_depth):
+    def __init__(
+        self,
+        max_recursion_depth,
+        max_steps=None,
+        timeout=None,
+        output_dir=None
+    ):
         self.max_recursion_depth = max_recursion_depth
+        self.max_steps = max_steps
+        self.timeout = timeout
+        self.output_dir = output_dir
+        self.steps = 0
+        self.deadline = None
+        self.next_limit_check = math.inf
         self.global_scope = Scope()
         self.global_context = GlobalContext(self.global_scope)
         self.context_stack = [self.global_context]
@@ -81,6 +126,69 @@ class Interpreter(Visitor):
         self.recursion_counter = 0
         self.ret = False
         self.last_result = None
+        self.hooks = []
+        self.uninstrumented = {}
+        self.start_clock()
+
+    def start_clock(self):
+        if self.timeout is not None:
+            self.deadline = time.monotonic() + self.timeout
+        self.schedule_limit_check()
+
+    def schedule_limit_check(self):
+        next_check = math.inf
+        if self.max_steps is not None:
+            next_check = self.max_steps
+        if self.deadline is not None:
+            next_check = min(
+                next_check,
+                self.steps + STEPS_BETWEEN_CLOCK_CHECKS
+            )
+        self.next_limit_check = next_check
+
+    # loop iterations and function calls are the only places where a program
+    # can spend unbounded time, so they are the only ones counted
+    def count_step(self, node):
+        self.steps += 1
+        if self.steps > self.next_limit_check:
+            self.check_limits(node)
+
+    def check_limits(self, node):
+        if self.max_steps is not None and self.steps > self.max_steps:
+            raise StepLimitError(node.position, self.max_steps)
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise TimeLimitError(node.position, self.timeout)
+        self.schedule_limit_check()
+
+    def remaining_limits(self):
+        max_steps = None
+        timeout = None
+        if self.max_steps is not None:
+            max_steps = self.max_steps - self.steps
+        if self.deadline is not None:
+            timeout = self.deadline - time.monotonic()
+        return max_steps, timeout
+
+    # programs may only write files inside the output directory, and none
+    # at all when there is no output directory
+    def output_path(self, node, path):
+        if self.output_dir is None:
+            raise FileOutputError(node.position, path)
+        directory = os.path.realpath(self.output_dir)
+        resolved = os.path.realpath(os.path.join(directory, path))
+        if os.path.commonpath([directory, resolved]) != directory:
+            raise FileOutputError(node.position, path)
+        return resolved
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+        if len(self.hooks) == 1:
+            instrument(self)
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+        if not self.hooks:
+            uninstrument(self)
 
     def current_context(self):
         return self.context_stack[-1]
@@ -97,7 +205,7 @@ class Interpreter(Visitor):
             self.last_result = None
 
     def do_for_function_definition(self, node: FunctionDefinition):
-        if self.global_context.get_function(node.identifier):
+        if self.global_context.is_redefinition(node.identifier):
             raise FunctionRedefinitionError(
                 node.position,
                 node.identifier
@@ -106,9 +214,17 @@ class Interpreter(Visitor):
         self.global_context.set_function(node.identifier, function)
 
     def do_for_fun_call(self, node: FunCall):
+        self.count_step(node)
         new_context = Context(self.global_scope)
         self.context_stack.append(new_context)
         if function := self.global_context.get_function(node.identifier):
+            # the state of the caller, given back when the call returns, so
+            # that a function may return after calling others or pmap
+            caller = (
+                self.in_funcall,
+                self.current_function,
+                self.recursion_counter
+            )
             self.in_funcall = True
             if self.current_function == function:
                 self.recursion_counter += 1
@@ -146,9 +262,13 @@ class Interpreter(Visitor):
                     node.position,
                     e.fun_name
                 )
-            self.in_funcall = False
-            self.current_function = None
-            self.recursion_counter = 0
+            except BaseForStepLimitError:
+                raise StepLimitError(node.position, self.max_steps)
+            (
+                self.in_funcall,
+                self.current_function,
+                self.recursion_counter
+            ) = caller
             self.ret = False
             self.context_stack.pop()
 
@@ -165,7 +285,7 @@ class Interpreter(Visitor):
             arg.accept_visitor(self)
             arguments.append(self.last_result.value)
         if (
-            node.number_of_parameters and
+            node.number_of_parameters is not None and
             len(arguments) != node.number_of_parameters
         ):
             raise BaseForInvalidNumberOfArgumentsError(
@@ -178,6 +298,69 @@ class Interpreter(Visitor):
             e.got = type(arguments[0]).__name__
             raise e
 
+    def do_for_parallel_map(self, node: ParallelMap):
+        call_arguments = self.last_result
+        if len(call_arguments) not in (2, 3):
+            raise BaseForInvalidNumberOfArgumentsError(2, len(call_arguments))
+        if isinstance(call_arguments[0], Identifier):
+            function_name = call_arguments[0].identifier
+        else:
+            call_arguments[0].accept_visitor(self)
+            function_name = self.last_result.get_value()
+        if isinstance(function_name, str) is False:
+            raise BaseForInvalidFunCallArgumentsError('pmap')
+        function = self.global_context.get_function(function_name)
+        if (
+            isinstance(function, UserFunction) is False or
+            len(function.parameters) != 1
+        ):
+            raise BaseForInvalidFunCallArgumentsError('pmap')
+        call_arguments[1].accept_visitor(self)
+        items = self.last_result.get_value()
+        if isinstance(items, (list, NumericArray)) is False:
+            raise BaseForInvalidFunCallArgumentsError('pmap')
+        workers = os.cpu_count()
+        if len(call_arguments) == 3:
+            call_arguments[2].accept_visitor(self)
+            workers = self.last_result.get_value()
+            if isinstance(workers, int) is False or workers < 1:
+                raise BaseForInvalidFunCallArgumentsError('pmap')
+        functions = collect_parallel_functions(
+            self.global_context,
+            function_name
+        )
+        values = [item.get_value() for item in items]
+        if workers == 1 or len(values) < 2:
+            # calls work on copies, as they do in the workers, so that the
+            # results do not depend on the number of workers
+            results = [
+                self.call_function(function_name, [copy.deepcopy(value)])
+                for value in values
+            ]
+        else:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=init_worker,
+                initargs=(
+                    functions,
+                    self.max_recursion_depth,
+                    *self.remaining_limits(),
+                    self.output_dir
+                )
+            ) as executor:
+                calls = list(executor.map(
+                    partial(call_in_worker, function_name),
+                    values,
+                    chunksize=max(1, len(values) // (workers * 4))
+                ))
+            # every worker may take all the steps left, the steps they took
+            # together count against the limit of the whole program
+            results = [result for result, _ in calls]
+            self.steps += sum(steps for _, steps in calls)
+            if self.max_steps is not None and self.steps > self.max_steps:
+                raise BaseForStepLimitError()
+        self.last_result = Symbol([Symbol(result) for result in results])
+
     def do_for_user_function(self, node: UserFunction):
         call_arguments = self.last_result
         if len(node.parameters) != len(call_arguments):
@@ -230,7 +413,12 @@ class Interpreter(Visitor):
         obj = self.last_result
         node.value.accept_visitor(self)
         value = self.last_result
-        obj.set_value(value.get_value())
+        try:
+            obj.set_value(value.get_value())
+        except BaseForInvalidTypeError as e:
+            raise InvalidTypeError(node.position, e.expected, e.got)
+        except BaseForReadOnlyAttributeError as e:
+            raise ReadOnlyAttributeError(node.position, e.attr_name)
         self.last_result = None
 
     def do_for_dot_access(self, node: DotAccess):
@@ -284,8 +472,15 @@ class Interpreter(Visitor):
                 for arg in attr.arguments:
                     arg.accept_visitor(self)
                     arguments.append(self.last_result.value)
+                if attr.identifier in RENDER_METHODS:
+                    if arguments and isinstance(arguments[0], str):
+                        arguments[0] = self.output_path(attr, arguments[0])
+                    phase = measure('render')
+                else:
+                    phase = nullcontext()
                 try:
-                    obj = method(arguments)
+                    with phase:
+                        obj = method(arguments)
                 except BaseForInvalidNumberOfArgumentsError as e:
                     raise InvalidNumberOfArgumentsError(
                         attr.position,
@@ -298,6 +493,12 @@ class Interpreter(Visitor):
                         attr.position,
                         e.fun_name
                     )
+                except BaseForNonExistingKeyError as e:
+                    raise NonExistingKeyError(
+                        attr.position,
+                        e.key,
+                        node.obj.identifier
+                    )
         self.last_result = obj
 
     def do_for_identifier(self, node: Identifier):
@@ -356,6 +557,7 @@ class Interpreter(Visitor):
         node.condition.accept_visitor(self)
         condition = self.last_result
         while condition.get_value():
+            self.count_step(node)
             node.operation.accept_visitor(self)
             if (
                 isinstance(self.last_result, BreakStatement) or
@@ -376,6 +578,7 @@ class Interpreter(Visitor):
         node.iterable_list.accept_visitor(self)
         iterable_list = self.last_result.get_value()
         for item in iterable_list:
+            self.count_step(node)
             if self.current_scope().get(node.iterable):
                 raise IterableNameError(
                     node.position,
@@ -534,6 +737,12 @@ class Interpreter(Visitor):
         left = self.last_result.get_value()
         node.right.accept_visitor(self)
         right = self.last_result.get_value()
+        if (
+            isinstance(left, NumericArray) or
+            isinstance(right, NumericArray)
+        ):
+            self.array_operation(node, 'add', left, right)
+            return
         if not isinstance(left, (int, float)):
             raise InvalidTypeError(
                 node.position,
@@ -553,6 +762,12 @@ class Interpreter(Visitor):
         left = self.last_result.get_value()
         node.right.accept_visitor(self)
         right = self.last_result.get_value()
+        if (
+            isinstance(left, NumericArray) or
+            isinstance(right, NumericArray)
+        ):
+            self.array_operation(node, 'subtract', left, right)
+            return
         if not isinstance(left, (int, float)):
             raise InvalidTypeError(
                 node.position,
@@ -572,6 +787,12 @@ class Interpreter(Visitor):
         left = self.last_result.get_value()
         node.right.accept_visitor(self)
         right = self.last_result.get_value()
+        if (
+            isinstance(left, NumericArray) or
+            isinstance(right, NumericArray)
+        ):
+            self.array_operation(node, 'multiply', left, right)
+            return
         if not isinstance(left, (int, float)):
             raise InvalidTypeError(
                 node.position,
@@ -591,6 +812,12 @@ class Interpreter(Visitor):
         left = self.last_result.get_value()
         node.right.accept_visitor(self)
         right = self.last_result.get_value()
+        if (
+            isinstance(left, NumericArray) or
+            isinstance(right, NumericArray)
+        ):
+            self.array_operation(node, 'divide', left, right)
+            return
         if right == 0:
             raise DivisionByZeroError(node.position)
         if not isinstance(left, (int, float)):
@@ -613,6 +840,12 @@ class Interpreter(Visitor):
         left = self.last_result.get_value()
         node.right.accept_visitor(self)
         right = self.last_result.get_value()
+        if (
+            isinstance(left, NumericArray) or
+            isinstance(right, NumericArray)
+        ):
+            self.array_operation(node, 'power', left, right)
+            return
         if not isinstance(left, (int, float)):
             raise InvalidTypeError(
                 node.position,
@@ -625,7 +858,32 @@ class Interpreter(Visitor):
                 'number',
                 type(right).__name__
             )
-        self.last_result = Symbol(left ** right)
+        try:
+            self.last_result = Symbol(left ** right)
+        except OverflowError:
+            raise NumericOverflowError(node.position)
+
+    def array_operation(self, node, operation_name, left, right):
+        for operand in (left, right):
+            if not isinstance(operand, (int, float, NumericArray)):
+                raise InvalidTypeError(
+                    node.position,
+                    'number or numeric array',
+                    type(operand).__name__
+                )
+        try:
+            result = NumericArray.operation(operation_name, left, right)
+        except BaseForMismatchedArraySizesError as e:
+            raise MismatchedArraySizesError(
+                node.position,
+                e.left_size,
+                e.right_size
+            )
+        except ZeroDivisionError:
+            raise DivisionByZeroError(node.position)
+        except OverflowError:
+            raise NumericOverflowError(node.position)
+        self.last_result = Symbol(result)
 
     def do_for_not_expr_logical(self, node: NotExpressionLogical):
         node.term.accept_visitor(self)
@@ -641,6 +899,9 @@ class Interpreter(Visitor):
     def do_for_not_expr_aritmetic(self, node: NotExpressionAritmetic):
         node.term.accept_visitor(self)
         factor = self.last_result.get_value()
+        if isinstance(factor, NumericArray):
+            self.last_result = Symbol(factor.negate())
+            return
         if not isinstance(factor, (int, float)):
             raise InvalidTypeError(
                 node.position,
@@ -652,5 +913,15 @@ class Interpreter(Visitor):
     def do_for_term(self, node: Term):
         self.last_result = Symbol(node.value)
 
+    def call_function(self, name, values):
+        arguments = [Term([0, 0], None, value) for value in values]
+        FunCall([0, 0], name, arguments).accept_visitor(self)
+        result = self.last_result
+        self.last_result = None
+        if isinstance(result, Symbol):
+            return result.get_value()
+        return None
+
     def interpret(self, program):
+        self.start_clock()
         program.accept_visitor(self)
@@ -0,0 +1,162 @@
+from src.error_handling.interpreter_error import ParallelFunctionError
+from src.interpreter.context import UserFunction
+from src.parser.parser_tree import FunCall, ListIndexAccess
+from src.parser.visitor import Visitor
+
+
+# a function passed to pmap may only touch its parameters and its own local
+# variables, so that every call can run in a separate worker process
+class LocalityChecker(Visitor):
+    def __init__(self, function_name, parameters):
+        self.function_name = function_name
+        self.locals = set(parameter.identifier for parameter in parameters)
+        self.called_functions = []
+
+    def check(self, body):
+        body.accept_visitor(self)
+        return self.called_functions
+
+    def check_local(self, node, identifier):
+        if identifier not in self.locals:
+            raise ParallelFunctionError(
+                node.position,
+                self.function_name,
+                identifier
+            )
+
+    def do_for_operation_block(self, node):
+        for statement in node.statements:
+            statement.accept_visitor(self)
+
+    def do_for_variable_assignment(self, node):
+        node.value.accept_visitor(self)
+        self.locals.add(node.variable.identifier)
+
+    def do_for_assignment(self, node):
+        node.object.accept_visitor(self)
+        node.value.accept_visitor(self)
+
+    def do_for_return_statement(self, node):
+        if node.value:
+            node.value.accept_visitor(self)
+
+    def do_for_if_statement(self, node):
+        node.condition.accept_visitor(self)
+        node.if_operation.accept_visitor(self)
+        if node.else_operation:
+            node.else_operation.accept_visitor(self)
+
+    def do_for_while_statement(self, node):
+        node.condition.accept_visitor(self)
+        node.operation.accept_visitor(self)
+
+    def do_for_for_statement(self, node):
+        node.iterable_list.accept_visitor(self)
+        self.locals.add(node.iterable)
+        node.operation.accept_visitor(self)
+
+    def do_for_dot_access(self, node):
+        node.obj.accept_visitor(self)
+        for attr in node.dot_access:
+            if isinstance(attr, FunCall):
+                for argument in attr.arguments:
+                    argument.accept_visitor(self)
+            elif isinstance(attr, ListIndexAccess):
+                for list_index in attr.list_indexes:
+                    list_index.accept_visitor(self)
+
+    def do_for_fun_call(self, node):
+        if node.identifier not in self.called_functions:
+            self.called_functions.append(node.identifier)
+        for argument in node.arguments:
+            argument.accept_visitor(self)
+
+    def do_for_identifier(self, node):
+        self.check_local(node, node.identifier)
+
+    def do_for_list_index_access(self, node):
+        self.check_local(node, node.identifier)
+        for list_index in node.list_indexes:
+            list_index.accept_visitor(self)
+
+    def do_for_list_index(self, node):
+        node.list_index.accept_visitor(self)
+
+    def do_for_list(self, node):
+        for content in node.contents:
+            content.accept_visitor(self)
+
+    def do_for_binary_expr(self, node):
+        node.left.accept_visitor(self)
+        node.right.accept_visitor(self)
+
+    def do_for_unary_expr(self, node):
+        node.term.accept_visitor(self)
+
+    do_for_or_expr = do_for_binary_expr
+    do_for_and_expr = do_for_binary_expr
+    do_for_less_than_expr = do_for_binary_expr
+    do_for_greater_than_expr = do_for_binary_expr
+    do_for_less_or_equal_expr = do_for_binary_expr
+    do_for_greater_or_equal_expr = do_for_binary_expr
+    do_for_equality_expr = do_for_binary_expr
+    do_for_inequality_expr = do_for_binary_expr
+    do_for_addition_expr = do_for_binary_expr
+    do_for_subtraction_expr = do_for_binary_expr
+    do_for_multiplication_expr = do_for_binary_expr
+    do_for_division_expr = do_for_binary_expr
+    do_for_power_expr = do_for_binary_expr
+    do_for_not_expr_logical = do_for_unary_expr
+    do_for_not_expr_aritmetic = do_for_unary_expr
+
+
+# checks the function and every user function it calls, which all have to
+# be sent to the workers
+def collect_parallel_functions(global_context, function_name):
+    functions = []
+    to_check = [function_name]
+    checked = set()
+    while to_check:
+        name = to_check.pop()
+        checked.add(name)
+        function = global_context.get_function(name)
+        if isinstance(function, UserFunction) is False:
+            continue
+        checker = LocalityChecker(name, function.parameters)
+        for called in checker.check(function.body):
+            if called not in checked and called not in to_check:
+                to_check.append(called)
+        functions.append((name, function.parameters, function.body))
+    return functions
+
+
+worker_interpreter = None
+
+
+def init_worker(
+    functions,
+    max_recursion_depth,
+    max_steps,
+    timeout,
+    output_dir
+):
+    global worker_interpreter
+    from src.interpreter.interpreter import Interpreter
+    worker_interpreter = Interpreter(
+        max_recursion_depth,
+        max_steps,
+        timeout,
+        output_dir
+    )
+    for name, parameters, body in functions:
+        worker_interpreter.global_context.set_function(
+            name,
+            UserFunction(parameters, body)
+        )
+
+
+# the result of a call and the steps it took
+def call_in_worker(function_name, value):
+    steps = worker_interpreter.steps
+    result = worker_interpreter.call_function(function_name, [value])
+    return result, worker_interpreter.steps - steps
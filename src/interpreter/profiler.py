@@ -0,0 +1,168 @@
+import sys
+import threading
+import time
+from collections import Counter
+
+PROGRAM_NAME = '<program>'
+
+
+class Profiler:
+    # samples the interpreting thread's Python stack from a background thread,
+    # so the interpreter itself runs unchanged -- only function calls are
+    # counted, by wrapping do_for_fun_call on the profiled instance
+    def __init__(self, interpreter, interval=0.001):
+        self.interpreter = interpreter
+        self.interval = interval
+        self.thread_id = None
+        self.sampler = None
+        self.replaced = None
+        self.running = False
+        self.stacks = Counter()
+        self.call_counts = Counter()
+        self.total_time = 0
+        self.visitor_codes = set(
+            method.__code__
+            for cls in type(interpreter).__mro__
+            for name, method in vars(cls).items()
+            if name.startswith('do_for_') and hasattr(method, '__code__')
+        )
+        self.fun_call_codes = set(
+            cls.do_for_fun_call.__code__
+            for cls in type(interpreter).__mro__
+            if 'do_for_fun_call' in vars(cls)
+        )
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        self.thread_id = threading.get_ident()
+        self.replaced = vars(self.interpreter).get('do_for_fun_call')
+        original = self.interpreter.do_for_fun_call
+        call_counts = self.call_counts
+
+        def counting_fun_call(node):
+            call_counts[node.identifier] += 1
+            original(node)
+
+        self.interpreter.do_for_fun_call = counting_fun_call
+        self.running = True
+        self.sampler = threading.Thread(target=self.sample, daemon=True)
+        self.sampler.start()
+
+    def stop(self):
+        self.running = False
+        self.sampler.join()
+        if self.replaced is None:
+            del self.interpreter.do_for_fun_call
+        else:
+            self.interpreter.do_for_fun_call = self.replaced
+
+    def sample(self):
+        last = time.perf_counter()
+        while self.running:
+            time.sleep(self.interval)
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            elapsed = now - last
+            last = now
+            if frame is None:
+                continue
+            stack = self.tessellate_stack(frame)
+            if stack:
+                self.stacks[stack] += elapsed
+                self.total_time += elapsed
+
+    # translates Python frames into (function name, source line) pairs, one
+    # for every Tessellate function on the stack, outermost first
+    def tessellate_stack(self, frame):
+        frames = []
+        while frame is not None:
+            if frame.f_code in self.visitor_codes:
+                frames.append(frame)
+            frame = frame.f_back
+        if not frames:
+            return ()
+        stack = []
+        function = PROGRAM_NAME
+        line = None
+        for frame in reversed(frames):
+            node = frame.f_locals.get('node')
+            position = getattr(node, 'position', None)
+            if position and position[0] > 0:
+                line = position[0]
+            if frame.f_code in self.fun_call_codes:
+                stack.append((function, line))
+                function = node.identifier
+                line = None
+        stack.append((function, line))
+        return tuple(stack)
+
+    def function_times(self):
+        exclusive = Counter()
+        inclusive = Counter()
+        for stack, elapsed in self.stacks.items():
+            exclusive[stack[-1][0]] += elapsed
+            for function in set(function for function, _ in stack):
+                inclusive[function] += elapsed
+        return exclusive, inclusive
+
+    def line_times(self):
+        exclusive = Counter()
+        inclusive = Counter()
+        for stack, elapsed in self.stacks.items():
+            exclusive[stack[-1]] += elapsed
+            for entry in set(stack):
+                inclusive[entry] += elapsed
+        return exclusive, inclusive
+
+    @staticmethod
+    def frame_name(entry):
+        function, line = entry
+        if line is None:
+            return function
+        return f'{function}:{line}'
+
+    # one line per distinct stack, with the time spent in it in microseconds,
+    # as expected by flamegraph.pl and speedscope
+    def write_collapsed(self, file):
+        collapsed = Counter()
+        for stack, elapsed in self.stacks.items():
+            frames = ';'.join(self.frame_name(entry) for entry in stack)
+            collapsed[frames] += elapsed
+        for frames, elapsed in sorted(collapsed.items()):
+            file.write(f'{frames} {round(elapsed * 1e6)}\n')
+
+    def report(self, top=20):
+        total = self.total_time or 1
+        lines = [f'Total sampled time: {self.total_time:.3f} s', '']
+        header = (
+            f'{"exclusive s":>12}{"%":>7}{"inclusive s":>13}{"%":>7}'
+            f'{"calls":>10}  '
+        )
+        exclusive, inclusive = self.function_times()
+        lines.append(header + 'function')
+        for function, _ in inclusive.most_common(top):
+            lines.append(
+                f'{exclusive[function]:>12.3f}'
+                f'{100 * exclusive[function] / total:>7.1f}'
+                f'{inclusive[function]:>13.3f}'
+                f'{100 * inclusive[function] / total:>7.1f}'
+                f'{self.call_counts.get(function, ""):>10}  {function}'
+            )
+        lines.append('')
+        exclusive, inclusive = self.line_times()
+        lines.append(header + 'line')
+        for entry, _ in exclusive.most_common(top):
+            lines.append(
+                f'{exclusive[entry]:>12.3f}'
+                f'{100 * exclusive[entry] / total:>7.1f}'
+                f'{inclusive[entry]:>13.3f}'
+                f'{100 * inclusive[entry] / total:>7.1f}'
+                f'{"":>10}  {self.frame_name(entry)}'
+            )
+        return '\n'.join(lines)
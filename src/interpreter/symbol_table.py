@@ -1,9 +1,33 @@
 import math
+from itertools import count
 import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.path import Path
+
+from src.constants import MAXIMUM_ARRAY_SIZE, MAXIMUM_TILES
+from src.geometry.bounds import figure_bounds, figure_groups, total_bounds
+from src.geometry.collisions import overlapping_pairs
+from src.geometry.columns import ColumnStore, bit_mask
+from src.geometry.containment import contains_point
+from src.geometry.coverage import covered_area, figure_areas
+from src.geometry.tilings import hex_grid, square_grid, triangle_grid
+from src.geometry.transforms import rotate, scale, translate, turned
+from src.geometry.grid import CellTable, UniformGrid
+from src.rendering.agg import pixel_size, render_png, show_viewport
+from src.rendering.collections import figure_collection, grouped_collection
+from src.rendering.incremental import RenderCache
+from src.rendering.raster import rasterize_groups
+from src.rendering.svg import export_svg
+from src.rendering.tiles import render_tiles
 
 from src.error_handling.interpreter_error import (
+    BaseForInvalidConstructorArgumentsError,
     BaseForInvalidNumberOfArgumentsError,
-    BaseForInvalidFunCallArgumentsError
+    BaseForInvalidFunCallArgumentsError,
+    BaseForInvalidTypeError,
+    BaseForMismatchedArraySizesError,
+    BaseForNonExistingKeyError,
+    BaseForReadOnlyAttributeError
 )
 
 
@@ -18,11 +42,32 @@ class Symbol:
         return self.value
 
 
+# every change of a point or figure takes the next of these numbers, so that
+# the latest number among a figure and its points tells whether any of them
+# changed; copies from other processes are numbered again in this one
+revisions = count(1)
+
+
+# attribute of a point or figure, numbering the changes of its owner so that
+# renderers and indexes can tell which figures changed; style attributes
+# leave the geometry of their figure as it was
+class TrackedSymbol(Symbol):
+    def __init__(self, owner, value=None, geometric=True) -> None:
+        super().__init__(value)
+        self.owner = owner
+        self.geometric = geometric
+
+    def set_value(self, new_value):
+        self.value = new_value
+        self.owner.changed(self.geometric)
+
+
 class Point:
     def __init__(self, arguments) -> None:
+        self.changed_at = 0
         self.attributes = {
-            'x': Symbol(arguments[0]),
-            'y': Symbol(arguments[1])
+            'x': TrackedSymbol(self, arguments[0]),
+            'y': TrackedSymbol(self, arguments[1])
         }
         self.methods = {
             'get_x': self.get_x,
@@ -61,6 +106,13 @@ class Point:
             raise BaseForInvalidFunCallArgumentsError('set_y')
         self.attributes['y'].set_value(arguments[0])
 
+    def changed(self, geometric=True):
+        self.changed_at = next(revisions)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.changed()
+
     def get_properties(self, method_name):
         x = self.attributes['x'].get_value()
         y = self.attributes['y'].get_value()
@@ -72,16 +124,301 @@ class Point:
         return x, y
 
 
+class Map:
+    # keys are stored together with their type, so that 1, 1.0 and True
+    # stay separate entries, as they are never equal in Tessellate
+    KEY_TYPES = (int, float, str, bool)
+
+    def __init__(self, arguments) -> None:
+        self.entries = {}
+        self.attributes = {}
+        self.methods = {
+            'get': self.get,
+            'set': self.set,
+            'has': self.has,
+            'remove': self.remove,
+            'keys': self.keys,
+            'values': self.values,
+            'size': self.size,
+        }
+        for pair in arguments:
+            key, value = pair
+            self.entries[self.make_key(key, 'Map')] = (key, Symbol(value))
+
+    def make_key(self, key, method_name):
+        if type(key) not in self.KEY_TYPES:
+            raise BaseForInvalidFunCallArgumentsError(method_name)
+        return (type(key), key)
+
+    def get(self, arguments):
+        if len(arguments) not in (1, 2):
+            raise BaseForInvalidNumberOfArgumentsError(1, len(arguments))
+        entry = self.entries.get(self.make_key(arguments[0], 'get'))
+        if entry is not None:
+            return entry[1]
+        if len(arguments) == 2:
+            return Symbol(arguments[1])
+        raise BaseForNonExistingKeyError(arguments[0])
+
+    def set(self, arguments):
+        if len(arguments) != 2:
+            raise BaseForInvalidNumberOfArgumentsError(2, len(arguments))
+        key = self.make_key(arguments[0], 'set')
+        if entry := self.entries.get(key):
+            entry[1].set_value(arguments[1])
+        else:
+            self.entries[key] = (arguments[0], Symbol(arguments[1]))
+
+    def has(self, arguments):
+        if len(arguments) != 1:
+            raise BaseForInvalidNumberOfArgumentsError(1, len(arguments))
+        return Symbol(self.make_key(arguments[0], 'has') in self.entries)
+
+    def remove(self, arguments):
+        if len(arguments) != 1:
+            raise BaseForInvalidNumberOfArgumentsError(1, len(arguments))
+        key = self.make_key(arguments[0], 'remove')
+        if key not in self.entries:
+            raise BaseForNonExistingKeyError(arguments[0])
+        del self.entries[key]
+
+    def keys(self, arguments):
+        if len(arguments) != 0:
+            raise BaseForInvalidNumberOfArgumentsError(0, len(arguments))
+        return Symbol([Symbol(key) for key, _ in self.entries.values()])
+
+    def values(self, arguments):
+        if len(arguments) != 0:
+            raise BaseForInvalidNumberOfArgumentsError(0, len(arguments))
+        return Symbol([value for _, value in self.entries.values()])
+
+    def size(self, arguments):
+        if len(arguments) != 0:
+            raise BaseForInvalidNumberOfArgumentsError(0, len(arguments))
+        return Symbol(len(self.entries))
+
+    def __iter__(self):
+        for key, _ in list(self.entries.values()):
+            yield Symbol(key)
+
+
+# values an element of an array of ints or floats may be given
+ELEMENT_TYPES = {
+    'i': ('int', int),
+    'f': ('int or float', (int, float))
+}
+
+
+class ArrayElement(Symbol):
+    def __init__(self, array, index) -> None:
+        self.array = array
+        self.index = index
+
+    @property
+    def value(self):
+        return self.array[self.index].item()
+
+    # values are checked rather than cast, so that a float is not cut down
+    # to an int nor a string left to numpy
+    def set_value(self, new_value):
+        expected, types = ELEMENT_TYPES[self.array.dtype.kind]
+        if (
+            isinstance(new_value, bool) or
+            isinstance(new_value, types) is False
+        ):
+            raise BaseForInvalidTypeError(expected, type(new_value).__name__)
+        self.array[self.index] = new_value
+
+    def get_value(self):
+        return self.array[self.index].item()
+
+
+class NumericArray:
+    type_name = 'NumericArray'
+    dtype = None
+
+    OPERATIONS = {
+        'add': np.add,
+        'subtract': np.subtract,
+        'multiply': np.multiply,
+        'divide': np.true_divide,
+        'power': np.power,
+    }
+
+    def __init__(self, values) -> None:
+        self.values = values
+        self.attributes = {}
+        self.methods = {
+            'sum': self.sum,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.mean,
+            'sqrt': self.sqrt,
+            'sin': self.sin,
+            'cos': self.cos,
+            'size': self.size,
+            'to_list': self.to_list,
+        }
+
+    @staticmethod
+    def wrap(values):
+        if values.dtype.kind in 'iub':
+            return IntArray(values.astype(IntArray.dtype, copy=False))
+        return FloatArray(values.astype(FloatArray.dtype, copy=False))
+
+    @staticmethod
+    def operand(value):
+        if isinstance(value, NumericArray):
+            return value.values
+        return value
+
+    @classmethod
+    def operation(cls, operation_name, left, right):
+        left = cls.operand(left)
+        right = cls.operand(right)
+        if (
+            isinstance(left, np.ndarray) and
+            isinstance(right, np.ndarray) and
+            left.shape != right.shape
+        ):
+            raise BaseForMismatchedArraySizesError(left.size, right.size)
+        if operation_name == 'divide' and np.any(np.equal(right, 0)):
+            raise ZeroDivisionError
+        if (
+            operation_name == 'power' and
+            np.result_type(left, right).kind in 'iu' and
+            np.any(np.less(right, 0))
+        ):
+            # integers to negative powers give floats, as they do for
+            # plain numbers
+            left = np.asarray(left, dtype=FloatArray.dtype)
+        if operation_name == 'power':
+            return cls.wrap(cls.power(left, right))
+        with np.errstate(over='ignore', invalid='ignore'):
+            return cls.wrap(cls.OPERATIONS[operation_name](left, right))
+
+    # powers too large for their type raise OverflowError, as they do for
+    # plain floats, instead of wrapping around or becoming infinite
+    @staticmethod
+    def power(left, right):
+        if np.result_type(left, right).kind in 'iu':
+            with np.errstate(over='ignore'):
+                magnitude = np.power(np.abs(np.asarray(left, float)), right)
+            if np.any(magnitude >= 2.0 ** 63):
+                raise OverflowError
+            return np.power(left, right)
+        try:
+            with np.errstate(over='raise', invalid='ignore'):
+                return np.power(left, right)
+        except FloatingPointError:
+            raise OverflowError
+
+    def negate(self):
+        return self.wrap(np.negative(self.values))
+
+    def sum(self, arguments):
+        if len(arguments) != 0:
+            raise BaseForInvalidNumberOfArgumentsError(0, len(arguments))
+        return Symbol(self.values.sum().item())
+
+    def min(self, arguments):
+        if len(arguments) != 0:
+            raise BaseForInvalidNumberOfArgumentsError(0, len(arguments))
+        if self.values.size == 0:
+            raise BaseForInvalidFunCallArgumentsError('min')
+        return Symbol(self.values.min().item())
+
+    def max(self, arguments):
+        if len(arguments) != 0:
+            raise BaseForInvalidNumberOfArgumentsError(0, len(arguments))
+        if self.values.size == 0:
+            raise BaseForInvalidFunCallArgumentsError('max')
+        return Symbol(self.values.max().item())
+
+    def mean(self, arguments):
+        if len(arguments) != 0:
+            raise BaseForInvalidNumberOfArgumentsError(0, len(arguments))
+        if self.values.size == 0:
+            raise BaseForInvalidFunCallArgumentsError('mean')
+        return Symbol(self.values.mean().item())
+
+    def sqrt(self, arguments):
+        if len(arguments) != 0:
+            raise BaseForInvalidNumberOfArgumentsError(0, len(arguments))
+        if np.any(self.values < 0):
+            raise BaseForInvalidFunCallArgumentsError('sqrt')
+        return Symbol(FloatArray(np.sqrt(self.values, dtype=FloatArray.dtype)))
+
+    def sin(self, arguments):
+        if len(arguments) != 0:
+            raise BaseForInvalidNumberOfArgumentsError(0, len(arguments))
+        return Symbol(FloatArray(np.sin(self.values, dtype=FloatArray.dtype)))
+
+    def cos(self, arguments):
+        if len(arguments) != 0:
+            raise BaseForInvalidNumberOfArgumentsError(0, len(arguments))
+        return Symbol(FloatArray(np.cos(self.values, dtype=FloatArray.dtype)))
+
+    def size(self, arguments):
+        if len(arguments) != 0:
+            raise BaseForInvalidNumberOfArgumentsError(0, len(arguments))
+        return Symbol(self.values.size)
+
+    def to_list(self, arguments):
+        if len(arguments) != 0:
+            raise BaseForInvalidNumberOfArgumentsError(0, len(arguments))
+        return Symbol([Symbol(value) for value in self.values.tolist()])
+
+    def __getitem__(self, index):
+        if isinstance(index, int) is False or isinstance(index, bool):
+            raise TypeError
+        if index < 0:
+            index += self.values.size
+        if index < 0 or index >= self.values.size:
+            raise IndexError
+        return ArrayElement(self.values, index)
+
+    def __iter__(self):
+        for value in self.values.tolist():
+            yield Symbol(value)
+
+    def __len__(self):
+        return self.values.size
+
+    def __str__(self):
+        values = np.array2string(self.values, separator=', ')
+        return f'{self.type_name}({values})'
+
+
+class IntArray(NumericArray):
+    type_name = 'IntArray'
+    dtype = np.int64
+
+
+class FloatArray(NumericArray):
+    type_name = 'FloatArray'
+    dtype = np.float64
+
+
+# the attributes a figure is made of, in the order of its parameters():
+# points take two of them, numbers one
 class Figure:
+    shape = 'polygon'
+    points = ('position',)
+    numbers = ()
+
     def __init__(self, arguments) -> None:
+        self.changed_at = 0
+        self.geometry_changed_at = 0
+        self.cached_bounds = None
         self.attributes = {
-            'position': Symbol(arguments[0]),
-            'color': Symbol('grey'),
-            'border_color': Symbol('black'),
-            'border_width': Symbol(1),
-            'border_style': Symbol('solid'),
-            'fill': Symbol(True),
-            'opacity': Symbol(1),
+            'position': TrackedSymbol(self, arguments[0]),
+            'color': TrackedSymbol(self, 'grey', False),
+            'border_color': TrackedSymbol(self, 'black', False),
+            'border_width': TrackedSymbol(self, 1, False),
+            'border_style': TrackedSymbol(self, 'solid', False),
+            'fill': TrackedSymbol(self, True, False),
+            'opacity': TrackedSymbol(self, 1, False),
         }
         self.methods = {
             'get_color': self.get_color,
@@ -99,8 +436,14 @@ class Figure:
             'area': self.area,
             'perimeter': self.perimeter,
             'move_to': self.move_to,
+            'bounds': self.bounding_box,
+            'contains': self.contains,
             'render': self.render
         }
+        if 'rotation' in self.numbers:
+            self.attributes['rotation'] = TrackedSymbol(self, 0)
+            self.methods['get_rotation'] = self.get_rotation
+            self.methods['set_rotation'] = self.set_rotation
 
     def get_color(self):
         return self.attributes['color']
@@ -170,6 +513,19 @@ class Figure:
             raise BaseForInvalidFunCallArgumentsError('set_opacity')
         self.attributes['opacity'].set_value(arguments[0])
 
+    def get_rotation(self, arguments):
+        if len(arguments) != 0:
+            raise BaseForInvalidNumberOfArgumentsError(0, len(arguments))
+        return self.attributes['rotation']
+
+    # degrees by which the figure is turned around its position
+    def set_rotation(self, arguments):
+        if len(arguments) != 1:
+            raise BaseForInvalidNumberOfArgumentsError(1, len(arguments))
+        if isinstance(arguments[0], (int, float)) is False:
+            raise BaseForInvalidFunCallArgumentsError('set_rotation')
+        self.attributes['rotation'].set_value(arguments[0])
+
     def area(self, arguments):
         pass
 
@@ -184,19 +540,135 @@ class Figure:
         self.attributes['position'].set_value(arguments[0])
 
     def render(self, arguments):
+        render_figures(arguments, [self])
+
+    def changed(self, geometric=True):
+        self.changed_at = next(revisions)
+        if geometric:
+            self.geometry_changed_at = self.changed_at
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.changed()
+
+    # grows with every change of the figure or of one of its points
+    def revision(self):
+        return max(self.changed_at, self.points_changed_at())
+
+    # grows with every change of the geometry of the figure, as bounding
+    # boxes and spatial indexes follow it
+    def geometry_revision(self):
+        return max(self.geometry_changed_at, self.points_changed_at())
+
+    def points_changed_at(self):
+        latest = 0
+        for name in self.points:
+            point = self.attributes[name].get_value()
+            if isinstance(point, Point) and point.changed_at > latest:
+                latest = point.changed_at
+        return latest
+
+    def style(self):
+        return {
+            'fc': self.attributes['color'].get_value(),
+            'ec': self.attributes['border_color'].get_value(),
+            'lw': self.attributes['border_width'].get_value(),
+            'ls': self.attributes['border_style'].get_value(),
+            'fill': self.attributes['fill'].get_value(),
+            'alpha': self.attributes['opacity'].get_value()
+        }
+
+    # the coordinates of the points of the figure followed by its numbers,
+    # the row its type builds outlines and bounds from
+    def parameters(self):
+        values = []
+        for name in self.points:
+            point = self.attributes[name].get_value()
+            if isinstance(point, Point) is False:
+                raise BaseForInvalidFunCallArgumentsError('patch')
+            values.extend(point.get_properties('patch'))
+        for name in self.numbers:
+            value = self.attributes[name].get_value()
+            if isinstance(value, (int, float)) is False:
+                raise BaseForInvalidFunCallArgumentsError('patch')
+            values.append(value)
+        return tuple(values)
+
+    # parameters() written back into the attributes; new values of exact
+    # columns stay ints where the old ones were
+    def set_parameters(self, values, exact):
+        column = 0
+        for name in self.points:
+            point = self.attributes[name].get_value()
+            for axis in ('x', 'y'):
+                set_number(
+                    point.attributes[axis], values[column], exact[column]
+                )
+                column += 1
+        for name in self.numbers:
+            set_number(self.attributes[name], values[column], exact[column])
+            column += 1
+
+    def vertices(self):
+        return self.outline(np.array([self.parameters()], dtype=float))[0]
+
+    def patch(self):
+        return plt.Polygon(self.vertices(), **self.style())
+
+    # paths of many figures of one type, built from the stacked rows of
+    # their parameters()
+    @classmethod
+    def paths(cls, parameters):
+        vertices = cls.outline(parameters)
+        closed = np.concatenate([vertices, vertices[:, :1]], axis=1)
+        codes = np.full(closed.shape[1], Path.LINETO, dtype=Path.code_type)
+        codes[0] = Path.MOVETO
+        codes[-1] = Path.CLOSEPOLY
+        return [Path(outline, codes) for outline in closed]
+
+    # (x_min, y_min, x_max, y_max), kept until the geometry changes
+    def bounds(self):
+        if (
+            self.cached_bounds is None or
+            self.cached_bounds[0] != self.geometry_revision()
+        ):
+            figure_bounds([self])
+        return tuple(self.cached_bounds[1])
+
+    def bounding_box(self, arguments):
         if len(arguments) != 0:
             raise BaseForInvalidNumberOfArgumentsError(0, len(arguments))
-        figure = self.patch()
-        plt.axes()
-        plt.gca().add_patch(figure)
-        plt.axis('scaled')
-        plt.show()
+        return Symbol(box_rectangle(self.bounds()))
+
+    # whether the point is in the figure, its boundary included
+    def contains(self, arguments):
+        if len(arguments) != 1:
+            raise BaseForInvalidNumberOfArgumentsError(1, len(arguments))
+        if isinstance(arguments[0], Point) is False:
+            raise BaseForInvalidFunCallArgumentsError('contains')
+        point = arguments[0].get_properties('contains')
+        try:
+            parameters = np.array([self.parameters()], dtype=float)
+        except BaseForInvalidFunCallArgumentsError:
+            raise BaseForInvalidFunCallArgumentsError('contains')
+        return Symbol(bool(contains_point(type(self), parameters, point)[0]))
+
+    # bounding boxes as (x_min, y_min, x_max, y_max) rows
+    @classmethod
+    def bounds_of(cls, parameters):
+        vertices = cls.outline(parameters)
+        return np.concatenate(
+            [vertices.min(axis=1), vertices.max(axis=1)],
+            axis=1
+        )
 
 
 class Square(Figure):
+    numbers = ('side', 'rotation')
+
     def __init__(self, arguments) -> None:
         super().__init__(arguments)
-        self.attributes['side'] = Symbol(arguments[1])
+        self.attributes['side'] = TrackedSymbol(self, arguments[1])
         self.methods['get_side'] = self.get_side
         self.methods['set_side'] = self.set_side
         self.methods['diagonal'] = self.diagonal
@@ -240,29 +712,39 @@ class Square(Figure):
         side = self.get_properties('diagonal')
         return Symbol(side * math.sqrt(2))
 
+    @staticmethod
+    def areas_of(parameters):
+        side = parameters[:, 2]
+        return side * side
+
+    @staticmethod
+    def perimeters_of(parameters):
+        return 4 * parameters[:, 2]
+
+    @staticmethod
+    def outline(parameters):
+        x, y, side, rotation = parameters.T
+        return turned(np.stack([
+            np.stack([x, y], axis=-1),
+            np.stack([x + side, y], axis=-1),
+            np.stack([x + side, y + side], axis=-1),
+            np.stack([x, y + side], axis=-1)
+        ], axis=1), x, y, rotation)
+
     def patch(self):
-        x, y = self.attributes['position'].get_value().get_properties('patch')
-        position = (x, y)
-        side = self.get_properties('patch')
-        square = plt.Rectangle(
-            position,
-            side,
-            side,
-            fc=self.attributes['color'].get_value(),
-            ec=self.attributes['border_color'].get_value(),
-            lw=self.attributes['border_width'].get_value(),
-            ls=self.attributes['border_style'].get_value(),
-            fill=self.attributes['fill'].get_value(),
-            alpha=self.attributes['opacity'].get_value()
+        x, y, side, rotation = self.parameters()
+        return plt.Rectangle(
+            (x, y), side, side, angle=rotation, **self.style()
         )
-        return square
 
 
 class Rectangle(Figure):
+    numbers = ('width', 'height', 'rotation')
+
     def __init__(self, arguments) -> None:
         super().__init__(arguments)
-        self.attributes['width'] = Symbol(arguments[1])
-        self.attributes['height'] = Symbol(arguments[2])
+        self.attributes['width'] = TrackedSymbol(self, arguments[1])
+        self.attributes['height'] = TrackedSymbol(self, arguments[2])
         self.methods['get_width'] = self.get_width
         self.methods['get_height'] = self.get_height
         self.methods['set_width'] = self.set_width
@@ -327,28 +809,40 @@ class Rectangle(Figure):
         width, height = self.get_properties('diagonal')
         return Symbol(math.sqrt(width ** 2 + height ** 2))
 
+    @staticmethod
+    def areas_of(parameters):
+        width, height = parameters[:, 2], parameters[:, 3]
+        return width * height
+
+    @staticmethod
+    def perimeters_of(parameters):
+        width, height = parameters[:, 2], parameters[:, 3]
+        return 2 * (width + height)
+
+    @staticmethod
+    def outline(parameters):
+        x, y, width, height, rotation = parameters.T
+        return turned(np.stack([
+            np.stack([x, y], axis=-1),
+            np.stack([x + width, y], axis=-1),
+            np.stack([x + width, y + height], axis=-1),
+            np.stack([x, y + height], axis=-1)
+        ], axis=1), x, y, rotation)
+
     def patch(self):
-        x = self.attributes['position'].get_value().attributes['x'].get_value()
-        y = self.attributes['position'].get_value().attributes['y'].get_value()
-        position = (x, y)
-        rectangle = plt.Rectangle(
-            position,
-            self.attributes['width'].get_value(),
-            self.attributes['height'].get_value(),
-            fc=self.attributes['color'].get_value(),
-            ec=self.attributes['border_color'].get_value(),
-            lw=self.attributes['border_width'].get_value(),
-            ls=self.attributes['border_style'].get_value(),
-            fill=self.attributes['fill'].get_value(),
-            alpha=self.attributes['opacity'].get_value()
+        x, y, width, height, rotation = self.parameters()
+        return plt.Rectangle(
+            (x, y), width, height, angle=rotation, **self.style()
         )
-        return rectangle
 
 
 class Circle(Figure):
+    shape = 'circle'
+    numbers = ('radius',)
+
     def __init__(self, arguments) -> None:
         super().__init__(arguments)
-        self.attributes['radius'] = Symbol(arguments[1])
+        self.attributes['radius'] = TrackedSymbol(self, arguments[1])
         self.methods['get_radius'] = self.get_radius
         self.methods['set_radius'] = self.set_radius
         self.methods['diameter'] = self.diameter
@@ -392,29 +886,46 @@ class Circle(Figure):
         r = self.get_properties('diameter')
         return Symbol(2 * r)
 
+    @staticmethod
+    def areas_of(parameters):
+        r = parameters[:, 2]
+        return 3.14 * r * r
+
+    @staticmethod
+    def perimeters_of(parameters):
+        return 2 * 3.14 * parameters[:, 2]
+
     def patch(self):
-        x = self.attributes['position'].get_value().attributes['x'].get_value()
-        y = self.attributes['position'].get_value().attributes['y'].get_value()
-        position = (x, y)
-        circle = plt.Circle(
-            position,
-            self.attributes['radius'].get_value(),
-            fc=self.attributes['color'].get_value(),
-            ec=self.attributes['border_color'].get_value(),
-            lw=self.attributes['border_width'].get_value(),
-            ls=self.attributes['border_style'].get_value(),
-            fill=self.attributes['fill'].get_value(),
-            alpha=self.attributes['opacity'].get_value()
+        x, y, radius = self.parameters()
+        return plt.Circle((x, y), radius, **self.style())
+
+    # the same bezier curves that matplotlib draws for a Circle patch
+    @classmethod
+    def paths(cls, parameters):
+        x, y, radius = parameters.T
+        circle = Path.unit_circle()
+        vertices = (
+            circle.vertices * radius[:, None, None] +
+            np.stack([x, y], axis=-1)[:, None]
+        )
+        return [Path(outline, circle.codes) for outline in vertices]
+
+    @classmethod
+    def bounds_of(cls, parameters):
+        x, y, radius = parameters.T
+        return np.stack(
+            [x - radius, y - radius, x + radius, y + radius], axis=1
         )
-        return circle
 
 
 class Triangle(Figure):
+    points = ('point1', 'point2', 'point3')
+
     def __init__(self, arguments) -> None:
         super().__init__(arguments)
         self.attributes['point1'] = self.attributes['position']
-        self.attributes['point2'] = Symbol(arguments[1])
-        self.attributes['point3'] = Symbol(arguments[2])
+        self.attributes['point2'] = TrackedSymbol(self, arguments[1])
+        self.attributes['point3'] = TrackedSymbol(self, arguments[2])
         self.methods['get_point1'] = self.get_point1
         self.methods['get_point2'] = self.get_point2
         self.methods['get_point3'] = self.get_point3
@@ -553,43 +1064,35 @@ class Triangle(Figure):
             [self.attributes['point3'].get_value().get_y([]).get_value() - y]
         )
 
-    def patch(self):
-        point1 = self.attributes['point1'].get_value()
-        point2 = self.attributes['point2'].get_value()
-        point3 = self.attributes['point3'].get_value()
-        if (
-            isinstance(point1, Point) is False or
-            isinstance(point2, Point) is False or
-            isinstance(point3, Point) is False
-        ):
-            raise BaseForInvalidFunCallArgumentsError('patch')
-        x1 = point1.get_x([]).get_value()
-        y1 = point1.get_y([]).get_value()
-        x2 = point2.get_x([]).get_value()
-        y2 = point2.get_y([]).get_value()
-        x3 = point3.get_x([]).get_value()
-        y3 = point3.get_y([]).get_value()
-        triangle = plt.Polygon(
-            [
-                (x1, y1),
-                (x2, y2),
-                (x3, y3)
-            ],
-            fc=self.attributes['color'].get_value(),
-            ec=self.attributes['border_color'].get_value(),
-            lw=self.attributes['border_width'].get_value(),
-            ls=self.attributes['border_style'].get_value(),
-            fill=self.attributes['fill'].get_value(),
-            alpha=self.attributes['opacity'].get_value()
+    @staticmethod
+    def areas_of(parameters):
+        x1, y1, x2, y2, x3, y3 = parameters.T
+        return 0.5 * (
+            x1 * (y2 - y3) +
+            x2 * (y3 - y1) +
+            x3 * (y1 - y2)
         )
-        return triangle
+
+    @staticmethod
+    def perimeters_of(parameters):
+        x1, y1, x2, y2, x3, y3 = parameters.T
+        side1 = np.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
+        side2 = np.sqrt((x3 - x2) ** 2 + (y3 - y2) ** 2)
+        side3 = np.sqrt((x1 - x3) ** 2 + (y1 - y3) ** 2)
+        return side1 + side2 + side3
+
+    @staticmethod
+    def outline(parameters):
+        return parameters.reshape(-1, 3, 2)
 
 
 class Rhomb(Figure):
+    numbers = ('side', 'angle', 'rotation')
+
     def __init__(self, arguments) -> None:
         super().__init__(arguments)
-        self.attributes['side'] = Symbol(arguments[1])
-        self.attributes['angle'] = Symbol(arguments[2])
+        self.attributes['side'] = TrackedSymbol(self, arguments[1])
+        self.attributes['angle'] = TrackedSymbol(self, arguments[2])
         self.methods['get_side'] = self.get_side
         self.methods['get_angle'] = self.get_angle
         self.methods['set_side'] = self.set_side
@@ -656,46 +1159,37 @@ class Rhomb(Figure):
         diagonal2 = side * math.sqrt(2 * (1 - math.cos(math.radians(angle))))
         return Symbol([Symbol(diagonal1), Symbol(diagonal2)])
 
-    def patch(self):
-        x = self.attributes['position'].get_value().attributes['x'].get_value()
-        y = self.attributes['position'].get_value().attributes['y'].get_value()
-        if (
-            isinstance(x, (int, float)) is False or
-            isinstance(y, (int, float)) is False
-        ):
-            raise BaseForInvalidFunCallArgumentsError('patch')
-        position = (x, y)
-        side, angle = self.get_properties('patch')
-        b = (
-            x + side * math.cos(math.radians(angle)),
-            y + side * math.sin(math.radians(angle))
-        )
-        c = (
-            b[0] + side,
-            b[1]
-        )
-        d = (
-            x + side,
-            y
-        )
-        rhomb = plt.Polygon(
-            [position, b, c, d],
-            fc=self.attributes['color'].get_value(),
-            ec=self.attributes['border_color'].get_value(),
-            lw=self.attributes['border_width'].get_value(),
-            ls=self.attributes['border_style'].get_value(),
-            fill=self.attributes['fill'].get_value(),
-            alpha=self.attributes['opacity'].get_value()
-        )
-        return rhomb
+    @staticmethod
+    def areas_of(parameters):
+        side, angle = parameters[:, 2], parameters[:, 3]
+        return side * side * sines(angle)
+
+    @staticmethod
+    def perimeters_of(parameters):
+        return 4 * parameters[:, 2]
+
+    @staticmethod
+    def outline(parameters):
+        x, y, side, angle, rotation = parameters.T
+        angle = np.radians(angle)
+        bx = x + side * np.cos(angle)
+        by = y + side * np.sin(angle)
+        return turned(np.stack([
+            np.stack([x, y], axis=-1),
+            np.stack([bx, by], axis=-1),
+            np.stack([bx + side, by], axis=-1),
+            np.stack([x + side, y], axis=-1)
+        ], axis=1), x, y, rotation)
 
 
 class Parallelogram(Figure):
+    numbers = ('base', 'height', 'angle', 'rotation')
+
     def __init__(self, arguments) -> None:
         super().__init__(arguments)
-        self.attributes['base'] = Symbol(arguments[1])
-        self.attributes['height'] = Symbol(arguments[2])
-        self.attributes['angle'] = Symbol(arguments[3])
+        self.attributes['base'] = TrackedSymbol(self, arguments[1])
+        self.attributes['height'] = TrackedSymbol(self, arguments[2])
+        self.attributes['angle'] = TrackedSymbol(self, arguments[3])
         self.methods['get_base'] = self.get_base
         self.methods['get_height'] = self.get_height
         self.methods['get_angle'] = self.get_angle
@@ -797,43 +1291,37 @@ class Parallelogram(Figure):
         )
         return Symbol([Symbol(diagonal1), Symbol(diagonal2)])
 
-    def patch(self):
-        x = self.attributes['position'].get_value().attributes['x'].get_value()
-        y = self.attributes['position'].get_value().attributes['y'].get_value()
-        position = (x, y)
-        base = self.attributes['base'].get_value()
-        height = self.attributes['height'].get_value()
-        angle = self.attributes['angle'].get_value()
-        b = (
-            x + height / math.tan(math.radians(angle)),
-            y + height
-        )
-        c = (
-            b[0] + base,
-            b[1]
-        )
-        d = (
-            x + base,
-            y
-        )
-        parallelogram = plt.Polygon(
-            [position, b, c, d],
-            fc=self.attributes['color'].get_value(),
-            ec=self.attributes['border_color'].get_value(),
-            lw=self.attributes['border_width'].get_value(),
-            ls=self.attributes['border_style'].get_value(),
-            fill=self.attributes['fill'].get_value(),
-            alpha=self.attributes['opacity'].get_value()
-        )
-        return parallelogram
+    @staticmethod
+    def areas_of(parameters):
+        base, height = parameters[:, 2], parameters[:, 3]
+        return base * height
+
+    @staticmethod
+    def perimeters_of(parameters):
+        base, height, angle = parameters[:, 2:5].T
+        return 2 * (base + height / sines(angle))
+
+    @staticmethod
+    def outline(parameters):
+        x, y, base, height, angle, rotation = parameters.T
+        bx = x + height / np.tan(np.radians(angle))
+        by = y + height
+        return turned(np.stack([
+            np.stack([x, y], axis=-1),
+            np.stack([bx, by], axis=-1),
+            np.stack([bx + base, by], axis=-1),
+            np.stack([x + base, y], axis=-1)
+        ], axis=1), x, y, rotation)
 
 
 class Trapeze(Figure):
+    numbers = ('base1', 'base2', 'height', 'rotation')
+
     def __init__(self, arguments) -> None:
         super().__init__(arguments)
-        self.attributes['base1'] = Symbol(arguments[1])
-        self.attributes['base2'] = Symbol(arguments[2])
-        self.attributes['height'] = Symbol(arguments[3])
+        self.attributes['base1'] = TrackedSymbol(self, arguments[1])
+        self.attributes['base2'] = TrackedSymbol(self, arguments[2])
+        self.attributes['height'] = TrackedSymbol(self, arguments[3])
         self.methods['get_base1'] = self.get_base1
         self.methods['get_base2'] = self.get_base2
         self.methods['get_height'] = self.get_height
@@ -912,72 +1400,905 @@ class Trapeze(Figure):
         side2 = math.sqrt((0.5 * (base2 + base1)) ** 2 + height ** 2)
         return Symbol(base1 + base2 + side1 + side2)
 
-    def patch(self):
-        x = self.attributes['position'].get_value().attributes['x'].get_value()
-        y = self.attributes['position'].get_value().attributes['y'].get_value()
-        position = (x, y)
-        base1 = self.attributes['base1'].get_value()
-        base2 = self.attributes['base2'].get_value()
-        height = self.attributes['height'].get_value()
-        b = (
-            x + 0.5 * (base1 - base2),
-            y + height
-        )
-        c = (
-            b[0] + base2,
-            b[1]
-        )
-        d = (
-            x + base1,
-            y
-        )
-        trapezoid = plt.Polygon(
-            [position, b, c, d],
-            fc=self.attributes['color'].get_value(),
-            ec=self.attributes['border_color'].get_value(),
-            lw=self.attributes['border_width'].get_value(),
-            ls=self.attributes['border_style'].get_value(),
-            fill=self.attributes['fill'].get_value(),
-            alpha=self.attributes['opacity'].get_value()
-        )
-        return trapezoid
+    @staticmethod
+    def areas_of(parameters):
+        base1, base2, height = parameters[:, 2:5].T
+        return 0.5 * (base1 + base2) * height
+
+    @staticmethod
+    def perimeters_of(parameters):
+        base1, base2, height = parameters[:, 2:5].T
+        side1 = np.sqrt((0.5 * (base2 - base1)) ** 2 + height ** 2)
+        side2 = np.sqrt((0.5 * (base2 + base1)) ** 2 + height ** 2)
+        return base1 + base2 + side1 + side2
+
+    @staticmethod
+    def outline(parameters):
+        x, y, base1, base2, height, rotation = parameters.T
+        bx = x + 0.5 * (base1 - base2)
+        by = y + height
+        return turned(np.stack([
+            np.stack([x, y], axis=-1),
+            np.stack([bx, by], axis=-1),
+            np.stack([bx + base2, by], axis=-1),
+            np.stack([x + base1, y], axis=-1)
+        ], axis=1), x, y, rotation)
+
+
+# math.sin of every distinct angle in degrees, so that the vector formulas
+# give the very same results as the methods of single figures
+def sines(angles):
+    distinct, inverse = np.unique(angles, return_inverse=True)
+    return np.array(
+        [math.sin(math.radians(angle)) for angle in distinct.tolist()]
+    )[inverse]
+
+
+# numbers written back by bulk operations stay ints where they were and
+# the operation kept them whole
+def set_number(symbol, value, exact):
+    old = symbol.get_value()
+    if exact and isinstance(old, int):
+        value = int(value)
+    if value != old or type(value) is not type(old):
+        symbol.set_value(value)
+
+
+# scenes built from at least this many figures index them right away, smaller
+# ones on their first spatial query
+INDEX_THRESHOLD = 1000
 
 
 class Scene:
+    max_tiles = MAXIMUM_TILES
+
     def __init__(self, arguments) -> None:
         self.attributes = {
             'figures': Symbol(arguments[0]),
         }
+        self.cache = RenderCache()
+        self.index = None
+        self.cached_bounds = None
+        self.seen = []
+        self.seen_revision = 0
         self.methods = {
             'add': self.add_figure,
             'remove': self.remove_figure,
             'clear': self.clear,
-            'render': self.render
+            'render': self.render,
+            'export_svg': self.export_svg,
+            'rasterize': self.rasterize,
+            'render_tiles': self.render_tiles,
+            'figures_in': self.figures_in,
+            'figures_at': self.figures_at,
+            'overlaps': self.overlaps,
+            'hit_test': self.hit_test,
+            'bounds': self.bounding_box,
+            'areas': self.areas,
+            'perimeters': self.perimeters,
+            'total_area': self.total_area,
+            'union_area': self.union_area,
+            'coverage': self.coverage,
+            'translate': self.translate,
+            'scale': self.scale,
+            'rotate': self.rotate,
+            'fill_square_grid': self.fill_square_grid,
+            'hex_tiling': self.hex_tiling,
+            'triangle_tiling': self.triangle_tiling
         }
+        if (
+            isinstance(arguments[0], list) and
+            len(arguments[0]) >= INDEX_THRESHOLD
+        ):
+            self.spatial_index()
 
     def add_figure(self, arguments):
         if len(arguments) != 1:
             raise BaseForInvalidNumberOfArgumentsError(1, len(arguments))
-        self.attributes['figures'].get_value().append(Symbol(arguments[0]))
+        if isinstance(arguments[0], Figure) is False:
+            raise BaseForInvalidFunCallArgumentsError('add')
+        self.refresh()
+        figure = arguments[0]
+        self.attributes['figures'].get_value().append(Symbol(figure))
+        self.seen.append(figure)
+        self.seen_revision += figure.geometry_revision()
+        if self.index is not None:
+            self.index.insert(figure)
+        self.cached_bounds = None
 
     def remove_figure(self, arguments):
         if len(arguments) != 1:
             raise BaseForInvalidNumberOfArgumentsError(1, len(arguments))
+        self.refresh()
         self.attributes['figures'].get_value().pop(arguments[0])
+        figure = self.seen.pop(arguments[0])
+        self.seen_revision -= figure.geometry_revision()
+        if self.index is not None:
+            self.index.remove(figure)
+        self.cached_bounds = None
 
     def clear(self, arguments):
         if len(arguments) != 0:
             raise BaseForInvalidNumberOfArgumentsError(0, len(arguments))
         self.attributes['figures'].get_value().clear()
+        self.seen, self.seen_revision = [], 0
+        if self.index is not None:
+            self.index.clear()
+        self.cached_bounds = None
+
+    # the figures of the scene. the list may be assigned to directly or be
+    # shared with other scenes, and the figures may change anywhere, so every
+    # query compares the figures and the sum of their geometry revisions with
+    # those of the last query; the bounds are dropped if either differs, the
+    # index built again if the figures do and brought up to date otherwise
+    def refresh(self):
+        figures = self.figures()
+        revision = sum(figure.geometry_revision() for figure in figures)
+        if same_items(figures, self.seen) is False:
+            self.index = None
+            self.cached_bounds = None
+        elif revision != self.seen_revision:
+            self.cached_bounds = None
+            if self.index is not None:
+                self.index.refresh()
+        self.seen, self.seen_revision = figures, revision
+        return figures
+
+    # parameters() of the figures stacked by type, with their indices
+    def groups(self):
+        return figure_groups(self.figures())
+
+    # one value per figure in the order of the scene, computed for all
+    # figures of one type at once
+    def measures(self, method_name, measure):
+        values = np.empty(len(self.attributes['figures'].get_value()))
+        try:
+            for kind, indices, parameters in self.groups():
+                values[indices] = getattr(kind, measure)(parameters)
+        except BaseForInvalidFunCallArgumentsError:
+            raise BaseForInvalidFunCallArgumentsError(method_name)
+        return values
+
+    def areas(self, arguments):
+        if len(arguments) != 0:
+            raise BaseForInvalidNumberOfArgumentsError(0, len(arguments))
+        return Symbol(FloatArray(self.measures('areas', 'areas_of')))
+
+    def perimeters(self, arguments):
+        if len(arguments) != 0:
+            raise BaseForInvalidNumberOfArgumentsError(0, len(arguments))
+        return Symbol(FloatArray(self.measures('perimeters', 'perimeters_of')))
+
+    # added up one after another, as a loop over the figures would
+    def total_area(self, arguments):
+        if len(arguments) != 0:
+            raise BaseForInvalidNumberOfArgumentsError(0, len(arguments))
+        areas = self.measures('total_area', 'areas_of')
+        if len(areas) == 0:
+            return Symbol(0)
+        return Symbol(float(np.add.accumulate(areas)[-1]))
+
+    # the area covered by the figures, counting where they overlap once
+    def union_area(self, arguments):
+        if len(arguments) != 0:
+            raise BaseForInvalidNumberOfArgumentsError(0, len(arguments))
+        try:
+            area = covered_area(self.groups(), self.figure_bounds())
+        except BaseForInvalidFunCallArgumentsError:
+            raise BaseForInvalidFunCallArgumentsError('union_area')
+        return Symbol(area)
+
+    # the part of the area of a figure covered by the figures, from 0 for
+    # none to 1 for all of it
+    def coverage(self, arguments):
+        if len(arguments) != 1:
+            raise BaseForInvalidNumberOfArgumentsError(1, len(arguments))
+        region = arguments[0]
+        if isinstance(region, Figure) is False:
+            raise BaseForInvalidFunCallArgumentsError('coverage')
+        kind = region.kind if isinstance(region, RowView) else type(region)
+        try:
+            parameters = np.array(region.parameters(), dtype=float)
+            area = figure_areas([(kind, np.array([0]), parameters[None])], 1)
+            if area[0] <= 0:
+                raise BaseForInvalidFunCallArgumentsError('coverage')
+            covered = covered_area(
+                self.groups(), self.figure_bounds(), (kind, parameters)
+            )
+        except BaseForInvalidFunCallArgumentsError:
+            raise BaseForInvalidFunCallArgumentsError('coverage')
+        return Symbol(min(covered / float(area[0]), 1.0))
+
+    def translate(self, arguments):
+        if len(arguments) != 2:
+            raise BaseForInvalidNumberOfArgumentsError(2, len(arguments))
+        if (
+            isinstance(arguments[0], (int, float)) is False or
+            isinstance(arguments[1], (int, float)) is False
+        ):
+            raise BaseForInvalidFunCallArgumentsError('translate')
+        self.transform('translate', translate, *arguments)
+
+    def scale(self, arguments):
+        factor, origin = self.transform_arguments(arguments, 'scale')
+        if factor <= 0:
+            raise BaseForInvalidFunCallArgumentsError('scale')
+        self.transform('scale', scale, factor, origin)
+
+    def rotate(self, arguments):
+        degrees, origin = self.transform_arguments(arguments, 'rotate')
+        self.transform('rotate', rotate, degrees, origin)
+
+    # a number, optionally followed by the Point to scale or rotate around,
+    # which is (0, 0) otherwise
+    def transform_arguments(self, arguments, method_name):
+        if len(arguments) not in (1, 2):
+            raise BaseForInvalidNumberOfArgumentsError(2, len(arguments))
+        if isinstance(arguments[0], (int, float)) is False:
+            raise BaseForInvalidFunCallArgumentsError(method_name)
+        origin = (0, 0)
+        if len(arguments) == 2:
+            if isinstance(arguments[1], Point) is False:
+                raise BaseForInvalidFunCallArgumentsError(method_name)
+            origin = arguments[1].get_properties(method_name)
+        return arguments[0], origin
+
+    # the new parameters of all figures of one type are computed at once and
+    # then written back into the figures; points shared by figures get the
+    # same new coordinates from each of them
+    def transform(self, method_name, transform, *arguments):
+        figures = self.figures()
+        try:
+            groups = figure_groups(figures)
+        except BaseForInvalidFunCallArgumentsError:
+            raise BaseForInvalidFunCallArgumentsError(method_name)
+        for kind, indices, parameters in groups:
+            parameters, exact = transform(kind, parameters, *arguments)
+            exact = exact.tolist()
+            for index, values in zip(indices.tolist(), parameters.tolist()):
+                figures[index].set_parameters(values, exact)
+
+    # tilings of cols by rows cells from an origin Point, added as figures
+    # made all at once rather than one by one
+    def fill_square_grid(self, arguments):
+        self.tile('fill_square_grid', Square, square_grid, 1, arguments)
+
+    def hex_tiling(self, arguments):
+        self.tile('hex_tiling', Rhomb, hex_grid, 3, arguments)
+
+    def triangle_tiling(self, arguments):
+        self.tile('triangle_tiling', Triangle, triangle_grid, 1, arguments)
+
+    # a tiling adds at most max_tiles figures in one call
+    def tile(self, method_name, kind, tiling, per_cell, arguments):
+        if len(arguments) != 4:
+            raise BaseForInvalidNumberOfArgumentsError(4, len(arguments))
+        origin, side, cols, rows = arguments
+        if (
+            isinstance(origin, Point) is False or
+            isinstance(side, (int, float)) is False or side <= 0 or
+            isinstance(cols, int) is False or cols < 0 or
+            isinstance(rows, int) is False or rows < 0 or
+            cols * rows * per_cell > self.max_tiles
+        ):
+            raise BaseForInvalidFunCallArgumentsError(method_name)
+        origin = origin.get_properties(method_name)
+        self.add_figures(kind, *tiling(origin, side, cols, rows))
+
+    # figures of one type from the rows of their parameters(), the exact
+    # columns kept as ints
+    def add_figures(self, kind, parameters, exact):
+        exact = exact.tolist()
+        figures = []
+        for values in parameters.tolist():
+            figure = new_figure(kind)
+            figure.set_parameters(values, exact)
+            figures.append(Symbol(figure))
+        self.attributes['figures'].get_value().extend(figures)
+        # the index is built again in bulk on the next query
+        self.index = None
+        self.cached_bounds = None
+
+    # pairs of figures whose insides overlap, in the order of the scene;
+    # an optional number of worker processes to search with
+    def overlaps(self, arguments):
+        if len(arguments) > 1:
+            raise BaseForInvalidNumberOfArgumentsError(1, len(arguments))
+        workers = 1
+        if len(arguments) == 1:
+            workers = arguments[0]
+            if isinstance(workers, int) is False or workers < 1:
+                raise BaseForInvalidFunCallArgumentsError('overlaps')
+        try:
+            pairs = overlapping_pairs(
+                self.groups(), self.figure_bounds(), workers
+            )
+        except BaseForInvalidFunCallArgumentsError:
+            raise BaseForInvalidFunCallArgumentsError('overlaps')
+        figures = self.attributes['figures'].get_value()
+        found = {
+            index: figures[index].get_value()
+            for index in np.unique(pairs).tolist()
+        }
+        return Symbol([
+            Symbol([Symbol(found[first]), Symbol(found[second])])
+            for first, second in pairs.tolist()
+        ])
+
+    # the index of the figure on top at every point, the last one added of
+    # those containing it, or -1; the points are given as a list of Points
+    # or as two numeric arrays of their x and y coordinates
+    def hit_test(self, arguments):
+        x, y = hit_test_arguments(arguments)
+        try:
+            table = CellTable(self.groups(), self.figure_bounds())
+        except BaseForInvalidFunCallArgumentsError:
+            raise BaseForInvalidFunCallArgumentsError('hit_test')
+        hits = table.topmost(x, y)
+        return Symbol(IntArray(hits.astype(IntArray.dtype, copy=False)))
+
+    def figure_bounds(self):
+        return figure_bounds(self.figures())
+
+    # (x_min, y_min, x_max, y_max) of all figures, None for an empty scene
+    def bounds(self):
+        figures = self.refresh()
+        if self.cached_bounds is None and figures:
+            (x_min, y_min), (x_max, y_max) = total_bounds(
+                figure_bounds(figures)
+            )
+            self.cached_bounds = (
+                float(x_min), float(y_min), float(x_max), float(y_max)
+            )
+        return self.cached_bounds
+
+    def bounding_box(self, arguments):
+        if len(arguments) != 0:
+            raise BaseForInvalidNumberOfArgumentsError(0, len(arguments))
+        try:
+            bounds = self.bounds()
+        except BaseForInvalidFunCallArgumentsError:
+            raise BaseForInvalidFunCallArgumentsError('bounds')
+        if bounds is None:
+            raise BaseForInvalidFunCallArgumentsError('bounds')
+        return Symbol(box_rectangle(bounds))
+
+    def spatial_index(self):
+        figures = self.refresh()
+        if self.index is None:
+            self.index = UniformGrid.build(figures)
+        return self.index
+
+    def figures_in(self, arguments):
+        if len(arguments) != 1:
+            raise BaseForInvalidNumberOfArgumentsError(1, len(arguments))
+        if isinstance(arguments[0], (Rectangle, Square)) is False:
+            raise BaseForInvalidFunCallArgumentsError('figures_in')
+        try:
+            figures = self.spatial_index().figures_in(arguments[0].bounds())
+        except BaseForInvalidFunCallArgumentsError:
+            raise BaseForInvalidFunCallArgumentsError('figures_in')
+        return Symbol([Symbol(figure) for figure in figures])
+
+    def figures_at(self, arguments):
+        if len(arguments) != 1:
+            raise BaseForInvalidNumberOfArgumentsError(1, len(arguments))
+        if isinstance(arguments[0], Point) is False:
+            raise BaseForInvalidFunCallArgumentsError('figures_at')
+        point = arguments[0].get_properties('figures_at')
+        try:
+            figures = self.spatial_index().figures_at(point)
+        except BaseForInvalidFunCallArgumentsError:
+            raise BaseForInvalidFunCallArgumentsError('figures_at')
+        return Symbol([Symbol(figure) for figure in figures])
 
     def render(self, arguments):
+        render_figures(arguments, self.figures(), self.cache.collection)
+
+    def export_svg(self, arguments):
+        if len(arguments) != 1:
+            raise BaseForInvalidNumberOfArgumentsError(1, len(arguments))
+        if isinstance(arguments[0], str) is False:
+            raise BaseForInvalidFunCallArgumentsError('export_svg')
+        figures = (
+            figure.get_value()
+            for figure in self.attributes['figures'].get_value()
+        )
+        try:
+            export_svg(figures, arguments[0])
+        except BaseForInvalidFunCallArgumentsError:
+            raise BaseForInvalidFunCallArgumentsError('export_svg')
+
+    def rasterize(self, arguments):
+        if len(arguments) < 3:
+            raise BaseForInvalidNumberOfArgumentsError(3, len(arguments))
+        if len(arguments) > 5:
+            raise BaseForInvalidNumberOfArgumentsError(5, len(arguments))
+        path, width, height = arguments[:3]
+        if (
+            isinstance(path, str) is False or
+            isinstance(width, int) is False or
+            isinstance(height, int) is False or
+            width <= 0 or height <= 0
+        ):
+            raise BaseForInvalidFunCallArgumentsError('rasterize')
+        viewport, min_size = viewport_arguments(arguments[3:], 'rasterize')
+        try:
+            canvas = self.raster(width, height, viewport, min_size)
+        except BaseForInvalidFunCallArgumentsError:
+            raise BaseForInvalidFunCallArgumentsError('rasterize')
+        canvas.to_png(path)
+
+    def raster(self, width, height, viewport=None, min_size=0):
+        return self.cache.rasterize(
+            self.figures(),
+            width,
+            height,
+            viewport=viewport,
+            min_size=min_size
+        )
+
+    def render_tiles(self, arguments):
+        if len(arguments) not in (3, 4):
+            raise BaseForInvalidNumberOfArgumentsError(3, len(arguments))
+        path, width, height = arguments[:3]
+        if (
+            isinstance(path, str) is False or
+            isinstance(width, int) is False or
+            isinstance(height, int) is False or
+            width <= 0 or height <= 0
+        ):
+            raise BaseForInvalidFunCallArgumentsError('render_tiles')
+        viewport, _ = viewport_arguments(arguments[3:], 'render_tiles')
+        try:
+            render_tiles(self.figures(), width, height, path, viewport)
+        except BaseForInvalidFunCallArgumentsError:
+            raise BaseForInvalidFunCallArgumentsError('render_tiles')
+
+    def figures(self):
+        return [
+            figure.get_value()
+            for figure in self.attributes['figures'].get_value()
+        ]
+
+    def patches(self):
+        for figure in self.figures():
+            yield figure.patch()
+
+
+# style attributes of figures by the keys of their style()
+STYLE_ATTRIBUTES = {
+    'color': 'fc',
+    'border_color': 'ec',
+    'border_width': 'lw',
+    'border_style': 'ls',
+    'fill': 'fill',
+    'opacity': 'alpha'
+}
+
+
+# number of a figure kept in the columns of a scene, read and written in
+# place; ints come back as ints
+class ColumnSymbol(Symbol):
+    def __init__(self, view, column, name) -> None:
+        self.view = view
+        self.column = column
+        self.name = name
+
+    @property
+    def value(self):
+        return self.view.columns.value(self.view.row, self.column)
+
+    def set_value(self, new_value):
+        if isinstance(new_value, (int, float)) is False:
+            raise BaseForInvalidFunCallArgumentsError(self.name)
+        view = self.view
+        view.store.set_value(view.columns, view.row, self.column, new_value)
+
+    def get_value(self):
+        return self.value
+
+
+# point of a figure kept in the columns of a scene; a point given to it is
+# copied into the columns rather than kept
+class PointColumnSymbol(Symbol):
+    def __init__(self, view, column, name) -> None:
+        self.view = view
+        self.column = column
+        self.name = name
+
+    @property
+    def value(self):
+        return RowPoint(self.view, self.column)
+
+    def set_value(self, new_value):
+        if isinstance(new_value, Point) is False:
+            raise BaseForInvalidFunCallArgumentsError(self.name)
+        x, y = new_value.get_properties(self.name)
+        view = self.view
+        view.store.set_value(view.columns, view.row, self.column, x)
+        view.store.set_value(view.columns, view.row, self.column + 1, y)
+
+    def get_value(self):
+        return self.value
+
+
+class StyleSymbol(Symbol):
+    def __init__(self, view, key) -> None:
+        self.view = view
+        self.key = key
+
+    @property
+    def value(self):
+        view = self.view
+        return view.store.style(view.columns, view.row)[self.key]
+
+    def set_value(self, new_value):
+        view = self.view
+        view.store.set_style(view.columns, view.row, self.key, new_value)
+
+    def get_value(self):
+        return self.value
+
+
+class RowPoint(Point):
+    def __init__(self, view, column) -> None:
+        super().__init__([None, None])
+        self.attributes = {
+            'x': ColumnSymbol(view, column, 'x'),
+            'y': ColumnSymbol(view, column + 1, 'y')
+        }
+
+
+# figure kept as a row of the columns of a ColumnarScene, holding nothing
+# but where the row is; its attributes read and write the row in place and
+# its methods are those of its type
+class RowView:
+    kind = None
+    method_names = {}
+
+    def __init__(self, store, columns, row) -> None:
+        self.store = store
+        self.place = (columns, row)
+        self.cached_bounds = None
+        self.attributes = {}
+        column = 0
+        for name in self.points:
+            self.attributes[name] = PointColumnSymbol(self, column, name)
+            column += 2
+        for name in self.numbers:
+            self.attributes[name] = ColumnSymbol(self, column, name)
+            column += 1
+        self.attributes.setdefault('position', self.attributes[self.points[0]])
+        for name, key in STYLE_ATTRIBUTES.items():
+            self.attributes[name] = StyleSymbol(self, key)
+        self.methods = {
+            name: getattr(self, function)
+            for name, function in self.method_names.items()
+        }
+
+    # the columns and row of the figure, which move when the store is
+    # compacted while the figure is still in the scene
+    def locate(self):
+        columns, row = self.place
+        while columns.moved is not None and columns.moved[1][row] >= 0:
+            columns, row = columns.moved[0], int(columns.moved[1][row])
+            self.place = (columns, row)
+        return columns, row
+
+    @property
+    def columns(self):
+        return self.locate()[0]
+
+    @property
+    def row(self):
+        return self.locate()[1]
+
+    # the counters of the whole store, as the row may change through other
+    # views or bulk operations
+    def revision(self):
+        return self.store.changes
+
+    def geometry_revision(self):
+        return self.store.geometry_changes
+
+    def parameters(self):
+        return self.columns.values(self.row)
+
+    def style(self):
+        return dict(self.store.style(self.columns, self.row))
+
+
+# a figure of a type with new points, its numbers 1 and its rotation 0
+def new_figure(kind):
+    return kind(
+        [Point([0, 0]) for _ in kind.points] + [1] * len(kind.numbers)
+    )
+
+
+# the view type of a type of figure offers the same methods, found by the
+# names of the functions behind them on a figure of that type
+def view_class(kind):
+    figure = new_figure(kind)
+    return type(kind.__name__, (RowView, kind), {
+        'kind': kind,
+        'method_names': {
+            name: method.__name__ for name, method in figure.methods.items()
+        }
+    })
+
+
+VIEW_CLASSES = {
+    kind: view_class(kind)
+    for kind in (
+        Square, Rectangle, Circle, Triangle, Rhomb, Parallelogram, Trapeze
+    )
+}
+
+
+# whether two lists hold the very same objects in the same order
+def same_items(first, second):
+    return len(first) == len(second) and all(
+        item is other for item, other in zip(first, second)
+    )
+
+
+# what a ColumnStore keeps of a figure
+def figure_record(figure):
+    kind = figure.kind if isinstance(figure, RowView) else type(figure)
+    return kind, figure.parameters(), figure.style()
+
+
+# figure of a columnar scene at an index; a figure assigned to it is copied
+# into the columns in place of the one there
+class FigureSlot(Symbol):
+    def __init__(self, scene, index) -> None:
+        super().__init__(scene.view(index))
+        self.scene = scene
+        self.index = index
+
+    def set_value(self, new_value):
+        if isinstance(new_value, Figure) is False:
+            raise BaseForInvalidTypeError(
+                'figure', type(new_value).__name__
+            )
+        self.scene.store.replace(self.index, figure_record(new_value))
+        self.value = self.scene.view(self.index)
+
+
+# attribute scripts may read but not assign to
+class ReadOnlySymbol(Symbol):
+    def __init__(self, name, value=None) -> None:
+        super().__init__(value)
+        self.name = name
+
+    def set_value(self, new_value):
+        raise BaseForReadOnlyAttributeError(self.name)
+
+
+# the figures of a columnar scene as scripts see them, each made into a view
+# when it is looked at
+class ColumnFigures:
+    def __init__(self, scene) -> None:
+        self.scene = scene
+
+    def __getitem__(self, index):
+        return FigureSlot(self.scene, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __len__(self):
+        return len(self.scene.store)
+
+
+# spatial queries of a columnar scene look at the bounding boxes of all its
+# figures at once rather than keeping an index up to date
+class ColumnIndex:
+    def __init__(self, scene) -> None:
+        self.scene = scene
+
+    def meeting(self, box):
+        x_min, y_min, x_max, y_max = box
+        bounds = self.scene.figure_bounds()
+        return np.flatnonzero(
+            (bounds[:, 2] >= x_min) & (bounds[:, 0] <= x_max) &
+            (bounds[:, 3] >= y_min) & (bounds[:, 1] <= y_max)
+        )
+
+    def figures_in(self, box):
+        return [self.scene.view(index) for index in self.meeting(box).tolist()]
+
+    def figures_at(self, point):
+        found = self.meeting((*point, *point))
+        inside = np.zeros(len(found), dtype=bool)
+        for kind, indices, parameters in self.scene.store.groups(found):
+            inside[indices] = contains_point(kind, parameters, point)
+        return [self.scene.view(index) for index in found[inside].tolist()]
+
+
+# scene keeping its figures as columns of numbers rather than as objects,
+# some tens of bytes for every figure; figures are copied in when added and
+# scripts get views of them, which read and write the columns in place
+class ColumnarScene(Scene):
+    max_tiles = MAXIMUM_ARRAY_SIZE
+
+    def __init__(self, arguments) -> None:
+        self.store = ColumnStore()
+        super().__init__([[]])
+        self.attributes['figures'] = ReadOnlySymbol(
+            'figures', ColumnFigures(self)
+        )
+        self.cached_figure_bounds = None
+        try:
+            self.store.extend(
+                figure_record(figure.get_value()) for figure in arguments[0]
+            )
+        except BaseForInvalidFunCallArgumentsError:
+            raise BaseForInvalidConstructorArgumentsError('ColumnarScene')
+
+    def add_figure(self, arguments):
+        if len(arguments) != 1:
+            raise BaseForInvalidNumberOfArgumentsError(1, len(arguments))
+        if isinstance(arguments[0], Figure) is False:
+            raise BaseForInvalidFunCallArgumentsError('add')
+        try:
+            self.store.extend([figure_record(arguments[0])])
+        except BaseForInvalidFunCallArgumentsError:
+            raise BaseForInvalidFunCallArgumentsError('add')
+
+    def remove_figure(self, arguments):
+        if len(arguments) != 1:
+            raise BaseForInvalidNumberOfArgumentsError(1, len(arguments))
+        if isinstance(arguments[0], int) is False:
+            raise BaseForInvalidFunCallArgumentsError('remove')
+        self.store.remove(arguments[0])
+
+    def clear(self, arguments):
         if len(arguments) != 0:
             raise BaseForInvalidNumberOfArgumentsError(0, len(arguments))
-        plt.axes()
-        for figure in self.attributes['figures'].get_value():
-            try:
-                plt.gca().add_patch(figure.get_value().patch())
-            except BaseForInvalidFunCallArgumentsError:
-                raise BaseForInvalidFunCallArgumentsError('render')
-        plt.axis('scaled')
-        plt.show()
+        self.store.clear()
+
+    def view(self, index):
+        if isinstance(index, int) is False:
+            raise TypeError(index)
+        columns, row = self.store.locate(index)
+        return VIEW_CLASSES[columns.kind](self.store, columns, row)
+
+    def figures(self):
+        return [self.view(index) for index in range(len(self.store))]
+
+    def groups(self):
+        return self.store.groups()
+
+    def transform(self, method_name, transform, *arguments):
+        self.store.transform(transform, *arguments)
+
+    def add_figures(self, kind, parameters, exact):
+        style = self.store.style_table.index(new_figure(kind).style())
+        self.store.append(kind, parameters, bit_mask(exact.tolist()), style)
+
+    # bounding boxes of all figures, kept until the geometry changes
+    def figure_bounds(self):
+        changes = self.store.geometry_changes
+        if (
+            self.cached_figure_bounds is None or
+            self.cached_figure_bounds[0] != changes
+        ):
+            self.cached_figure_bounds = (changes, self.store.bounds())
+        return self.cached_figure_bounds[1]
+
+    def bounds(self):
+        if len(self.store) == 0:
+            return None
+        (x_min, y_min), (x_max, y_max) = total_bounds(self.figure_bounds())
+        return float(x_min), float(y_min), float(x_max), float(y_max)
+
+    def spatial_index(self):
+        return ColumnIndex(self)
+
+    def render(self, arguments):
+        render_figures(arguments, self.store, self.collection)
+
+    def collection(self, store, viewport=None, pixel_size=None, min_size=0):
+        return grouped_collection(
+            store.groups(),
+            store.styles(),
+            self.figure_bounds(),
+            viewport,
+            pixel_size,
+            min_size
+        )
+
+    def raster(self, width, height, viewport=None, min_size=0):
+        return rasterize_groups(
+            self.store.groups(),
+            self.store.styles(),
+            self.figure_bounds(),
+            width,
+            height,
+            viewport=viewport,
+            min_size=min_size
+        )
+
+
+# without a path the figures are shown in a pyplot window, given one they
+# are written to a PNG file without touching pyplot; a viewport and minimum
+# on-screen size may follow, as for rasterize
+def render_figures(arguments, figures, collection=figure_collection):
+    if len(arguments) > 3:
+        raise BaseForInvalidNumberOfArgumentsError(3, len(arguments))
+    path = None
+    if arguments and isinstance(arguments[0], str):
+        path, arguments = arguments[0], arguments[1:]
+    if len(arguments) > 2:
+        raise BaseForInvalidFunCallArgumentsError('render')
+    viewport, min_size = viewport_arguments(arguments, 'render')
+    scale = None
+    if viewport is not None and path is None:
+        figure = plt.gcf()
+        scale = pixel_size(viewport, figure.dpi, figure.get_size_inches())
+    elif viewport is not None:
+        scale = pixel_size(viewport)
+    try:
+        artist = collection(figures, viewport, scale, min_size)
+    except BaseForInvalidFunCallArgumentsError:
+        raise BaseForInvalidFunCallArgumentsError('render')
+    if path is not None:
+        render_png([artist], path, viewport=viewport)
+        return
+    plt.axes()
+    plt.gca().add_collection(artist)
+    show_viewport(plt.gca(), viewport)
+    plt.show()
+
+
+# the viewport is given as a Rectangle or Square in scene coordinates, the
+# minimum size in pixels
+def viewport_arguments(arguments, method_name):
+    viewport = None
+    min_size = 0
+    if len(arguments) > 0:
+        if isinstance(arguments[0], (Rectangle, Square)) is False:
+            raise BaseForInvalidFunCallArgumentsError(method_name)
+        x_min, y_min, x_max, y_max = arguments[0].bounds()
+        viewport = (x_min, y_min), (x_max, y_max)
+    if len(arguments) > 1:
+        if (
+            isinstance(arguments[1], (int, float)) is False or
+            isinstance(arguments[1], bool) or
+            arguments[1] < 0
+        ):
+            raise BaseForInvalidFunCallArgumentsError(method_name)
+        min_size = arguments[1]
+    return viewport, min_size
+
+
+def hit_test_arguments(arguments):
+    if len(arguments) not in (1, 2):
+        raise BaseForInvalidNumberOfArgumentsError(1, len(arguments))
+    if len(arguments) == 2:
+        x, y = arguments
+        if (
+            isinstance(x, NumericArray) is False or
+            isinstance(y, NumericArray) is False
+        ):
+            raise BaseForInvalidFunCallArgumentsError('hit_test')
+        if len(x) != len(y):
+            raise BaseForInvalidFunCallArgumentsError('hit_test')
+        return x.values.astype(float), y.values.astype(float)
+    if isinstance(arguments[0], list) is False:
+        raise BaseForInvalidFunCallArgumentsError('hit_test')
+    points = []
+    for point in arguments[0]:
+        if isinstance(point.get_value(), Point) is False:
+            raise BaseForInvalidFunCallArgumentsError('hit_test')
+        points.append(point.get_value().get_properties('hit_test'))
+    points = np.array(points, dtype=float).reshape(-1, 2)
+    return points[:, 0], points[:, 1]
+
+
+def box_rectangle(bounds):
+    x_min, y_min, x_max, y_max = bounds
+    return Rectangle([Point([x_min, y_min]), x_max - x_min, y_max - y_min])
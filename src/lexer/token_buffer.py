@@ -0,0 +1,21 @@
+from src.lexer.tokens import TokenType
+
+
+# reads the whole input up front, so that lexing can be measured apart from
+# parsing -- the parser takes tokens from it the same way as from a lexer
+class TokenBuffer:
+    def __init__(self, lexer):
+        self.tokens = []
+        while True:
+            token = lexer.tokenize()
+            self.tokens.append((token, lexer.current_token_position))
+            if token.token_type == TokenType.END_OF_FILE:
+                break
+        self.index = 0
+        self.current_token_position = lexer.current_token_position
+
+    def tokenize(self):
+        token, self.current_token_position = self.tokens[self.index]
+        if self.index < len(self.tokens) - 1:
+            self.index += 1
+        return token
@@ -0,0 +1,45 @@
+from matplotlib import rcParams
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import Collection
+from matplotlib.figure import Figure
+
+DPI = 100
+FIGURE_SIZE = (6.4, 4.8)
+
+
+# draws on its own figure and canvas instead of the global pyplot state, so
+# any number of renders can run side by side in threads or processes
+def render_png(artists, target, dpi=DPI, size=FIGURE_SIZE, viewport=None):
+    figure = Figure(figsize=size, dpi=dpi)
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+    for artist in artists:
+        if isinstance(artist, Collection):
+            axes.add_collection(artist)
+        else:
+            axes.add_patch(artist)
+    show_viewport(axes, viewport)
+    figure.savefig(target, format='png')
+
+
+def show_viewport(axes, viewport):
+    if viewport is None:
+        axes.axis('scaled')
+        return
+    (x_min, y_min), (x_max, y_max) = viewport
+    axes.set_xlim(x_min, x_max)
+    axes.set_ylim(y_min, y_max)
+    axes.set_aspect('equal')
+
+
+# data units per pixel once the viewport is fitted into the axes, which
+# take the default subplot share of the figure
+def pixel_size(viewport, dpi=DPI, size=FIGURE_SIZE):
+    (x_min, y_min), (x_max, y_max) = viewport
+    width = size[0] * dpi * (
+        rcParams['figure.subplot.right'] - rcParams['figure.subplot.left']
+    )
+    height = size[1] * dpi * (
+        rcParams['figure.subplot.top'] - rcParams['figure.subplot.bottom']
+    )
+    return max((x_max - x_min) / width, (y_max - y_min) / height)
@@ -0,0 +1,131 @@
+import numpy as np
+from matplotlib.collections import PathCollection
+from matplotlib.colors import to_rgba
+from matplotlib.path import Path
+
+from src.geometry.bounds import figure_bounds, figure_groups
+from src.rendering.culling import centers, level_of_detail
+
+TRANSPARENT = (0, 0, 0, 0)
+
+
+# one collection for the whole scene keeps the drawing order of the figures,
+# while the paths are built in bulk for every type of figure and the colors
+# are converted once for every distinct style; given a viewport, figures
+# outside of it are left out and those below min_size pixels become points
+def figure_collection(figures, viewport=None, pixel_size=None, min_size=0):
+    drawn = np.ones(len(figures), dtype=bool)
+    collapsed = np.zeros(len(figures), dtype=bool)
+    bounds = None
+    if viewport is not None:
+        bounds = figure_bounds(figures)
+        drawn, collapsed = level_of_detail(
+            bounds, viewport, pixel_size, min_size
+        )
+    paths = [None] * len(figures)
+    full = np.flatnonzero(drawn & ~collapsed).tolist()
+    for kind, indices, parameters in figure_groups(
+        [figures[index] for index in full]
+    ):
+        for index, path in zip(indices.tolist(), kind.paths(parameters)):
+            paths[full[index]] = path
+    order, paths = drawn_paths(paths, drawn, collapsed, bounds, pixel_size)
+    return styled_collection(
+        paths,
+        [figures[index].style() for index in order],
+        collapsed[order].tolist()
+    )
+
+
+# the same for figures kept as columns, which come with their parameters
+# stacked by type, their styles and their bounding boxes
+def grouped_collection(
+    groups, styles, bounds, viewport=None, pixel_size=None, min_size=0
+):
+    drawn = np.ones(len(styles), dtype=bool)
+    collapsed = np.zeros(len(styles), dtype=bool)
+    if viewport is not None:
+        drawn, collapsed = level_of_detail(
+            bounds, viewport, pixel_size, min_size
+        )
+    paths = [None] * len(styles)
+    full = drawn & ~collapsed
+    for kind, indices, parameters in groups:
+        keep = full[indices]
+        for index, path in zip(
+            indices[keep].tolist(), kind.paths(parameters[keep])
+        ):
+            paths[index] = path
+    order, paths = drawn_paths(paths, drawn, collapsed, bounds, pixel_size)
+    return styled_collection(
+        paths,
+        [styles[index] for index in order],
+        collapsed[order].tolist()
+    )
+
+
+# indices and paths of the drawn figures, points standing in for those
+# collapsed
+def drawn_paths(paths, drawn, collapsed, bounds, pixel_size):
+    if collapsed.any():
+        indices = np.flatnonzero(collapsed)
+        points = point_paths(centers(bounds[indices]), pixel_size)
+        for index, path in zip(indices.tolist(), points):
+            paths[index] = path
+    order = np.flatnonzero(drawn).tolist()
+    return order, [paths[index] for index in order]
+
+
+# points take the face color of their figure, or the border color when the
+# figure is not filled, and have no border of their own
+def styled_collection(paths, styles, collapsed):
+    colors = {}
+    face_colors = np.empty((len(paths), 4))
+    edge_colors = np.empty((len(paths), 4))
+    line_widths = []
+    line_styles = []
+    for index, style in enumerate(styles):
+        key = (style['fc'], style['ec'], style['fill'], style['alpha'])
+        if key not in colors:
+            colors[key] = figure_colors(style)
+        face, edge = colors[key]
+        if collapsed[index]:
+            face = face if style['fill'] else edge
+            edge = TRANSPARENT
+            line_widths.append(0)
+        else:
+            line_widths.append(style['lw'])
+        face_colors[index], edge_colors[index] = face, edge
+        line_styles.append(style['ls'])
+
+    return PathCollection(
+        paths,
+        facecolors=face_colors,
+        edgecolors=edge_colors,
+        linewidths=single_or_all(line_widths),
+        linestyles=single_or_all(line_styles),
+        joinstyle='miter',
+        capstyle='butt'
+    )
+
+
+# the opacity of a patch applies to both its face and its border
+def figure_colors(style):
+    face = TRANSPARENT
+    if style['fill']:
+        face = to_rgba(style['fc'], style['alpha'])
+    return face, to_rgba(style['ec'], style['alpha'])
+
+
+def single_or_all(values):
+    if values and all(value == values[0] for value in values):
+        return values[0]
+    return values
+
+
+# squares one pixel wide standing in for figures too small to make out
+def point_paths(points, pixel_size):
+    square = np.array([[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]) - 0.5
+    vertices = square * pixel_size + points[:, None]
+    codes = [Path.MOVETO] + [Path.LINETO] * 3 + [Path.CLOSEPOLY]
+    return [Path(outline, codes) for outline in vertices]
@@ -0,0 +1,19 @@
+import numpy as np
+
+
+# figures whose bounding box, grown by how far their borders reach past it,
+# meets the viewport are drawn, and those of them spanning fewer than
+# min_size pixels are collapsed into points
+def level_of_detail(bounds, viewport, pixel_size, min_size=0, reach=0):
+    (x_min, y_min), (x_max, y_max) = viewport
+    drawn = (
+        (bounds[:, 2] + reach >= x_min) & (bounds[:, 0] - reach <= x_max) &
+        (bounds[:, 3] + reach >= y_min) & (bounds[:, 1] - reach <= y_max)
+    )
+    size = np.maximum(bounds[:, 2] - bounds[:, 0], bounds[:, 3] - bounds[:, 1])
+    collapsed = drawn & (size < min_size * pixel_size)
+    return drawn, collapsed
+
+
+def centers(bounds):
+    return (bounds[:, :2] + bounds[:, 2:]) / 2
@@ -0,0 +1,221 @@
+import numpy as np
+
+from src.rendering.collections import point_paths, styled_collection
+from src.geometry.bounds import figure_bounds, total_bounds
+from src.rendering.culling import centers, level_of_detail
+from src.rendering.raster import WHITE, Canvas, border_reach, fit
+
+# beyond this many changed figures the whole canvas is drawn again instead
+# of the regions around each of them
+MAX_REGIONS = 64
+
+
+class Entry:
+    def __init__(self, figure, revision):
+        self.figure = figure
+        self.revision = revision
+        self.kind = None
+        self.parameters = None
+        self.bounds = None
+        self.style = None
+        self.path = None
+
+
+# keeps what was built for every figure of a scene, along with the revision
+# of the figure it was built from, so that drawing the scene again only
+# rebuilds the figures changed since and redraws the pixels around them
+class RenderCache:
+    def __init__(self):
+        self.entries = {}
+        self.rebuilt = 0
+        self.damaged = []
+        self.canvas = None
+        self.canvas_key = None
+        self.canvas_order = []
+
+    # entries of the figures, rebuilt for those changed since the last call
+    def update(self, figures):
+        entries = {}
+        stale = []
+        replaced = []
+        for figure in figures:
+            key = id(figure)
+            if key in entries:
+                continue
+            revision = figure.revision()
+            entry = self.entries.get(key)
+            if entry is None or entry.revision != revision:
+                if entry is not None:
+                    replaced.append(entry)
+                entry = Entry(figure, revision)
+                stale.append(entry)
+            entries[key] = entry
+        for kind, entries_of_kind in grouped(stale).items():
+            parameters = np.array(
+                [entry.figure.parameters() for entry in entries_of_kind],
+                dtype=float
+            )
+            for entry, row in zip(entries_of_kind, parameters):
+                entry.kind, entry.parameters = kind, row
+        bounds = figure_bounds([entry.figure for entry in stale])
+        for entry, box in zip(stale, bounds):
+            entry.bounds = box
+            entry.style = entry.figure.style()
+
+        removed = [
+            entry for key, entry in self.entries.items() if key not in entries
+        ]
+        if self.damaged is not None:
+            self.damaged.extend(replaced + removed + stale)
+            if len(self.damaged) > MAX_REGIONS:
+                self.damaged = None
+        self.entries = entries
+        self.rebuilt = len(stale)
+        return [entries[id(figure)] for figure in figures]
+
+    def collection(self, figures, viewport=None, pixel_size=None, min_size=0):
+        entries = self.update(figures)
+        drawn = np.ones(len(entries), dtype=bool)
+        collapsed = np.zeros(len(entries), dtype=bool)
+        if viewport is not None:
+            bounds = stacked_bounds(entries)
+            drawn, collapsed = level_of_detail(
+                bounds, viewport, pixel_size, min_size
+            )
+        full = (drawn & ~collapsed).tolist()
+        for kind, entries_of_kind in grouped(
+            entry for entry, selected in zip(entries, full)
+            if selected and entry.path is None
+        ).items():
+            parameters = np.array(
+                [entry.parameters for entry in entries_of_kind]
+            )
+            for entry, path in zip(entries_of_kind, kind.paths(parameters)):
+                entry.path = path
+
+        paths = [entry.path for entry in entries]
+        if collapsed.any():
+            indices = np.flatnonzero(collapsed)
+            points = point_paths(centers(bounds[indices]), pixel_size)
+            for index, path in zip(indices.tolist(), points):
+                paths[index] = path
+        order = np.flatnonzero(drawn).tolist()
+        return styled_collection(
+            [paths[index] for index in order],
+            [entries[index].style for index in order],
+            collapsed[order].tolist()
+        )
+
+    # the canvas of the last call is drawn over where figures changed, as
+    # long as it shows the scene at the same place and size
+    def rasterize(
+        self, figures, width, height, background=WHITE, viewport=None,
+        min_size=0
+    ):
+        entries = self.update(figures)
+        bounds = stacked_bounds(entries)
+        if viewport is None:
+            scale, origin = fit(total_bounds(bounds), width, height)
+        else:
+            scale, origin = fit(viewport, width, height, margin=0)
+        key = (width, height, background, scale, tuple(origin), min_size)
+        order = [id(entry.figure) for entry in entries]
+        if (
+            self.canvas is None or
+            self.canvas_key != key or
+            self.damaged is None or
+            reordered(self.canvas_order, order)
+        ):
+            self.canvas = Canvas(width, height, scale, origin, background)
+            draw_entries(self.canvas, entries, min_size)
+        else:
+            self.redraw(entries, bounds, min_size)
+        self.canvas_key = key
+        self.canvas_order = order
+        self.damaged = []
+        return self.canvas
+
+    def redraw(self, entries, bounds, min_size):
+        canvas = self.canvas
+        left, top, right, bottom = pixel_bounds(
+            canvas, bounds, [entry.style for entry in entries]
+        )
+        regions = set()
+        for low_x, low_y, high_x, high_y in zip(*pixel_bounds(
+            canvas,
+            stacked_bounds(self.damaged),
+            [entry.style for entry in self.damaged]
+        )):
+            column = max(int(np.floor(low_x)), 0)
+            row = max(int(np.floor(low_y)), 0)
+            end_column = min(int(np.ceil(high_x)) + 1, canvas.width)
+            end_row = min(int(np.ceil(high_y)) + 1, canvas.height)
+            if column < end_column and row < end_row:
+                regions.add((column, row, end_column, end_row))
+        background = self.canvas_key[2]
+        for column, row, end_column, end_row in regions:
+            inside = np.flatnonzero(
+                (right >= column) & (left <= end_column) &
+                (bottom >= row) & (top <= end_row)
+            )
+            region = Canvas(
+                end_column - column,
+                end_row - row,
+                canvas.scale,
+                canvas.origin,
+                background,
+                (column, row)
+            )
+            draw_entries(
+                region, [entries[index] for index in inside.tolist()], min_size
+            )
+            canvas.pixels[row:end_row, column:end_column] = region.pixels
+
+
+def grouped(entries):
+    groups = {}
+    for entry in entries:
+        groups.setdefault(type(entry.figure), []).append(entry)
+    return groups
+
+
+def stacked_bounds(entries):
+    return np.array([entry.bounds for entry in entries]).reshape(-1, 4)
+
+
+# pixel boxes of the figures, borders included
+def pixel_bounds(canvas, bounds, styles):
+    reach = border_reach(styles)
+    left, top = canvas.to_pixels(bounds[:, [0, 3]]).T
+    right, bottom = canvas.to_pixels(bounds[:, [2, 1]]).T
+    return left - reach, top - reach, right + reach, bottom + reach
+
+
+def draw_entries(canvas, entries, min_size):
+    indices = {}
+    for index, entry in enumerate(entries):
+        indices.setdefault(entry.kind, []).append(index)
+    groups = [
+        (
+            kind,
+            np.array(indices_of_kind),
+            np.array([entries[index].parameters for index in indices_of_kind])
+        )
+        for kind, indices_of_kind in indices.items()
+    ]
+    canvas.draw(
+        [entry.figure for entry in entries],
+        min_size,
+        groups,
+        [entry.style for entry in entries]
+    )
+
+
+# figures kept in the scene must stay in the same order for the old canvas
+# to be drawn over
+def reordered(previous, current):
+    kept = set(previous) & set(current)
+    return (
+        [key for key in previous if key in kept] !=
+        [key for key in current if key in kept]
+    )
@@ -0,0 +1,368 @@
+import struct
+import zlib
+from itertools import islice
+
+import numpy as np
+from matplotlib.colors import to_rgba
+
+from src.geometry.bounds import figure_bounds, figure_groups, total_bounds
+from src.rendering.culling import centers, level_of_detail
+
+DPI = 100
+MARGIN = 0.05
+WHITE = (1, 1, 1, 1)
+BAND_PIXELS = 1 << 16
+
+
+# draws figures into an RGBA array with a scanline fill for polygons and a
+# distance test for circles and borders, each vectorized over the pixels of
+# a single figure; origin is the data point at the top left corner
+# a canvas may also be one tile of a larger image, whose top left corner is
+# offset pixels away from the origin. pixels are kept as float32, which is
+# ample for colors that end up as bytes
+class Canvas:
+    def __init__(
+        self, width, height, scale, origin, background=WHITE, offset=(0, 0)
+    ):
+        self.width = width
+        self.height = height
+        self.scale = scale
+        self.pixels = np.empty((height, width, 4), dtype=np.float32)
+        self.pixels[:] = background
+        self.origin = np.array(origin, dtype=float)
+        self.offset = np.array(offset, dtype=float)
+        self.colors = {}
+
+    @classmethod
+    def fitting(cls, bounds, width, height, background=WHITE, margin=MARGIN):
+        scale, origin = fit(bounds, width, height, margin)
+        return cls(width, height, scale, origin, background)
+
+    def to_pixels(self, points):
+        return (points - self.origin) * (self.scale, -self.scale) - self.offset
+
+    # data bounds of the canvas
+    def viewport(self):
+        x_min = self.origin[0] + self.offset[0] / self.scale
+        y_max = self.origin[1] - self.offset[1] / self.scale
+        return (
+            (x_min, y_max - self.height / self.scale),
+            (x_min + self.width / self.scale, y_max)
+        )
+
+    # figures off the canvas are skipped and those below min_size pixels are
+    # drawn as single pixels, a whole run of consecutive ones at once; given
+    # their groups, styles and bounds, the figures are not looked at
+    def draw(
+        self, figures, min_size=0, groups=None, styles=None, bounds=None
+    ):
+        if styles is None:
+            styles = [figure.style() for figure in figures]
+        if bounds is None:
+            bounds = figure_bounds(figures)
+        drawn, collapsed = level_of_detail(
+            bounds,
+            self.viewport(),
+            1 / self.scale,
+            min_size,
+            border_reach(styles) / self.scale
+        )
+        geometries = iter(
+            figure_geometries(figures, groups, drawn & ~collapsed, styles)
+        )
+        order = np.flatnonzero(drawn)
+        runs = np.flatnonzero(np.diff(collapsed[order])) + 1
+        for run in np.split(order, runs):
+            if len(run) == 0:
+                continue
+            if collapsed[run[0]]:
+                self.draw_points(
+                    centers(bounds[run]),
+                    [styles[index] for index in run.tolist()]
+                )
+            else:
+                self.draw_geometries(islice(geometries, len(run)))
+
+    def draw_geometries(self, geometries):
+        for shape, geometry, style in geometries:
+            face, edge, border = self.style_colors(style)
+            if shape == 'circle':
+                center = self.to_pixels(geometry[:2])
+                radius = geometry[2] * self.scale
+                self.draw_circle(center, radius, face, edge, border)
+            else:
+                vertices = self.to_pixels(geometry)
+                self.draw_polygon(vertices, face, edge, border)
+
+    # colors are kept premultiplied by their opacity, with the opacity of
+    # what is drawn over kept separately
+    def style_colors(self, style):
+        key = tuple(style.items())
+        if key not in self.colors:
+            face = None
+            if style['fill']:
+                face = blending(style['fc'], style['alpha'])
+            edge = blending(style['ec'], style['alpha'])
+            border = style['lw'] * DPI / 72
+            self.colors[key] = face, edge, border
+        return self.colors[key]
+
+    # pixels whose centers lie in the box around the given pixel coordinates,
+    # clipped to the canvas
+    def window(self, low, high):
+        c0 = max(int(np.floor(low[0])), 0)
+        r0 = max(int(np.floor(low[1])), 0)
+        c1 = min(int(np.ceil(high[0])) + 1, self.width)
+        r1 = min(int(np.ceil(high[1])) + 1, self.height)
+        if c0 >= c1 or r0 >= r1:
+            return None
+        xs = np.arange(c0, c1) + 0.5
+        ys = np.arange(r0, r1) + 0.5
+        return (slice(r0, r1), slice(c0, c1)), xs, ys
+
+    def draw_polygon(self, vertices, face, edge, border):
+        half = border / 2
+        window = self.window(
+            vertices.min(axis=0) - half,
+            vertices.max(axis=0) + half
+        )
+        if window is None:
+            return
+        region, xs, ys = window
+        if face is not None:
+            self.blend(region, polygon_mask(vertices, xs, ys), face)
+        if border > 0:
+            self.blend(region, outline_mask(vertices, xs, ys, half), edge)
+
+    def draw_circle(self, center, radius, face, edge, border):
+        half = border / 2
+        window = self.window(center - radius - half, center + radius + half)
+        if window is None:
+            return
+        region, xs, ys = window
+        distance = np.sqrt(
+            (xs[None, :] - center[0]) ** 2 + (ys[:, None] - center[1]) ** 2
+        )
+        if face is not None:
+            self.blend(region, distance <= radius, face)
+        if border > 0:
+            self.blend(region, np.abs(distance - radius) <= half, edge)
+
+    # a point takes the face color of its figure, or the border color when
+    # the figure is not filled
+    def draw_points(self, points, styles):
+        columns, rows = np.floor(self.to_pixels(points)).astype(int).T
+        inside = (
+            (columns >= 0) & (columns < self.width) &
+            (rows >= 0) & (rows < self.height)
+        )
+        premultiplied = np.empty((len(styles), 4))
+        transparency = np.empty(len(styles))
+        for index, style in enumerate(styles):
+            face, edge, _ = self.style_colors(style)
+            premultiplied[index], transparency[index] = face or edge
+        rows, columns = rows[inside], columns[inside]
+        self.pixels[rows, columns] = (
+            premultiplied[inside] +
+            self.pixels[rows, columns] * transparency[inside, None]
+        )
+
+    def blend(self, region, mask, color):
+        premultiplied, transparency = color
+        pixels = self.pixels[region]
+        pixels[mask] = premultiplied + pixels[mask] * transparency
+
+    def to_array(self):
+        return np.round(np.clip(self.pixels, 0, 1) * 255).astype(np.uint8)
+
+    def to_bytes(self):
+        return self.to_array().tobytes()
+
+    def to_png(self, target):
+        write_png(self.to_array(), target)
+
+
+# scale and origin of an image of the given size showing the bounds, with a
+# margin around them given as a share of their size
+def fit(bounds, width, height, margin=MARGIN):
+    (x_min, y_min), (x_max, y_max) = bounds
+    x_margin = (x_max - x_min) * margin
+    y_margin = (y_max - y_min) * margin
+    x_min, x_max = x_min - x_margin, x_max + x_margin
+    y_min, y_max = y_min - y_margin, y_max + y_margin
+    scale = min(
+        width / max(x_max - x_min, 1e-9),
+        height / max(y_max - y_min, 1e-9)
+    )
+    origin = (
+        (x_min + x_max) / 2 - width / scale / 2,
+        (y_min + y_max) / 2 + height / scale / 2
+    )
+    return scale, origin
+
+
+# pixels by which the borders of the figures reach past their outlines,
+# rounded up to cover the pixels they touch
+def border_reach(styles):
+    widths = np.array([style['lw'] for style in styles], dtype=float)
+    return widths * DPI / 72 / 2 + 1
+
+
+def blending(color, alpha):
+    red, green, blue, alpha = to_rgba(color, alpha)
+    return np.array([red, green, blue, 1]) * alpha, 1 - alpha
+
+
+# the parameters of all figures of one type are turned into outlines at once,
+# optionally only for the selected figures
+def figure_geometries(figures, groups=None, selected=None, styles=None):
+    if groups is None:
+        indices = np.arange(len(figures))
+        if selected is not None:
+            indices = np.flatnonzero(selected)
+        groups = [
+            (kind, indices[positions], parameters)
+            for kind, positions, parameters in figure_groups(
+                [figures[index] for index in indices.tolist()]
+            )
+        ]
+        selected = None
+    if styles is None:
+        styles = [figure.style() for figure in figures]
+    geometries = {}
+    for kind, indices, parameters in groups:
+        if selected is not None:
+            keep = selected[indices]
+            if not keep.any():
+                continue
+            indices, parameters = indices[keep], parameters[keep]
+        if kind.shape != 'circle':
+            parameters = kind.outline(parameters)
+        for index, geometry in zip(indices.tolist(), parameters):
+            geometries[index] = (kind.shape, geometry)
+    return [
+        (shape, geometry, styles[index])
+        for index, (shape, geometry) in sorted(geometries.items())
+    ]
+
+
+# every edge crossing a row of pixel centers toggles the inside of the
+# polygon from the first pixel right of the crossing (even-odd rule)
+def polygon_mask(vertices, xs, ys):
+    x1, y1 = vertices[:, 0], vertices[:, 1]
+    x2 = np.concatenate((x1[1:], x1[:1]))
+    y2 = np.concatenate((y1[1:], y1[:1]))
+    rows = ys[:, None]
+    crossing = (y1 <= rows) != (y2 <= rows)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crossing_x = x1 + (rows - y1) / (y2 - y1) * (x2 - x1)
+    row_index, edge_index = np.nonzero(crossing)
+    columns = np.searchsorted(xs, crossing_x[row_index, edge_index])
+    width = len(xs) + 1
+    toggles = np.bincount(
+        row_index * width + columns,
+        minlength=len(ys) * width
+    ).reshape(len(ys), width)
+    return np.cumsum(toggles, axis=1)[:, :-1] % 2 == 1
+
+
+# pixel centers within half_width of a point on any edge; every edge is
+# measured only over the pixels of its own box, a band of rows at a time,
+# so large figures take no more memory than BAND_PIXELS values per step
+def outline_mask(vertices, xs, ys, half_width):
+    x1, y1 = vertices[:, 0], vertices[:, 1]
+    x2 = np.concatenate((x1[1:], x1[:1]))
+    y2 = np.concatenate((y1[1:], y1[:1]))
+    dx, dy = x2 - x1, y2 - y1
+    length = np.maximum(dx * dx + dy * dy, 1e-12)
+    columns = zip(
+        np.searchsorted(xs, np.minimum(x1, x2) - half_width).tolist(),
+        np.searchsorted(xs, np.maximum(x1, x2) + half_width, 'right').tolist()
+    )
+    lows = np.minimum(y1, y2) - half_width
+    highs = np.maximum(y1, y2) + half_width
+    mask = np.zeros((len(ys), len(xs)), dtype=bool)
+    for edge, (c0, c1) in enumerate(columns):
+        if c0 >= c1:
+            continue
+        r0 = int(np.searchsorted(ys, lows[edge]))
+        r1 = int(np.searchsorted(ys, highs[edge], 'right'))
+        band = max(1, BAND_PIXELS // (c1 - c0))
+        px = xs[c0:c1] - x1[edge]
+        for start in range(r0, r1, band):
+            end = min(start + band, r1)
+            py = ys[start:end, None] - y1[edge]
+            t = np.clip((px * dx[edge] + py * dy[edge]) / length[edge], 0, 1)
+            distance = (px - t * dx[edge]) ** 2 + (py - t * dy[edge]) ** 2
+            mask[start:end, c0:c1] |= distance <= half_width * half_width
+    return mask
+
+
+def png_chunk(tag, data):
+    return (
+        struct.pack('>I', len(data)) + tag + data +
+        struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+    )
+
+
+def write_png(pixels, target):
+    height, width, _ = pixels.shape
+    write_png_strips([pixels], width, height, target)
+
+
+# the image is given as horizontal strips of RGBA rows, which are compressed
+# one after another, so the whole image never has to be in memory at once
+def write_png_strips(strips, width, height, target):
+    if hasattr(target, 'write'):
+        write_png_file(strips, width, height, target)
+    else:
+        with open(target, 'wb') as f:
+            write_png_file(strips, width, height, f)
+
+
+def write_png_file(strips, width, height, file):
+    header = struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)
+    file.write(b'\x89PNG\r\n\x1a\n' + png_chunk(b'IHDR', header))
+    compressor = zlib.compressobj()
+    for strip in strips:
+        rows = np.zeros((len(strip), width * 4 + 1), dtype=np.uint8)
+        rows[:, 1:] = strip.reshape(len(strip), width * 4)
+        data = compressor.compress(rows.tobytes())
+        if data:
+            file.write(png_chunk(b'IDAT', data))
+    file.write(png_chunk(b'IDAT', compressor.flush()))
+    file.write(png_chunk(b'IEND', b''))
+
+
+# without a viewport the canvas fits around all the figures
+def rasterize(
+    figures, width, height, background=WHITE, viewport=None, min_size=0
+):
+    if viewport is None:
+        bounds = total_bounds(figure_bounds(figures))
+        canvas = Canvas.fitting(bounds, width, height, background)
+    else:
+        canvas = Canvas.fitting(viewport, width, height, background, margin=0)
+    canvas.draw(figures, min_size)
+    return canvas
+
+
+# the same for figures kept as columns, which come with their parameters
+# stacked by type, their styles and their bounding boxes
+def rasterize_groups(
+    groups,
+    styles,
+    bounds,
+    width,
+    height,
+    background=WHITE,
+    viewport=None,
+    min_size=0
+):
+    if viewport is None:
+        viewport, margin = total_bounds(bounds), MARGIN
+    else:
+        margin = 0
+    canvas = Canvas.fitting(viewport, width, height, background, margin)
+    canvas.draw(None, min_size, groups, styles, bounds)
+    return canvas
@@ -0,0 +1,123 @@
+from itertools import islice
+
+import numpy as np
+from matplotlib import rcParams
+from matplotlib.colors import to_hex
+
+CHUNK_SIZE = 10_000
+VIEW_BOX_WIDTH = 100
+POINTS_TO_PIXELS = 4 / 3
+DASH_PATTERNS = {
+    '--': 'lines.dashed_pattern',
+    'dashed': 'lines.dashed_pattern',
+    '-.': 'lines.dashdot_pattern',
+    'dashdot': 'lines.dashdot_pattern',
+    ':': 'lines.dotted_pattern',
+    'dotted': 'lines.dotted_pattern'
+}
+
+
+# figures are written as they are read, a chunk at a time, so memory does
+# not grow with the scene -- the view box, known only at the end, is written
+# over a placeholder left in the header
+def export_svg(figures, path):
+    styles = {}
+    bounds = None
+    with open(path, 'w') as f:
+        f.write(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<svg xmlns="http://www.w3.org/2000/svg" viewBox="'
+        )
+        view_box_position = f.tell()
+        f.write(' ' * VIEW_BOX_WIDTH + '">\n<g transform="scale(1 -1)">\n')
+        figures = iter(figures)
+        while chunk := list(islice(figures, CHUNK_SIZE)):
+            elements, chunk_bounds = chunk_elements(chunk, styles)
+            f.writelines(elements)
+            bounds = merge_bounds(bounds, chunk_bounds)
+        f.write('</g>\n<style>\n')
+        for style, name in styles.items():
+            f.write(f'.{name}{{{style_rule(dict(style))}}}\n')
+        f.write('</style>\n</svg>\n')
+        f.seek(view_box_position)
+        f.write(view_box(bounds).ljust(VIEW_BOX_WIDTH))
+
+
+def chunk_elements(chunk, styles):
+    groups = {}
+    for index, figure in enumerate(chunk):
+        groups.setdefault(type(figure), []).append(index)
+    elements = [None] * len(chunk)
+    minimum = np.full(2, np.inf)
+    maximum = np.full(2, -np.inf)
+    for kind, indices in groups.items():
+        parameters = np.array(
+            [chunk[index].parameters() for index in indices],
+            dtype=float
+        )
+        if kind.shape == 'circle':
+            centers = parameters[:, :2]
+            radii = parameters[:, 2:3]
+            minimum = np.minimum(minimum, (centers - radii).min(axis=0))
+            maximum = np.maximum(maximum, (centers + radii).max(axis=0))
+            rows = parameters.tolist()
+            for index, row in zip(indices, rows):
+                elements[index] = '<circle cx="%r" cy="%r" r="%r" ' % tuple(
+                    row
+                )
+        else:
+            outlines = kind.outline(parameters)
+            minimum = np.minimum(minimum, outlines.min(axis=(0, 1)))
+            maximum = np.maximum(maximum, outlines.max(axis=(0, 1)))
+            points = ' '.join(['%r,%r'] * outlines.shape[1])
+            rows = outlines.reshape(len(indices), -1).tolist()
+            for index, row in zip(indices, rows):
+                elements[index] = f'<polygon points="{points % tuple(row)}" '
+    for index, figure in enumerate(chunk):
+        style = tuple(figure.style().items())
+        if style not in styles:
+            styles[style] = f's{len(styles)}'
+        elements[index] += f'class="{styles[style]}"/>\n'
+    return elements, (minimum, maximum)
+
+
+def merge_bounds(bounds, chunk_bounds):
+    if bounds is None:
+        return chunk_bounds
+    return (
+        np.minimum(bounds[0], chunk_bounds[0]),
+        np.maximum(bounds[1], chunk_bounds[1])
+    )
+
+
+# the figures are drawn with y growing upwards, as in matplotlib, so the
+# view box covers the mirrored bounds
+def view_box(bounds):
+    if bounds is None:
+        return '0 0 1 1'
+    (x_min, y_min), (x_max, y_max) = [corner.tolist() for corner in bounds]
+    width = max(x_max - x_min, 1e-9)
+    height = max(y_max - y_min, 1e-9)
+    return f'{x_min!r} {-y_max!r} {width!r} {height!r}'
+
+
+# border widths are in points, like in matplotlib, whatever the scale of
+# the drawing
+def style_rule(style):
+    width = style['lw'] * POINTS_TO_PIXELS
+    rule = (
+        f'fill:{to_hex(style["fc"]) if style["fill"] else "none"};'
+        f'fill-opacity:{style["alpha"]};'
+        f'stroke:{to_hex(style["ec"])};'
+        f'stroke-opacity:{style["alpha"]};'
+        f'stroke-width:{width:g}px;'
+        'stroke-linejoin:miter;'
+        'vector-effect:non-scaling-stroke'
+    )
+    if style['ls'] in DASH_PATTERNS:
+        dashes = rcParams[DASH_PATTERNS[style['ls']]]
+        if rcParams['lines.scale_dashes']:
+            dashes = [dash * style['lw'] for dash in dashes]
+        pattern = ','.join(f'{dash * POINTS_TO_PIXELS:g}' for dash in dashes)
+        rule += f';stroke-dasharray:{pattern}'
+    return rule
@@ -0,0 +1,108 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.geometry.bounds import figure_bounds, total_bounds
+from src.rendering.raster import (
+    WHITE,
+    Canvas,
+    border_reach,
+    figure_geometries,
+    fit,
+    write_png_strips
+)
+
+TILE_SIZE = 512
+TILES_PER_WORKER = 2
+
+
+def render_tile(tile):
+    width, height, scale, origin, offset, background, geometries = tile
+    canvas = Canvas(width, height, scale, origin, background, offset)
+    canvas.draw_geometries(geometries)
+    return canvas.to_array()
+
+
+# the image is cut into square tiles, each drawn in a worker process with
+# only the figures whose bounding boxes reach into it; tiles are made and
+# sent out a few per worker ahead of the one being stitched, and rows of
+# tiles are stitched into strips and compressed as they arrive, so the
+# image may be far larger than what fits in memory as a single canvas
+def render_tiles(
+    figures,
+    width,
+    height,
+    target,
+    viewport=None,
+    tile_size=TILE_SIZE,
+    workers=None,
+    background=WHITE
+):
+    bounds = figure_bounds(figures)
+    if viewport is None:
+        scale, origin = fit(total_bounds(bounds), width, height)
+    else:
+        scale, origin = fit(viewport, width, height, margin=0)
+    geometries = figure_geometries(figures)
+
+    border = border_reach([style for _, _, style in geometries])
+    left = (bounds[:, 0] - origin[0]) * scale - border
+    right = (bounds[:, 2] - origin[0]) * scale + border
+    top = (origin[1] - bounds[:, 3]) * scale - border
+    bottom = (origin[1] - bounds[:, 1]) * scale + border
+
+    def tiles():
+        for row in range(0, height, tile_size):
+            for column in range(0, width, tile_size):
+                tile_width = min(tile_size, width - column)
+                tile_height = min(tile_size, height - row)
+                inside = np.flatnonzero(
+                    (right >= column) & (left <= column + tile_width) &
+                    (bottom >= row) & (top <= row + tile_height)
+                )
+                yield (
+                    tile_width,
+                    tile_height,
+                    scale,
+                    origin,
+                    (column, row),
+                    background,
+                    [geometries[index] for index in inside.tolist()]
+                )
+
+    columns = -(-width // tile_size)
+    if workers is None:
+        workers = os.cpu_count()
+    if workers == 1 or columns * -(-height // tile_size) == 1:
+        write_png_strips(
+            stitched(map(render_tile, tiles()), columns), width, height, target
+        )
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        drawn = windowed_map(
+            executor, render_tile, tiles(), workers * TILES_PER_WORKER
+        )
+        write_png_strips(stitched(drawn, columns), width, height, target)
+
+
+# like executor.map, in order, but with no more than window items submitted
+# and not yet taken at any time
+def windowed_map(executor, function, items, window):
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(function, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def stitched(tiles, columns):
+    strip = []
+    for tile in tiles:
+        strip.append(tile)
+        if len(strip) == columns:
+            yield np.concatenate(strip, axis=1)
+            strip = []
@@ -0,0 +1,130 @@
+import sys
+import time
+import tracemalloc
+from contextlib import nullcontext
+
+from src.parser.parser_tree import Node
+
+active_stats = None
+
+
+# times spent in nested phases (rendering during interpretation) are not
+# counted again in the enclosing phase. net_blocks is the change in the
+# number of memory blocks allocated by Python, which is negative when a
+# phase frees more blocks than it allocates
+class PhaseStats:
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.phases = {}
+        self.counts = {}
+        self.running = []
+
+    def start(self):
+        global active_stats
+        active_stats = self
+        if self.trace_memory:
+            tracemalloc.start()
+
+    def stop(self):
+        global active_stats
+        active_stats = None
+        if self.trace_memory:
+            tracemalloc.stop()
+
+    def phase(self, name):
+        return Phase(self, name)
+
+    def enter(self, name):
+        if self.running:
+            self.running[-1]['peak'] = max(
+                self.running[-1]['peak'],
+                tracemalloc.get_traced_memory()[1]
+            )
+        tracemalloc.reset_peak()
+        self.phases.setdefault(name, {
+            'calls': 0,
+            'wall_time': 0,
+            'cpu_time': 0,
+            'peak_memory': 0,
+            'net_blocks': 0
+        })
+        self.running.append({
+            'name': name,
+            'wall': time.perf_counter(),
+            'cpu': time.process_time(),
+            'blocks': sys.getallocatedblocks(),
+            'peak': 0,
+            'nested_wall': 0,
+            'nested_cpu': 0,
+            'nested_blocks': 0
+        })
+
+    def exit(self):
+        running = self.running.pop()
+        wall = time.perf_counter() - running['wall']
+        cpu = time.process_time() - running['cpu']
+        blocks = sys.getallocatedblocks() - running['blocks']
+        peak = max(running['peak'], tracemalloc.get_traced_memory()[1])
+        phase = self.phases[running['name']]
+        phase['calls'] += 1
+        phase['wall_time'] += wall - running['nested_wall']
+        phase['cpu_time'] += cpu - running['nested_cpu']
+        phase['net_blocks'] += blocks - running['nested_blocks']
+        phase['peak_memory'] = max(phase['peak_memory'], peak)
+        if self.running:
+            parent = self.running[-1]
+            parent['nested_wall'] += wall
+            parent['nested_cpu'] += cpu
+            parent['nested_blocks'] += blocks
+            parent['peak'] = max(parent['peak'], peak)
+
+    def as_dict(self):
+        return {'phases': self.phases, **self.counts}
+
+    def report(self):
+        lines = [
+            f'{"phase":<12}{"calls":>7}{"wall s":>10}{"cpu s":>10}'
+            f'{"peak MiB":>11}{"net blocks":>12}'
+        ]
+        for name, phase in self.phases.items():
+            lines.append(
+                f'{name:<12}{phase["calls"]:>7}'
+                f'{phase["wall_time"]:>10.3f}{phase["cpu_time"]:>10.3f}'
+                f'{phase["peak_memory"] / 2 ** 20:>11.2f}'
+                f'{phase["net_blocks"]:>12}'
+            )
+        for name, count in self.counts.items():
+            lines.append(f'{name}: {count}')
+        return '\n'.join(lines)
+
+
+class Phase:
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.stats.enter(self.name)
+
+    def __exit__(self, *exc_info):
+        self.stats.exit()
+
+
+# phases are only measured while some PhaseStats is started
+def measure(name):
+    if active_stats is None:
+        return nullcontext()
+    return active_stats.phase(name)
+
+
+def count_nodes(tree):
+    count = 0
+    to_visit = [tree]
+    while to_visit:
+        item = to_visit.pop()
+        if isinstance(item, Node):
+            count += 1
+            to_visit.extend(vars(item).values())
+        elif isinstance(item, list):
+            to_visit.extend(item)
+    return count
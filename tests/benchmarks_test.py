@@ -0,0 +1,23 @@
+import matplotlib
+
+from benchmarks.programs import BENCHMARKS
+from benchmarks.run import compare, run_program
+
+matplotlib.use('Agg')
+
+
+class TestBenchmarks:
+    def test_programs_run(self):
+        for generate, _ in BENCHMARKS.values():
+            phases = run_program(generate(10))
+            assert ['lex', 'parse', 'interpret'] == list(phases)[:3]
+        assert 'render' in run_program(BENCHMARKS['scene_render'][0](10))
+
+    def test_compare(self):
+        baseline = {'loop': {'interpret': 1.0, 'lex': 0.001}}
+        results = {'loop': {'interpret': 1.2, 'lex': 0.003}, 'new': {'lex': 1}}
+        assert compare(results, baseline, 0.25) == []
+        results = {'loop': {'interpret': 1.3, 'lex': 0.001}}
+        assert compare(results, baseline, 0.25) == [
+            ('loop', 'interpret', 1.0, 1.3)
+        ]
@@ -1,29 +1,56 @@
+import gc
 import io
+import math
+import os
+import weakref
+from concurrent.futures import Future
+from xml.etree import ElementTree
+import matplotlib.pyplot as plt
+import numpy as np
 import pytest
 
 from src.error_handling.interpreter_error import (
     DivisionByZeroError,
+    FileOutputError,
     FunctionRedefinitionError,
     IndexOutOfRangeError,
     InvalidIndexError,
     InvalidTypeError,
     InvalidVariableAssignmentError,
     IterableNameError,
+    MismatchedArraySizesError,
     MismatchedTypesError,
     NonExistingAttributeError,
+    NonExistingKeyError,
     NonExistingMethodError,
+    ParallelFunctionError,
     NonExistingVariableError,
+    ReadOnlyAttributeError,
     NonExistingFunctionError,
+    NumericOverflowError,
     BreakOutsideLoopError,
     InvalidConstructorArgumentsError,
     InvalidFunCallArgumentsError,
     InvalidNumberOfArgumentsError,
     RecursionLimitError,
     ReturnOutsideFunctionError,
+    StepLimitError,
+    TimeLimitError,
     TypeCastingError,
     VariableRedeclarationError
 )
-from src.interpreter.symbol_table import Circle, Square
+from src.interpreter.symbol_table import (
+    Circle,
+    ColumnarScene,
+    FloatArray,
+    IntArray,
+    Point,
+    Rectangle,
+    Rhomb,
+    Scene,
+    Square,
+    Symbol
+)
 from src.parser.parser import Parser
 from src.constants import (
     MAXIMUM_FLOAT_DECIMALS,
@@ -32,9 +59,17 @@ from src.constants import (
     MAXIMUM_STRING,
     MAXIMUM_RECURSION_DEPTH
 )
+from src.interpreter.instrumentation import InstrumentationHook, NodeCounters
 from src.interpreter.interpreter import Interpreter
+from src.interpreter.profiler import Profiler
 from src.lexer.lexer import Lexer
 from src.lexer.stream import Stream
+from src.lexer.token_buffer import TokenBuffer
+from src.rendering.agg import render_png
+from src.rendering.collections import figure_collection
+from src.rendering.raster import Canvas, rasterize
+from src.rendering.tiles import render_tiles, windowed_map
+from src.stats import PhaseStats, count_nodes, measure
 
 
 class TestInterpreter:
@@ -49,10 +84,13 @@ class TestInterpreter:
         parser = Parser(lexer)
         return parser
 
-    def interpret(self, text):
+    def interpret(self, text, output_dir=None):
         parser = self.init_parser(text)
         program = parser.parse_program()
-        interpreter = Interpreter(MAXIMUM_RECURSION_DEPTH)
+        interpreter = Interpreter(
+            MAXIMUM_RECURSION_DEPTH,
+            output_dir=output_dir
+        )
         interpreter.visit(program)
         return interpreter
 
@@ -492,3 +530,1248 @@ class TestInterpreter:
         text = '1 / 0;'
         with pytest.raises(DivisionByZeroError):
             interpreter = self.interpret(text)
+
+    def test_map(self):
+        text = 'var m = Map([["a", 1], [2, "two"]]); var a = m.get("a");'
+        text += 'var b = m.get(2); var c = m.get(3, 0);'
+        interpreter = self.interpret(text)
+        assert interpreter.current_scope().get('a').get_value() == 1
+        assert interpreter.current_scope().get('b').get_value() == 'two'
+        assert interpreter.current_scope().get('c').get_value() == 0
+
+        text = 'var m = Map(); m.set(1, "int"); m.set(1.0, "float");'
+        text += 'm.set(True, "bool"); m.set(1, "changed");'
+        text += 'var size = m.size(); var i = m.get(1); var f = m.get(1.0);'
+        text += 'var has = m.has(True); m.remove(True);'
+        text += 'var removed = m.has(True);'
+        interpreter = self.interpret(text)
+        assert interpreter.current_scope().get('size').get_value() == 3
+        assert interpreter.current_scope().get('i').get_value() == 'changed'
+        assert interpreter.current_scope().get('f').get_value() == 'float'
+        assert interpreter.current_scope().get('has').get_value() is True
+        assert interpreter.current_scope().get('removed').get_value() is False
+
+        text = 'var m = Map([["a", 1], ["b", 2]]); var total = 0;'
+        text += 'var sum = 0; for (k in m){ total = total + m.get(k); }'
+        text += 'for (v in m.values()){ sum = sum + v; }'
+        interpreter = self.interpret(text)
+        assert interpreter.current_scope().get('total').get_value() == 3
+        assert interpreter.current_scope().get('sum').get_value() == 3
+
+        text = 'var m = Map(); var a = m.get("a");'
+        with pytest.raises(NonExistingKeyError):
+            interpreter = self.interpret(text)
+
+        text = 'var m = Map(); m.set(Point(1, 1), 1);'
+        with pytest.raises(InvalidFunCallArgumentsError):
+            interpreter = self.interpret(text)
+
+        text = 'var m = Map([[[1], 1]]);'
+        with pytest.raises(InvalidConstructorArgumentsError):
+            interpreter = self.interpret(text)
+
+    def test_numeric_arrays(self):
+        text = 'var a = IntArray([1, 2, 3]); var b = FloatArray([0.5, 1, 2]);'
+        text += 'var c = a + b; var d = a * 2; var e = a / 2; var f = -a;'
+        text += 'var g = a ** 2; var h = 2 ** a; var i = a ** -1;'
+        interpreter = self.interpret(text)
+        scope = interpreter.current_scope()
+        assert isinstance(scope.get('c').get_value(), FloatArray)
+        assert scope.get('c').get_value().values.tolist() == [1.5, 3.0, 5.0]
+        assert isinstance(scope.get('d').get_value(), IntArray)
+        assert scope.get('d').get_value().values.tolist() == [2, 4, 6]
+        assert scope.get('e').get_value().values.tolist() == [0.5, 1.0, 1.5]
+        assert scope.get('f').get_value().values.tolist() == [-1, -2, -3]
+        assert scope.get('g').get_value().values.tolist() == [1, 4, 9]
+        assert scope.get('h').get_value().values.tolist() == [2, 4, 8]
+        assert isinstance(scope.get('i').get_value(), FloatArray)
+
+        text = 'var a = arange(0, 4); var s = a.sum(); var m = a.mean();'
+        text += 'var mn = a.min(); var mx = a.max(); var n = a.size();'
+        text += 'var r = a.sqrt(); var first = a[1]; a[0] = 10;'
+        text += 'var total = 0; for (v in a){ total = total + v; }'
+        interpreter = self.interpret(text)
+        scope = interpreter.current_scope()
+        assert scope.get('s').get_value() == 6
+        assert type(scope.get('s').get_value()) is int
+        assert scope.get('m').get_value() == 1.5
+        assert scope.get('mn').get_value() == 0
+        assert scope.get('mx').get_value() == 3
+        assert scope.get('n').get_value() == 4
+        assert scope.get('r').get_value().values.tolist()[-1] == 3 ** 0.5
+        assert scope.get('first').get_value() == 1
+        assert scope.get('total').get_value() == 16
+
+        text = 'var x = linspace(0, 1, 3); var y = x.cos();'
+        interpreter = self.interpret(text)
+        x = interpreter.current_scope().get('x').get_value()
+        assert x.values.tolist() == [0.0, 0.5, 1.0]
+
+        text = 'var a = IntArray([1, 2]) + IntArray([1, 2, 3]);'
+        with pytest.raises(MismatchedArraySizesError):
+            interpreter = self.interpret(text)
+
+        text = 'var a = IntArray([1, 2]) / IntArray([1, 0]);'
+        with pytest.raises(DivisionByZeroError):
+            interpreter = self.interpret(text)
+
+        text = 'var a = IntArray([1, 2]) + "string";'
+        with pytest.raises(InvalidTypeError):
+            interpreter = self.interpret(text)
+
+        text = 'var a = IntArray([1, 2.5]);'
+        with pytest.raises(InvalidConstructorArgumentsError):
+            interpreter = self.interpret(text)
+
+        text = 'var a = IntArray([1, 2]); var b = a[2];'
+        with pytest.raises(IndexOutOfRangeError):
+            interpreter = self.interpret(text)
+
+        # negative indices count from the end, as they do for lists
+        text = 'var a = IntArray([1, 2, 3]); var b = a[-1]; a[-3] = 7;'
+        scope = self.interpret(text).current_scope()
+        assert scope.get('b').get_value() == 3
+        assert scope.get('a').get_value().values.tolist() == [7, 2, 3]
+        text = 'var a = IntArray([1, 2]); var b = a[-3];'
+        with pytest.raises(IndexOutOfRangeError):
+            interpreter = self.interpret(text)
+
+        # powers too large for the array type are errors, not wrapped
+        for text in (
+            'var a = IntArray([2, 3]) ** 64;',
+            'var a = 10 ** IntArray([18, 19]);',
+            'var a = FloatArray([10.0]) ** 400;',
+            'var a = 10.0 ** 400;'
+        ):
+            with pytest.raises(NumericOverflowError):
+                self.interpret(text)
+        text = 'var a = IntArray([2, -2]) ** 62;'
+        a = self.interpret(text).current_scope().get('a').get_value()
+        assert a.values.tolist() == [2 ** 62, 2 ** 62]
+
+        # arrays have a maximum size
+        for text in (
+            'var a = arange(0, 100000000000);',
+            'var a = arange(0, 1, 0.0000000001);',
+            'var a = linspace(0, 1, 100000000000);'
+        ):
+            with pytest.raises(InvalidFunCallArgumentsError):
+                self.interpret(text)
+
+        text = 'var a = IntArray([1, 2]); var b = FloatArray([0.5, 1]);'
+        text += 'b[0] = 3; b[1] = 2.5;'
+        interpreter = self.interpret(text)
+        b = interpreter.current_scope().get('b').get_value()
+        assert b.values.tolist() == [3.0, 2.5]
+        for assignment in (
+            'a[0] = 2.7;', 'a[0] = "x";', 'a[0] = True;', 'b[0] = "x";'
+        ):
+            with pytest.raises(InvalidTypeError):
+                self.interpret(text + assignment)
+
+    def test_math_functions(self):
+        text = 'var a = sqrt(16); var b = hypot(3, 4); var c = atan2(1, 1);'
+        text += 'var d = radians(180); var e = abs(-3); var f = min(3, 1, 2);'
+        text += 'var g = max([1, 5, 2]); var h = floor(2.7);'
+        text += 'var i = ceil(2.1);'
+        text += 'var j = pi(); var k = sin(pi() / 2) + cos(0) + tan(0);'
+        interpreter = self.interpret(text)
+        scope = interpreter.current_scope()
+        assert scope.get('a').get_value() == 4.0
+        assert scope.get('b').get_value() == 5.0
+        assert scope.get('c').get_value() == math.pi / 4
+        assert scope.get('d').get_value() == math.pi
+        assert scope.get('e').get_value() == 3
+        assert scope.get('f').get_value() == 1
+        assert scope.get('g').get_value() == 5
+        assert scope.get('h').get_value() == 2
+        assert scope.get('i').get_value() == 3
+        assert scope.get('j').get_value() == math.pi
+        assert scope.get('k').get_value() == 2.0
+
+        text = 'var x = FloatArray([0.5, 4]); var r = sqrt(x);'
+        text += 'var fl = floor(x); var m = max(x);'
+        interpreter = self.interpret(text)
+        scope = interpreter.current_scope()
+        assert scope.get('r').get_value().values.tolist() == [0.5 ** 0.5, 2]
+        assert isinstance(scope.get('fl').get_value(), IntArray)
+        assert scope.get('m').get_value() == 4
+
+        text = 'var a = sqrt(-1);'
+        with pytest.raises(InvalidFunCallArgumentsError):
+            interpreter = self.interpret(text)
+
+        text = 'var a = sin("string");'
+        with pytest.raises(InvalidFunCallArgumentsError):
+            interpreter = self.interpret(text)
+
+        text = 'var a = max(arange(0, 0));'
+        with pytest.raises(InvalidFunCallArgumentsError):
+            interpreter = self.interpret(text)
+
+        text = 'var a = pi(1);'
+        with pytest.raises(InvalidNumberOfArgumentsError):
+            interpreter = self.interpret(text)
+
+        text = 'def max(a, b){ return a + b; }'
+        text += 'var a = max(3, 5); var b = min(3, 5);'
+        interpreter = self.interpret(text)
+        scope = interpreter.current_scope()
+        assert scope.get('a').get_value() == 8
+        assert scope.get('b').get_value() == 3
+
+        text = 'def max(a){ return a; } def max(a){ return a; }'
+        with pytest.raises(FunctionRedefinitionError):
+            interpreter = self.interpret(text)
+
+    def test_parallel_map(self):
+        text = 'def square(x){ var result = x * x; return result; }'
+        text += 'var a = pmap(square, [1, 2, 3, 4, 5], 2);'
+        text += 'var b = pmap("square", arange(0, 3), 1);'
+        interpreter = self.interpret(text)
+        a = interpreter.current_scope().get('a').get_value()
+        b = interpreter.current_scope().get('b').get_value()
+        assert [value.get_value() for value in a] == [1, 4, 9, 16, 25]
+        assert [value.get_value() for value in b] == [0, 1, 4]
+
+        text = 'def area(f){ return f.area(); }'
+        text += 'var a = pmap(area, [Square(Point(0, 0), 2), '
+        text += 'Rectangle(Point(0, 0), 2, 3)], 2);'
+        interpreter = self.interpret(text)
+        a = interpreter.current_scope().get('a').get_value()
+        assert [value.get_value() for value in a] == [4, 6]
+
+        # a function calling pmap, or another function, may still return
+        text = 'def square(x){ return x * x; }'
+        text += 'def total(){ var squares = pmap(square, [1, 2, 3], 1);'
+        text += 'var sum = 0; for (value in squares){ sum = sum + value; }'
+        text += 'return sum + square(1); }'
+        text += 'var a = total();'
+        scope = self.interpret(text).current_scope()
+        assert scope.get('a').get_value() == 15
+
+        # arguments are copies however many workers there are
+        text = 'def grow(f){ f.set_side(f.get_side() * 2); '
+        text += 'return f.area(); }'
+        text += 'var squares = [Square(Point(0, 0), 1), '
+        text += 'Square(Point(0, 0), 2)];'
+        text += 'var one = pmap(grow, squares, 1);'
+        text += 'var two = pmap(grow, squares, 2);'
+        scope = self.interpret(text).current_scope()
+        for name in ('one', 'two'):
+            results = scope.get(name).get_value()
+            assert [value.get_value() for value in results] == [4, 16]
+        squares = scope.get('squares').get_value()
+        assert [square.get_value().parameters()[2] for square in squares] == [
+            1, 2
+        ]
+
+        text = 'var g = 1; def add(x){ return x + g; }'
+        text += 'var a = pmap(add, [1, 2]);'
+        with pytest.raises(ParallelFunctionError):
+            interpreter = self.interpret(text)
+
+        text = 'var g = 1; def helper(x){ g = x; return x; }'
+        text += 'def outer(x){ return helper(x); }'
+        text += 'var a = pmap(outer, [1, 2]);'
+        with pytest.raises(ParallelFunctionError):
+            interpreter = self.interpret(text)
+
+        text = 'var a = pmap(print, ["a", "b"]);'
+        with pytest.raises(InvalidFunCallArgumentsError):
+            interpreter = self.interpret(text)
+
+    def test_execution_limits(self):
+        program = self.init_parser('var a = 0; while(a < 10){ a = a + 1; }')
+        program = program.parse_program()
+        interpreter = Interpreter(MAXIMUM_RECURSION_DEPTH, max_steps=10)
+        interpreter.interpret(program)
+        assert interpreter.current_scope().get('a').get_value() == 10
+        assert interpreter.steps == 10
+
+        interpreter = Interpreter(MAXIMUM_RECURSION_DEPTH, max_steps=9)
+        with pytest.raises(StepLimitError):
+            interpreter.interpret(program)
+
+        text = 'def foo(){ return 1; } for(i in [1, 2, 3]){ var a = foo(); }'
+        program = self.init_parser(text).parse_program()
+        interpreter = Interpreter(MAXIMUM_RECURSION_DEPTH, max_steps=5)
+        with pytest.raises(StepLimitError):
+            interpreter.interpret(program)
+
+        # steps taken in pmap workers count for the whole program
+        text = (
+            'def count(n){ var i = 0; while(i < n){ i = i + 1; } return i; }'
+            'var a = pmap(count, [40, 40, 40, 40], 2);'
+        )
+        program = self.init_parser(text).parse_program()
+        interpreter = Interpreter(MAXIMUM_RECURSION_DEPTH, max_steps=1000)
+        interpreter.interpret(program)
+        assert interpreter.steps >= 160
+        interpreter = Interpreter(MAXIMUM_RECURSION_DEPTH, max_steps=100)
+        with pytest.raises(StepLimitError):
+            interpreter.interpret(program)
+
+        program = self.init_parser('while(True){}').parse_program()
+        interpreter = Interpreter(MAXIMUM_RECURSION_DEPTH, timeout=0.05)
+        with pytest.raises(TimeLimitError):
+            interpreter.interpret(program)
+
+    def test_profiler(self):
+        text = (
+            'def inner(x){\n'
+            '    var s = 0;\n'
+            '    for(i in [1, 2, 3, 4, 5]){ s = s + x * i; }\n'
+            '    return s;\n'
+            '}\n'
+            'var k = 0;\n'
+            'while(k < 3000){ var a = inner(k); k = k + 1; }\n'
+        )
+        program = self.init_parser(text).parse_program()
+        interpreter = Interpreter(MAXIMUM_RECURSION_DEPTH)
+        with Profiler(interpreter, interval=0.0001) as profiler:
+            interpreter.interpret(program)
+        assert 'do_for_fun_call' not in vars(interpreter)
+        assert profiler.call_counts['inner'] == 3000
+        assert profiler.total_time > 0
+        exclusive, inclusive = profiler.function_times()
+        assert inclusive['<program>'] == pytest.approx(profiler.total_time)
+        assert exclusive['inner'] <= inclusive['inner']
+        for stack in profiler.stacks:
+            assert stack[0][0] == '<program>'
+            assert all(function == 'inner' for function, _ in stack[1:])
+
+        output = io.StringIO()
+        profiler.write_collapsed(output)
+        for line in output.getvalue().splitlines():
+            frames, weight = line.rsplit(' ', 1)
+            assert frames.startswith('<program>')
+            assert int(weight) >= 0
+        assert 'inner' in profiler.report(top=5)
+
+    def test_instrumentation_hooks(self):
+        class Recorder(InstrumentationHook):
+            def __init__(self):
+                self.events = []
+
+            def node_enter(self, node):
+                self.events.append(('enter', type(node).__name__))
+
+            def node_exit(self, node):
+                self.events.append(('exit', type(node).__name__))
+
+        program = self.init_parser('var a = 1 + 2 * 3;').parse_program()
+        interpreter = Interpreter(MAXIMUM_RECURSION_DEPTH)
+        counters = NodeCounters()
+        recorder = Recorder()
+        interpreter.add_hook(counters)
+        interpreter.add_hook(recorder)
+        interpreter.interpret(program)
+        assert interpreter.current_scope().get('a').get_value() == 7
+        assert counters.counts == {
+            'Program': 1,
+            'VariableAssignment': 1,
+            'AdditionExpression': 1,
+            'MultiplicationExpression': 1,
+            'Term': 3
+        }
+        assert counters.inclusive['Program'] >= counters.exclusive['Program']
+        assert recorder.events[:3] == [
+            ('enter', 'Program'),
+            ('enter', 'VariableAssignment'),
+            ('enter', 'AdditionExpression')
+        ]
+        assert recorder.events[-1] == ('exit', 'Program')
+        assert 'Term' in counters.report()
+
+        interpreter.remove_hook(counters)
+        interpreter.remove_hook(recorder)
+        assert [name for name in vars(interpreter) if 'do_for' in name] == []
+
+        text = 'def foo(){ return 1; } var a = foo(); var b = foo();'
+        program = self.init_parser(text).parse_program()
+        interpreter = Interpreter(MAXIMUM_RECURSION_DEPTH)
+        counters = NodeCounters()
+        interpreter.add_hook(counters)
+        interpreter.interpret(program)
+        assert counters.counts['FunCall'] == 2
+        assert counters.counts['UserFunction'] == 2
+
+    def test_phase_stats(self):
+        text = 'var a = 1 + 2; # comment\nvar b = [a, 2];'
+        lexer = Lexer(
+            Stream(io.StringIO(text)),
+            MAXIMUM_IDENTIFIER,
+            MAXIMUM_STRING,
+            MAXIMUM_INT_DIGITS,
+            MAXIMUM_FLOAT_DECIMALS,
+        )
+        stats = PhaseStats()
+        stats.start()
+        try:
+            with measure('lex'):
+                tokens = TokenBuffer(lexer)
+            with measure('parse'):
+                program = Parser(tokens).parse_program()
+            with measure('interpret'):
+                interpreter = Interpreter(MAXIMUM_RECURSION_DEPTH)
+                interpreter.interpret(program)
+                with measure('render'):
+                    pass
+        finally:
+            stats.stop()
+        b = interpreter.current_scope().get('b').get_value()
+        assert b[0].get_value() == 3
+        assert len(tokens.tokens) == 17
+        assert count_nodes(program) == 11
+        assert list(stats.phases) == ['lex', 'parse', 'interpret', 'render']
+        for phase in stats.phases.values():
+            assert phase['calls'] == 1
+            assert phase['wall_time'] >= 0
+            assert phase['peak_memory'] > 0
+            assert isinstance(phase['net_blocks'], int)
+        assert 'ast_nodes' not in stats.as_dict()
+        assert 'interpret' in stats.report()
+        with measure('lex'):
+            pass
+        assert stats.phases['lex']['calls'] == 1
+
+    def test_render_png(self, tmp_path):
+        path = tmp_path / 'scene.png'
+        figures = plt.get_fignums()
+        text = (
+            'var square = Square(Point(0, 0), 2);'
+            'var circle = Circle(Point(3, 3), 1);'
+            'var scene = Scene([square, circle]);'
+            f'scene.render("{path}");'
+            f'circle.render("{tmp_path / "circle.png"}");'
+        )
+        interpreter = self.interpret(text, tmp_path)
+        assert path.read_bytes().startswith(b'\x89PNG')
+        assert (tmp_path / 'circle.png').read_bytes().startswith(b'\x89PNG')
+        assert plt.get_fignums() == figures
+
+        scene = interpreter.current_scope().get('scene').get_value()
+        buffer = io.BytesIO()
+        render_png(scene.patches(), buffer, dpi=50, size=(2, 2))
+        image = plt.imread(io.BytesIO(buffer.getvalue()))
+        assert image.shape[:2] == (100, 100)
+
+        with pytest.raises(InvalidFunCallArgumentsError):
+            self.interpret(text + 'scene.render(1);', tmp_path)
+        with pytest.raises(InvalidFunCallArgumentsError):
+            self.interpret(text + 'scene.render("a.png", "b.png");', tmp_path)
+        with pytest.raises(InvalidNumberOfArgumentsError):
+            self.interpret(
+                text + 'scene.render("a.png", square, 1, 2);',
+                tmp_path
+            )
+
+        # files are only written inside the output directory, if there is
+        # one, and where the path leads is what counts
+        outside = tmp_path.parent / 'outside.png'
+        for path, output_dir in (
+            ('scene.png', None),
+            ('../outside.png', tmp_path),
+            (str(outside), tmp_path),
+            (f'{tmp_path}/../outside.png', tmp_path)
+        ):
+            with pytest.raises(FileOutputError):
+                self.interpret(
+                    'var circle = Circle(Point(3, 3), 1);'
+                    f'circle.render("{path}");',
+                    output_dir
+                )
+        assert outside.exists() is False
+        self.interpret(
+            'var circle = Circle(Point(3, 3), 1);'
+            'circle.render("sub/../inside.png");',
+            tmp_path
+        )
+        assert (tmp_path / 'inside.png').exists()
+
+    def test_render_collection(self):
+        text = (
+            'var square = Square(Point(0, 0), 3);'
+            'square.set_color("red");'
+            'var rectangle = Rectangle(Point(2, 1), 4, 2);'
+            'rectangle.set_opacity(0.5);'
+            'rectangle.set_border_style("dashed");'
+            'rectangle.set_border_width(3);'
+            'var circle = Circle(Point(3, 3), 1.5);'
+            'circle.set_fill(False);'
+            'var triangle = Triangle(Point(5, 0), Point(8, 1), Point(6, 4));'
+            'var rhomb = Rhomb(Point(0, 4), 2, 60);'
+            'var parallelogram = Parallelogram(Point(4, 5), 3, 2, 45);'
+            'var trapeze = Trapeze(Point(8, 3), 3, 1, 2);'
+            'trapeze.set_border_style(":");'
+            'var scene = Scene([square, rectangle, circle, triangle, rhomb,'
+            'parallelogram, trapeze, Circle(Point(1, 1), 1)]);'
+        )
+        scene = self.interpret(text).current_scope().get('scene').get_value()
+        images = []
+        for artists in (scene.patches(), [figure_collection(scene.figures())]):
+            buffer = io.BytesIO()
+            render_png(artists, buffer)
+            images.append(plt.imread(io.BytesIO(buffer.getvalue())))
+        assert (images[0] == images[1]).all()
+
+    def test_viewport_culling(self, tmp_path):
+        text = (
+            'var near = Square(Point(0, 0), 4);'
+            'near.set_color("red");'
+            'var far = Circle(Point(100, 100), 5);'
+            'var dot = Rectangle(Point(6, 6), 0.01, 0.02);'
+            'dot.set_color("blue");'
+            'var scene = Scene([near, far, dot]);'
+            'var view = Rectangle(Point(-1, -1), 10, 10);'
+            f'scene.render("{tmp_path / "view.png"}", view, 2);'
+            f'scene.rasterize("{tmp_path / "view_raster.png"}", 10, 10, view);'
+        )
+        scope = self.interpret(text, tmp_path).current_scope()
+        figures = scope.get('scene').get_value().figures()
+        viewport = (-1, -1), (9, 9)
+        collection = figure_collection(figures, viewport, 0.1, 2)
+        paths = collection.get_paths()
+        assert len(paths) == 2
+        assert np.allclose(paths[1].vertices, [
+            [5.955, 5.96], [6.055, 5.96], [6.055, 6.06], [5.955, 6.06],
+            [5.955, 5.96]
+        ])
+        assert collection.get_facecolors()[1].tolist() == [0, 0, 1, 1]
+        assert list(collection.get_linewidths()) == [1, 0]
+        assert len(figure_collection(figures, viewport, 0.1).get_paths()) == 2
+
+        canvas = rasterize(figures, 10, 10, viewport=viewport, min_size=2)
+        pixels = canvas.to_array()
+        assert pixels[7, 2].tolist() == [255, 0, 0, 255]
+        assert pixels[2, 7].tolist() == [0, 0, 255, 255]
+        assert (pixels[:, 6:, :3] < 255).any(axis=-1).sum() == 1
+        image = plt.imread(tmp_path / 'view_raster.png')
+        assert image.shape == (10, 10, 4)
+        assert plt.imread(tmp_path / 'view.png').shape == (480, 640, 4)
+
+        with pytest.raises(InvalidFunCallArgumentsError):
+            self.interpret(text + 'scene.render("a.png", 1);', tmp_path)
+        with pytest.raises(InvalidFunCallArgumentsError):
+            self.interpret(
+                text + 'scene.rasterize("a.png", 5, 5, view, -1);',
+                tmp_path
+            )
+
+    def test_export_svg(self, tmp_path):
+        path = tmp_path / 'scene.svg'
+        text = (
+            'var square = Square(Point(0, 0), 3);'
+            'square.set_color("red");'
+            'var circle = Circle(Point(3, 3), 1.5);'
+            'circle.set_fill(False);'
+            'circle.set_border_style("dashed");'
+            'var triangle = Triangle(Point(5, 0), Point(8, 1), Point(6, 4));'
+            'var scene = Scene([square, circle, triangle]);'
+            f'scene.export_svg("{path}");'
+        )
+        self.interpret(text, tmp_path)
+        root = ElementTree.parse(path).getroot()
+        namespace = '{http://www.w3.org/2000/svg}'
+        assert root.get('viewBox').split() == ['0.0', '-4.5', '8.0', '4.5']
+        group = root.find(f'{namespace}g')
+        elements = [
+            (element.tag[len(namespace):], element.attrib) for element in group
+        ]
+        assert elements == [
+            ('polygon', {'points': '0.0,0.0 3.0,0.0 3.0,3.0 0.0,3.0',
+                         'class': 's0'}),
+            ('circle', {'cx': '3.0', 'cy': '3.0', 'r': '1.5', 'class': 's1'}),
+            ('polygon', {'points': '5.0,0.0 8.0,1.0 6.0,4.0', 'class': 's2'})
+        ]
+        style = root.find(f'{namespace}style').text
+        assert '.s0{fill:#ff0000;' in style
+        assert '.s1{fill:none;' in style
+        assert 'stroke-dasharray' in style.split('.s1')[1].split('.s2')[0]
+
+        with pytest.raises(InvalidFunCallArgumentsError):
+            self.interpret(text + 'scene.export_svg(1);', tmp_path)
+
+    def test_rasterize(self, tmp_path):
+        text = (
+            'var square = Square(Point(0, 0), 10);'
+            'square.set_color("red");'
+            'square.set_border_width(0);'
+            'var glass = Rectangle(Point(5, 0), 10, 4);'
+            'glass.set_color("blue");'
+            'glass.set_opacity(0.5);'
+            'glass.set_border_width(0);'
+            'var ring = Circle(Point(20, 5), 4);'
+            'ring.set_fill(False);'
+            'ring.set_border_width(3);'
+            'var scene = Scene([square, glass, ring]);'
+            f'scene.rasterize("{tmp_path / "scene.png"}", 64, 48);'
+        )
+        scope = self.interpret(text, tmp_path).current_scope()
+        scene = scope.get('scene').get_value()
+        canvas = Canvas(30, 20, 1, (-2, 15))
+        canvas.draw(scene.figures())
+        pixels = canvas.to_array()
+        assert pixels.shape == (20, 30, 4)
+        assert pixels[7, 4].tolist() == [255, 0, 0, 255]
+        assert pixels[14, 9].tolist() == [128, 0, 128, 255]
+        assert pixels[14, 14].tolist() == [128, 128, 255, 255]
+        assert pixels[0, 0].tolist() == [255, 255, 255, 255]
+        assert pixels[10, 22].tolist() == [255, 255, 255, 255]
+        assert pixels[10, 26].tolist() == [0, 0, 0, 255]
+        assert len(canvas.to_bytes()) == 30 * 20 * 4
+
+        buffer = io.BytesIO()
+        canvas.to_png(buffer)
+        image = plt.imread(io.BytesIO(buffer.getvalue()))
+        assert (np.round(image * 255) == pixels).all()
+
+        image = plt.imread(tmp_path / 'scene.png')
+        assert image.shape == (48, 64, 4)
+        rasterized = rasterize(scene.figures(), 64, 48).to_array()
+        assert (np.round(image * 255) == rasterized).all()
+
+    def test_incremental_render(self, tmp_path):
+        path = tmp_path / 'scene.png'
+        text = (
+            'var square = Square(Point(0, 0), 10);'
+            'var circle = Circle(Point(12, 4), 5);'
+            'var corner = Point(5, 0);'
+            'var triangle = Triangle(corner, Point(20, 2), Point(9, 9));'
+            'var scene = Scene([square, circle, triangle]);'
+            f'scene.rasterize("{path}", 70, 45);'
+            'circle.set_color("red");'
+            'square.side = 8;'
+            'corner.set_y(1);'
+            f'scene.rasterize("{path}", 70, 45);'
+        )
+        scope = self.interpret(text, tmp_path).current_scope()
+        scene = scope.get('scene').get_value()
+        assert scene.cache.rebuilt == 3
+        image = plt.imread(path)
+        rasterized = rasterize(scene.figures(), 70, 45).to_array()
+        assert (np.round(image * 255) == rasterized).all()
+
+        paths = scene.cache.collection(scene.figures()).get_paths()
+        scene.figures()[1].set_radius([2])
+        repeated = scene.cache.collection(scene.figures()).get_paths()
+        assert scene.cache.rebuilt == 1
+        assert repeated[0] is paths[0] and repeated[2] is paths[2]
+        assert repeated[1] is not paths[1]
+        canvas = scene.cache.rasterize(scene.figures(), 70, 45)
+        rasterized = rasterize(scene.figures(), 70, 45).to_array()
+        assert (canvas.to_array() == rasterized).all()
+
+    def test_spatial_index(self):
+        text = (
+            'var square = Square(Point(0, 0), 2);'
+            'var circle = Circle(Point(5, 5), 1);'
+            'var triangle = Triangle(Point(0, 4), Point(4, 4), Point(0, 8));'
+            'var scene = Scene([square, circle, triangle]);'
+            'var near = scene.figures_in(Rectangle(Point(-1, -1), 3, 6));'
+            'var corner = scene.figures_at(Point(5.9, 5.9));'
+            'var edge = scene.figures_at(Point(2, 1));'
+            'circle.move_to(Point(1, 1));'
+            'var moved = scene.figures_at(Point(1.5, 1.5));'
+            'scene.remove(0);'
+            'scene.add(Rectangle(Point(1, 5), 1, 1));'
+            'var added = scene.figures_in(Square(Point(0, 4), 3));'
+        )
+        scope = self.interpret(text).current_scope()
+
+        def names(variable):
+            return [
+                type(figure.get_value()).__name__
+                for figure in scope.get(variable).get_value()
+            ]
+        assert names('near') == ['Square', 'Triangle']
+        assert names('corner') == []
+        assert names('edge') == ['Square']
+        assert names('moved') == ['Square', 'Circle']
+        assert names('added') == ['Triangle', 'Rectangle']
+
+        figures = [
+            Circle([Point([x, y]), 0.4]) for x in range(40) for y in range(30)
+        ]
+        scene = Scene([[Symbol(figure) for figure in figures]])
+        assert scene.index is not None
+        found = scene.figures_in([Rectangle([Point([10, 10]), 1, 1])])
+        assert len(found.get_value()) == 4
+        figures[0].set_radius([100])
+        found = scene.figures_at([Point([20.5, 20.5])])
+        assert [figure.get_value() for figure in found.get_value()] == [
+            figures[0]
+        ]
+
+        with pytest.raises(InvalidFunCallArgumentsError):
+            self.interpret(text + 'scene.figures_at(square);')
+        with pytest.raises(InvalidFunCallArgumentsError):
+            self.interpret(text + 'scene.add(1);')
+
+        # the index follows figures assigned directly to the scene's list
+        replaced = figures[1]
+        square = Square([Point([200, 200]), 3])
+        scene.attributes['figures'].get_value()[1].set_value(square)
+        found = scene.figures_at([Point([201, 201])]).get_value()
+        assert [figure.get_value() for figure in found] == [square]
+        found = scene.figures_at([Point([0, 1])]).get_value()
+        assert replaced not in [figure.get_value() for figure in found]
+        scene.attributes['figures'].set_value([Symbol(replaced)])
+        found = scene.figures_in([Rectangle([Point([-1, 0]), 2, 2])])
+        assert [figure.get_value() for figure in found.get_value()] == [
+            replaced
+        ]
+
+    def test_revisions(self):
+        text = (
+            'var point = Point(0, 0);'
+            'var triangle = Triangle(point, Point(2, 0), Point(0, 2));'
+            'var square = Square(point, 1);'
+        )
+        scope = self.interpret(text).current_scope()
+        point = scope.get('point').get_value()
+        triangle = scope.get('triangle').get_value()
+        square = scope.get('square').get_value()
+        revision = triangle.revision()
+        geometry = square.geometry_revision()
+        point.set_x([1])
+        assert triangle.revision() > revision
+        assert square.geometry_revision() > geometry
+
+        # style changes leave the geometry as it was
+        revision = square.revision()
+        geometry = square.geometry_revision()
+        square.set_color(['red'])
+        assert square.revision() > revision
+        assert square.geometry_revision() == geometry
+
+        # a point given back keeps the figure changed
+        other = triangle.attributes['point2'].get_value()
+        revision = triangle.revision()
+        triangle.set_point2([Point([5, 5])])
+        triangle.set_point2([other])
+        assert triangle.revision() > revision
+
+    def test_bounds(self):
+        text = (
+            'var rhomb = Rhomb(Point(0, 0), 2, 90);'
+            'var trapeze = Trapeze(Point(1, 1), 4, 2, 3);'
+            'var circle = Circle(Point(-1, 2), 2);'
+            'var scene = Scene([rhomb, trapeze, circle]);'
+            'var box = trapeze.bounds();'
+            'var width = box.get_width();'
+            'var before = scene.bounds();'
+            'circle.set_radius(1);'
+            'var after = scene.bounds();'
+        )
+        scope = self.interpret(text).current_scope()
+        assert scope.get('width').get_value() == 4
+        rhomb = scope.get('rhomb').get_value()
+        assert np.allclose(rhomb.bounds(), (0, 0, 2, 2))
+        assert scope.get('circle').get_value().bounds() == (-2, 1, 0, 3)
+        assert np.allclose(
+            scope.get('before').get_value().bounds(), (-3, 0, 5, 4)
+        )
+        assert np.allclose(
+            scope.get('after').get_value().bounds(), (-2, 0, 5, 4)
+        )
+
+        scene = scope.get('scene').get_value()
+        cached = rhomb.cached_bounds
+        rhomb.set_color(['red'])
+        assert rhomb.cached_bounds is cached
+        assert scene.cached_bounds is not None
+        rhomb.set_side([3])
+        assert np.allclose(rhomb.bounds(), (0, 0, 3, 3))
+        rhomb.set_side([6])
+        assert np.allclose(scene.bounds(), (-2, 0, 6, 6))
+
+        with pytest.raises(InvalidFunCallArgumentsError):
+            self.interpret(text + 'scene.clear(); scene.bounds();')
+
+        # figures assigned directly to the scene's list
+        text = (
+            'var scene = Scene([Square(Point(0, 0), 2)]);'
+            'var before = scene.bounds();'
+            'scene.figures[0] = Square(Point(10, 10), 3);'
+            'var replaced = scene.bounds();'
+            'scene.figures = ['
+            'Circle(Point(-5, 0), 1), Square(Point(0, 0), 1)];'
+            'var assigned = scene.bounds();'
+            'scene.figures[0].set_radius(2);'
+            'var changed = scene.bounds();'
+        )
+        scope = self.interpret(text).current_scope()
+        for name, bounds in (
+            ('before', (0, 0, 2, 2)),
+            ('replaced', (10, 10, 13, 13)),
+            ('assigned', (-6, -1, 1, 1)),
+            ('changed', (-7, -2, 1, 2))
+        ):
+            assert scope.get(name).get_value().bounds() == bounds
+
+        # a list shared with a scene that removes and adds a figure
+        text = (
+            'var figures = [Square(Point(0, 0), 2)];'
+            'var first = Scene(figures);'
+            'var second = Scene(figures);'
+            'second.bounds();'
+            'second.figures_at(Point(1, 1));'
+            'first.remove(0);'
+            'first.add(Square(Point(10, 10), 1));'
+            'var width = second.bounds().get_width();'
+            'var added = second.figures_at(Point(10.5, 10.5));'
+            'var removed = second.figures_at(Point(1, 1));'
+        )
+        scope = self.interpret(text).current_scope()
+        assert scope.get('width').get_value() == 1
+        assert len(scope.get('added').get_value()) == 1
+        assert scope.get('removed').get_value() == []
+
+        # figures keep nothing of the scenes holding them
+        square = Square([Point([0, 0]), 2])
+        scene = Scene([[Symbol(square)]])
+        scene.bounds()
+        freed = weakref.ref(scene)
+        del scene
+        gc.collect()
+        assert freed() is None
+
+    def test_scene_measures(self):
+        text = (
+            'var figures = Scene([Square(Point(0, 0), 3),'
+            'Rectangle(Point(1, 1), 3.3, 2.1),'
+            'Circle(Point(2, 2), 1.7),'
+            'Triangle(Point(5, 0), Point(8, 1.5), Point(6, 4)),'
+            'Rhomb(Point(0, 0), 2.5, 30),'
+            'Parallelogram(Point(4, 5), 3, 2, 45),'
+            'Trapeze(Point(1, 1), 4, 2.2, 3),'
+            'Rhomb(Point(3, 3), 1.5, 70),'
+            'Circle(Point(0, 1), 0.3)]);'
+            'var areas = figures.areas();'
+            'var perimeters = figures.perimeters();'
+            'var total = figures.total_area();'
+            'var empty = Scene([Square(Point(0, 0), 1)]);'
+            'empty.clear();'
+            'var nothing = empty.total_area();'
+        )
+        scope = self.interpret(text).current_scope()
+        figures = scope.get('figures').get_value().figures()
+        areas = [figure.area([]).get_value() for figure in figures]
+        perimeters = [figure.perimeter([]).get_value() for figure in figures]
+        total = 0
+        for area in areas:
+            total += area
+        assert scope.get('areas').get_value().values.tolist() == areas
+        assert (
+            scope.get('perimeters').get_value().values.tolist() == perimeters
+        )
+        assert scope.get('total').get_value() == total
+        assert scope.get('nothing').get_value() == 0
+
+        with pytest.raises(InvalidNumberOfArgumentsError):
+            self.interpret(text + 'figures.areas(1);')
+
+    def test_columnar_scene(self):
+        figures = (
+            '[Square(Point(0, 0), 3),'
+            'Circle(Point(2, 2), 1.5),'
+            'Triangle(Point(5, 0), Point(8, 1.5), Point(6, 4)),'
+            'Rhomb(Point(1, 4), 2, 60)]'
+        )
+        text = (
+            f'var objects = Scene({figures});'
+            f'var columns = ColumnarScene({figures});'
+            'var square = columns.figures[0];'
+            'var side = square.get_side();'
+            'square.set_side(4);'
+            'square.position.x = 1.5;'
+            'square.color = "red";'
+            'var area = square.area();'
+            'var triangle = columns.figures[2];'
+            'triangle.move_to(Point(4, 1));'
+            'var x2 = triangle.point2.x;'
+            'var hits = columns.figures_at(Point(2, 2));'
+            'columns.remove(1);'
+            'columns.add(Circle(Point(9, 9), 1));'
+            'var areas = columns.areas();'
+        )
+        scope = self.interpret(text).current_scope()
+        assert scope.get('side').get_value() == 3
+        assert scope.get('area').get_value() == 16
+        assert scope.get('x2').get_value() == 7
+        hits = scope.get('hits').get_value()
+        assert [type(hit.get_value()).__name__ for hit in hits] == [
+            'Square', 'Circle'
+        ]
+
+        columns = scope.get('columns').get_value()
+        square = columns.figures()[0]
+        assert isinstance(square, Square)
+        assert square.parameters() == (1.5, 0, 4, 0)
+        assert square.style()['fc'] == 'red'
+        assert [type(figure).__name__ for figure in columns.figures()] == [
+            'Square', 'Triangle', 'Rhomb', 'Circle'
+        ]
+        assert scope.get('areas').get_value().values.tolist() == [
+            figure.area([]).get_value() for figure in columns.figures()
+        ]
+
+        objects = scope.get('objects').get_value()
+        columns = ColumnarScene([objects.attributes['figures'].get_value()])
+        assert columns.bounds() == objects.bounds()
+        assert np.array_equal(
+            columns.raster(60, 40).to_array(),
+            objects.raster(60, 40).to_array()
+        )
+        assert columns.store.size == 4
+
+        with pytest.raises(InvalidFunCallArgumentsError):
+            self.interpret(text + 'columns.remove("a");')
+
+        # figures assigned to an element are copied into the columns, the
+        # list of figures itself cannot be assigned to
+        text = (
+            'var columns = ColumnarScene([Square(Point(0, 0), 2)]);'
+            'columns.figures[0] = Circle(Point(0, 0), 1);'
+            'var total = columns.total_area();'
+            'var first = columns.figures[0];'
+        )
+        scope = self.interpret(text).current_scope()
+        assert scope.get('total').get_value() == 3.14
+        assert isinstance(scope.get('first').get_value(), Circle)
+        with pytest.raises(InvalidTypeError):
+            self.interpret(text + 'columns.figures[0] = 1;')
+        with pytest.raises(ReadOnlyAttributeError):
+            self.interpret(text + 'columns.figures = [first];')
+
+        # rows of removed figures are given back, views of the figures left
+        # follow them and views of removed figures keep their values
+        columns = ColumnarScene([[]])
+        columns.add_figures(
+            Square, np.array([[x, 0, 1, 0] for x in range(200)]), np.ones(4)
+        )
+        kept = columns.view(199)
+        removed = columns.view(0)
+        for _ in range(150):
+            columns.remove_figure([0])
+            columns.add_figure([Circle([Point([0, 0]), 1])])
+        squares = columns.store.columns[columns.store.codes[Square]]
+        assert squares.size < 200
+        kept.set_side([5])
+        assert columns.view(49).parameters() == (199, 0, 5, 0)
+        assert removed.parameters() == (0, 0, 1, 0)
+        x = [figure.parameters()[0] for figure in columns.figures()]
+        assert x[:50] == list(range(150, 200))
+
+    def test_scene_transforms(self):
+        figures = (
+            '[Square(Point(0, 0), 2),'
+            'Triangle(Point(1, 0), Point(3, 0), Point(1, 1)),'
+            'Rhomb(Point(2, 2), 2, 60),'
+            'Circle(Point(4, 0), 1)]'
+        )
+        text = f'var objects = Scene({figures});'
+        text += f'var columns = ColumnarScene({figures});'
+        for scene in ('objects', 'columns'):
+            text += (
+                f'{scene}.translate(1, 2);'
+                f'{scene}.rotate(90, Point(1, 2));'
+                f'{scene}.scale(2);'
+            )
+        text += 'var square = objects.figures[0]; var x = square.position.x;'
+        scope = self.interpret(text).current_scope()
+        objects = scope.get('objects').get_value().figures()
+        columns = scope.get('columns').get_value().figures()
+        assert objects[0].parameters() == (2, 4, 4, 90)
+        assert scope.get('x').get_value() == 2
+        assert isinstance(scope.get('x').get_value(), int)
+        assert np.allclose(
+            objects[0].vertices(), [[2, 4], [2, 8], [-2, 8], [-2, 4]]
+        )
+        assert objects[1].parameters() == (2, 6, 2, 10, 0, 6)
+        assert objects[2].get_angle([]).get_value() == 60
+        assert objects[2].get_rotation([]).get_value() == 90
+        assert objects[3].parameters() == (2, 12, 2)
+        assert [figure.parameters() for figure in columns] == [
+            figure.parameters() for figure in objects
+        ]
+
+        rhomb = Rhomb([Point([1, 1]), 2, 60])
+        outline = rhomb.vertices()
+        scene = Scene([[Symbol(rhomb)]])
+        scene.rotate([37.5, Point([5, -3])])
+        assert rhomb.get_rotation([]).get_value() == 37.5
+        turn = math.radians(37.5)
+        offset = outline - (5, -3)
+        assert np.allclose(rhomb.vertices(), np.stack([
+            5 + offset[:, 0] * math.cos(turn) - offset[:, 1] * math.sin(turn),
+            -3 + offset[:, 0] * math.sin(turn) + offset[:, 1] * math.cos(turn)
+        ], axis=1))
+
+        with pytest.raises(InvalidFunCallArgumentsError):
+            self.interpret(text + 'objects.scale(0);')
+        with pytest.raises(InvalidNumberOfArgumentsError):
+            self.interpret(text + 'columns.translate(1);')
+
+    def test_scene_overlaps(self, monkeypatch):
+        # workers are searched with even on a single processor
+        monkeypatch.setattr(os, 'cpu_count', lambda: 4)
+        text = (
+            'var objects = Scene(['
+            'Square(Point(0, 0), 2),'
+            'Square(Point(2, 0), 2),'
+            'Circle(Point(3, 3), 1),'
+            'Triangle(Point(0, 2), Point(2, 2), Point(0, 4)),'
+            'Circle(Point(2, 4), 1),'
+            'Rectangle(Point(1, 1), 2, 2),'
+            'Square(Point(5, 1), 2)]);'
+            'objects.figures[6].set_rotation(45);'
+            'var columns = ColumnarScene(objects.figures);'
+            'var found = objects.overlaps();'
+            'var in_columns = columns.overlaps();'
+            'var in_workers = objects.overlaps(2);'
+        )
+        scope = self.interpret(text).current_scope()
+        figures = scope.get('objects').get_value().figures()
+        found = [
+            [figures.index(figure.get_value()) for figure in pair.get_value()]
+            for pair in scope.get('found').get_value()
+        ]
+        # figures only touching each other, including the turned square
+        # touching the corner of the second one, do not overlap
+        assert found == [[0, 5], [1, 5], [2, 4], [2, 5], [2, 6], [3, 5]]
+        for name in ('in_columns', 'in_workers'):
+            assert [
+                [figure.get_value().parameters() for figure in pair]
+                for pair in map(Symbol.get_value, scope.get(name).get_value())
+            ] == [
+                [figures[first].parameters(), figures[second].parameters()]
+                for first, second in found
+            ]
+
+        tiling = ColumnarScene([[]])
+        tiling.store.append(
+            Square, [[x, y, 1, 0] for x in range(40) for y in range(40)]
+        )
+        assert tiling.overlaps([]).get_value() == []
+        tiling.translate([0.1, 0.3])
+        tiling.rotate([30])
+        assert tiling.overlaps([]).get_value() == []
+
+        # figures all starting at the same x, in more workers than there
+        # are processors
+        column = Scene([[
+            Symbol(Square([Point([0, 0]), 1])),
+            Symbol(Square([Point([0, 0.5]), 1]))
+        ]])
+        for workers in (2, 1000):
+            pairs = column.overlaps([workers]).get_value()
+            assert [len(pair.get_value()) for pair in pairs] == [2]
+
+        with pytest.raises(InvalidFunCallArgumentsError):
+            self.interpret(text + 'objects.overlaps(0);')
+        with pytest.raises(InvalidNumberOfArgumentsError):
+            self.interpret(text + 'columns.overlaps(1, 2);')
+
+    def test_hit_test(self):
+        text = (
+            'var scene = Scene(['
+            'Square(Point(0, 0), 4),'
+            'Circle(Point(4, 4), 2),'
+            'Triangle(Point(0, 0), Point(2, 0), Point(0, 2))]);'
+            'scene.figures[0].set_rotation(45);'
+            'var columns = ColumnarScene(scene.figures);'
+            'var inside = scene.figures[1].contains(Point(5, 5));'
+            'var outside = scene.figures[1].contains(Point(5.5, 5.5));'
+            'var turned = columns.figures[0].contains(Point(-0.5, 1));'
+            'var hits = scene.hit_test(['
+            'Point(0.5, 0.5), Point(-0.5, 1), Point(4, 4), Point(10, 10),'
+            'Point(0, 0)]);'
+            'var xs = FloatArray([0.5, -0.5, 4, 10, 0]);'
+            'var ys = FloatArray([0.5, 1, 4, 10, 0]);'
+            'var in_columns = columns.hit_test(xs, ys);'
+        )
+        scope = self.interpret(text).current_scope()
+        assert scope.get('inside').get_value() is True
+        assert scope.get('outside').get_value() is False
+        assert scope.get('turned').get_value() is True
+        # the figure added last is the one on top
+        hits = scope.get('hits').get_value()
+        assert isinstance(hits, IntArray)
+        assert hits.values.tolist() == [2, 0, 1, -1, 2]
+        in_columns = scope.get('in_columns').get_value()
+        assert in_columns.values.tolist() == [2, 0, 1, -1, 2]
+
+        scene = ColumnarScene([[]])
+        scene.store.append(
+            Square, [[x, y, 1, 0] for x in range(30) for y in range(20)]
+        )
+        x = np.linspace(-1.25, 30.75, 65)
+        y = np.full(len(x), 10.5)
+        hits = scene.hit_test([FloatArray(x), FloatArray(y)]).get_value()
+        expected = np.where(
+            (x >= 0) & (x <= 30), np.floor(np.minimum(x, 29)) * 20 + 10, -1
+        )
+        assert hits.values.tolist() == expected.tolist()
+
+        with pytest.raises(InvalidFunCallArgumentsError):
+            self.interpret(text + 'scene.hit_test(xs, FloatArray([1]));')
+        with pytest.raises(InvalidFunCallArgumentsError):
+            self.interpret(text + 'scene.figures[0].contains(1);')
+        with pytest.raises(InvalidNumberOfArgumentsError):
+            self.interpret(text + 'scene.hit_test();')
+
+    def test_union_area(self):
+        text = (
+            'var scene = Scene(['
+            'Square(Point(0, 0), 2),'
+            'Square(Point(1, 1), 2),'
+            'Circle(Point(5, 5), 1),'
+            'Circle(Point(6, 5), 1)]);'
+            'var union = scene.union_area();'
+            'var total = scene.total_area();'
+            'var covered = scene.coverage(Rectangle(Point(0, 0), 4, 4));'
+            'var columns = ColumnarScene(scene.figures);'
+            'var in_columns = columns.union_area();'
+            'var inside = columns.coverage(columns.figures[2]);'
+        )
+        scope = self.interpret(text).current_scope()
+        # two unit circles with centers 1 apart share 2 pi / 3 - sqrt(3) / 2
+        lens = 2 * math.pi / 3 - math.sqrt(3) / 2
+        union = scope.get('union').get_value()
+        assert union == pytest.approx(7 + 2 * math.pi - lens)
+        assert scope.get('total').get_value() > union
+        assert scope.get('covered').get_value() == pytest.approx(7 / 16)
+        assert scope.get('in_columns').get_value() == pytest.approx(union)
+        assert scope.get('inside').get_value() == pytest.approx(1)
+
+        # a tiling covers its region once, however its tiles are cut
+        scene = ColumnarScene([[]])
+        scene.store.append(
+            Square, [[x, y, 1, 0] for x in range(30) for y in range(20)]
+        )
+        area = scene.union_area([]).get_value()
+        assert area == pytest.approx(600)
+        region = Circle([Point([15, 10]), 5])
+        assert scene.coverage([region]).get_value() == pytest.approx(1)
+        region = Rectangle([Point([25.5, 15.5]), 10, 10])
+        covered = scene.coverage([region]).get_value()
+        assert covered == pytest.approx(4.5 * 4.5 / 100)
+
+        # a circle overlapping nothing adds the area area() gives it
+        scope = self.interpret(
+            'var scene = Scene([Circle(Point(0, 0), 1),'
+            'Square(Point(3, 3), 1)]);'
+            'var union = scene.union_area();'
+            'var total = scene.total_area();'
+        ).current_scope()
+        union = scope.get('union').get_value()
+        assert union == pytest.approx(scope.get('total').get_value())
+        assert union == pytest.approx(4.14)
+        with pytest.raises(InvalidFunCallArgumentsError):
+            self.interpret(
+                'var scene = Scene([Square(Point(0, 0), 2)]);'
+                'var covered = scene.coverage(Point(1, 1));'
+            )
+
+    def test_tilings(self):
+        text = (
+            'var scene = Scene([Circle(Point(-5, -5), 1)]);'
+            'scene.fill_square_grid(Point(1, 2), 3, 4, 2);'
+            'var columns = ColumnarScene([Circle(Point(-5, -5), 1)]);'
+            'columns.fill_square_grid(Point(1, 2), 3, 4, 2);'
+            'var first = columns.figures[1];'
+            'var last = scene.figures[8];'
+        )
+        scope = self.interpret(text).current_scope()
+        scene = scope.get('scene').get_value()
+        columns = scope.get('columns').get_value()
+        assert len(scene.figures()) == len(columns.figures()) == 9
+        assert scope.get('first').get_value().parameters() == (1, 2, 3, 0)
+        last = scope.get('last').get_value()
+        assert isinstance(last, Square)
+        assert last.parameters() == (10, 5, 3, 0)
+        assert last.style() == scope.get('first').get_value().style()
+        # the index is built again with the new figures
+        found = scene.figures_at([Point([11, 6])]).get_value()
+        assert [figure.get_value() for figure in found] == [last]
+
+        for scene in (Scene([[]]), ColumnarScene([[]])):
+            scene.hex_tiling([Point([0, 0]), 2, 5, 4])
+            scene.triangle_tiling([Point([0, 20]), 2.5, 7, 3])
+            assert len(scene.figures()) == 3 * 20 + 21
+            assert scene.overlaps([]).get_value() == []
+            areas = scene.areas([]).get_value().values
+            union = scene.union_area([]).get_value()
+            assert union == pytest.approx(areas.sum())
+            assert areas[:60] == pytest.approx(2 * math.sqrt(3))
+            assert areas[60:] == pytest.approx(2.5 ** 2 * math.sqrt(3) / 4)
+            # a hexagon is covered by the three rhombs of its cell
+            hexagon = Circle([Point([0, 0]), math.sqrt(3)])
+            assert scene.coverage([hexagon]).get_value() == pytest.approx(1)
+
+        with pytest.raises(InvalidFunCallArgumentsError):
+            self.interpret(text + 'scene.hex_tiling(Point(0, 0), 0, 2, 2);')
+        with pytest.raises(InvalidFunCallArgumentsError):
+            self.interpret(text + 'columns.fill_square_grid(1, 1, 2, 2);')
+        with pytest.raises(InvalidFunCallArgumentsError):
+            self.interpret(
+                text + 'scene.triangle_tiling(Point(0, 0), 1, 2.5, 2);'
+            )
+        with pytest.raises(InvalidNumberOfArgumentsError):
+            self.interpret(text + 'scene.hex_tiling(Point(0, 0), 1, 2);')
+        # a single call adds at most max_tiles figures
+        with pytest.raises(InvalidFunCallArgumentsError):
+            self.interpret(
+                text + 'scene.hex_tiling(Point(0, 0), 1, 1000, 334);'
+            )
+        with pytest.raises(InvalidFunCallArgumentsError):
+            self.interpret(
+                text + 'columns.fill_square_grid(Point(0, 0), 1, 100000, 101);'
+            )
+
+    def test_render_tiles(self, tmp_path):
+        text = (
+            'var square = Square(Point(0, 0), 10);'
+            'square.set_color("red");'
+            'var circle = Circle(Point(12, 4), 5);'
+            'circle.set_opacity(0.5);'
+            'var triangle = Triangle(Point(5, 0), Point(20, 2), Point(9, 9));'
+            'triangle.set_border_width(4);'
+            'var scene = Scene([square, circle, triangle]);'
+            f'scene.render_tiles("{tmp_path / "tiles.png"}", 70, 45);'
+        )
+        scope = self.interpret(text, tmp_path).current_scope()
+        scene = scope.get('scene').get_value()
+        rasterized = rasterize(scene.figures(), 70, 45).to_array()
+        image = plt.imread(tmp_path / 'tiles.png')
+        assert (np.round(image * 255) == rasterized).all()
+        buffer = io.BytesIO()
+        render_tiles(scene.figures(), 70, 45, buffer, tile_size=16, workers=2)
+        image = plt.imread(io.BytesIO(buffer.getvalue()))
+        assert (np.round(image * 255) == rasterized).all()
+
+        # tiles are handed out a window ahead of the one taken, not all at
+        # once
+        submitted = []
+
+        class Executor:
+            def submit(self, function, item):
+                submitted.append(item)
+                future = Future()
+                future.set_result(function(item))
+                return future
+
+        taken = []
+        for result in windowed_map(Executor(), abs, range(-10, 0), 3):
+            taken.append(result)
+            assert len(submitted) <= len(taken) + 2
+        assert taken == list(range(10, 0, -1))
+
+        with pytest.raises(InvalidFunCallArgumentsError):
+            self.interpret(
+                text + 'scene.render_tiles("a.png", 0, 10);',
+                tmp_path
+            )